@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - asyncio engine
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Optional alternative to the threaded engine in adsb_server.py, selected
+with ``[Server] engine = asyncio``.  Everything runs as coroutines on a
+single event loop:
+
+* one dump1090 SBS1 / Beast reader per source (or the aircraft.json poller
+  in the JSON modes)
+* one writer per endpoint, draining that endpoint's EndpointQueue (listen
+  clients included, accepted from the loop's own reader callback; UDP /
+  multicast endpoints send datagrams straight from their socket)
+* reconnect with jittered exponential backoff (dump1090 + endpoints),
+  recording each endpoint's state on its ``Link`` like the threaded
+  engine's supervisor does
+* config hot reload as the file watcher reports edits, reconciling the
+  sets of source readers and endpoint writers (and swapping the input
+  side when the output format needs a different one)
+
+Filtering, conversion and queueing are NOT reimplemented here -- the
+engine calls straight back into ADSBServer (``process_sbs1_lines``,
+``process_beast_frames``, ``forward_json_snapshot``) so both engines
+apply exactly the same filter semantics.  The engine stands in for
+``server.fanout``: ``forward_message`` lands in ``submit()`` below,
+which queues and wakes the relevant writer coroutines.
+
+Net effect on a Pi 4: no reconnect threads at all (the log-rotation and
+resource-monitor threads remain), and endpoint count is bounded by file
+descriptors rather than threads.
+"""
+
+import asyncio
+import http.client
+import time
+
+from _beast import BeastFramer
+from _fanout import stalled, send_datagrams, TCP
+from _framing import LineFramer, RECV_SIZE
+from _filewatch import JsonFileSource
+from _http import AsyncJsonHttpClient
+from _ingest import SOURCE_RETRY_BASE
+from _reconnect import backoff_delay, DEFAULT_CONNECT_TIMEOUT
+
+FILE_WAIT_CEILING = 5       # seconds, file source re-check without an event
+
+
+class AsyncEngine:
+    """Runs an ADSBServer's data path on one asyncio event loop."""
+
+    def __init__(self, server):
+        self.server = server
+        self.logger = server.logger
+        self.loop = None
+        self._writers = {}  # 'ip:port' -> writer task
+        self._wake = {}     # 'ip:port' -> asyncio.Event
+        self._readers = {}  # InputSource -> reader task (sbs1/beast modes)
+        self._mode = None   # server.run_mode() the input side was started for
+        self._mode_task = None  # JSON poller (json modes)
+        self.configure_batching(server.batch_window_ms, server.batch_max_bytes)
+        self.configure_connects(server.connect_timeout)
+
+    def configure_batching(self, window_ms, max_bytes):
+        """Same latency/throughput knob as FanoutEngine."""
+        self.batch_window = max(0, window_ms) / 1000.0
+        self.batch_max_bytes = max_bytes
+
+    def configure_connects(self, timeout):
+        """Seconds a dump1090 / endpoint connect may take."""
+        self.connect_timeout = timeout
+
+    # ------------------------------------------------------------------
+    # Fan-out interface (what ADSBServer expects from self.fanout)
+    # ------------------------------------------------------------------
+    def submit(self, endpoints, data, key=None):
+        """Queue ``data`` on every endpoint and wake its writer."""
+        now = time.monotonic()
+        for endpoint in endpoints:
+            queue = endpoint['queue']
+            dropped = queue.dropped
+            queue.append(data, key, now)
+            if queue.dropped != dropped and endpoint.get('max_stall') is not None:
+                # Listen client whose buffer overflowed: evict, don't shed
+                self.server.remove_client(endpoint, TimeoutError(
+                    f"client too slow: {stalled(queue, endpoint['max_stall'], now)}"))
+                continue
+            if queue.dropped != dropped and (queue.dropped == 1 or queue.dropped % 10000 == 0):
+                self.logger.warning(
+                    f"Queue full for {endpoint['ip']}:{endpoint['port']} "
+                    f"({queue.policy}: {len(queue)} messages queued, {queue.dropped} dropped so far)")
+            wake = self._wake.get(self._key(endpoint))
+            if wake is not None:
+                wake.set()
+
+    def forget(self, endpoint):
+        """Endpoint removed (config reload) or server stopping."""
+        task = self._writers.pop(self._key(endpoint), None)
+        if task is not None:
+            task.cancel()
+        self._wake.pop(self._key(endpoint), None)
+        endpoint['queue'].reset_inflight()
+
+    def watch_reader(self, sock, callback):
+        """Listen / control socket: call back when readable, then start
+        writers for whatever clients it added -- or, if the callback
+        applied a config change (returns true), catch up with all of it."""
+        def readable():
+            if callback():
+                self.config_applied()
+            else:
+                self._sync_writers()
+        self.loop.add_reader(sock, readable)
+
+    def unwatch_reader(self, sock):
+        self.loop.remove_reader(sock)
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self._sync_writers()
+        self.server.update_listener()
+        self.watch_reader(self.server.control.wakeup, self.server.reload_signalled)
+        self.server.update_control()
+        self.server.update_metrics()
+
+        self._start_mode()
+        try:
+            await self._reloader()
+        finally:
+            for task in [self._mode_task] + list(self._readers.values()) + list(self._writers.values()):
+                if task is not None:
+                    task.cancel()
+            self.logger.info("ADS-B Server stopped")
+
+    def _start_mode(self):
+        """Start the input side the output format calls for: the JSON
+        poller, or one reader per source.  Anything already running for
+        the previous format is stopped first."""
+        if self._mode_task is not None:
+            self._mode_task.cancel()
+            self._mode_task = None
+        for task in self._readers.values():
+            task.cancel()
+        self._readers.clear()
+
+        self._mode = self.server.run_mode()
+        if self._mode == 'json':
+            self._mode_task = asyncio.create_task(self._json_poller(convert=False))
+        elif self._mode == 'json_to_sbs1':
+            self._mode_task = asyncio.create_task(self._json_poller(convert=True))
+        else:
+            label = self.server.dump1090_stream()[0]
+            self.logger.info(f"ADS-B Server starting in {label} mode (asyncio engine)...")
+            self._sync_readers()
+
+    @staticmethod
+    def _key(endpoint):
+        return f"{endpoint['ip']}:{endpoint['port']}"
+
+    def _endpoint(self, key):
+        for endpoint in self.server.endpoints:
+            if self._key(endpoint) == key:
+                return endpoint
+        return None
+
+    # ------------------------------------------------------------------
+    # Config reload
+    # ------------------------------------------------------------------
+    async def _reloader(self):
+        """Apply config edits as they happen: inotify wakes this at once,
+        otherwise the watcher's stat check runs every few seconds."""
+        server = self.server
+        watcher = server.config_watcher
+        edited = asyncio.Event()
+        fd = watcher.fileno()
+        if fd is not None:
+            self.loop.add_reader(fd, edited.set)
+        try:
+            while server.running:
+                try:
+                    await asyncio.wait_for(edited.wait(), watcher.interval)
+                except asyncio.TimeoutError:
+                    pass
+                edited.clear()
+                if server.check_config():
+                    self.config_applied()
+        finally:
+            if fd is not None:
+                self.loop.remove_reader(fd)
+
+    def config_applied(self):
+        """The server applied a new configuration: start and stop writers
+        and readers to match, or switch input mode."""
+        self._sync_writers()
+        if self.server.run_mode() != self._mode:
+            self.logger.info(f"Output format is now {self.server.output_format}, switching mode")
+            self._start_mode()
+        elif self._mode_task is None:
+            self._sync_readers()
+
+    def _sync_writers(self):
+        """Start a writer for every configured endpoint, stop the rest."""
+        wanted = {self._key(ep) for ep in self.server.endpoints}
+        for key in list(self._writers):
+            if key not in wanted:
+                self._writers.pop(key).cancel()
+                self._wake.pop(key, None)
+        for key in wanted:
+            if key not in self._writers:
+                self._wake[key] = asyncio.Event()
+                self._writers[key] = asyncio.create_task(self._endpoint_writer(key))
+
+    def _sync_readers(self):
+        """Start a reader for every configured source, stop the rest."""
+        sources = self.server.sources
+        for source in list(self._readers):
+            if source not in sources:
+                self._readers.pop(source).cancel()
+                self.logger.info(f"Closed connection to removed source {source}")
+        for source in sources:
+            if source not in self._readers:
+                self._readers[source] = asyncio.create_task(self._stream_reader(source))
+
+    # ------------------------------------------------------------------
+    # Endpoint writers
+    # ------------------------------------------------------------------
+    async def _endpoint_writer(self, key):
+        endpoint = self._endpoint(key)
+        if endpoint is not None and endpoint.get('client'):
+            await self._client_writer(key, endpoint)
+            return
+        if endpoint is not None and endpoint.get('transport', TCP) != TCP:
+            await self._datagram_writer(key)
+            return
+        while self.server.running:
+            endpoint = self._endpoint(key)
+            if endpoint is None:
+                return
+            link = endpoint['link']
+            link.connecting(time.monotonic(), self.connect_timeout)
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(endpoint['ip'], endpoint['port']),
+                    self.connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                first = link.attempt == 0
+                delay = link.down(time.monotonic(), e if str(e) else TimeoutError('connect timed out'))
+                log = self.logger.warning if first else self.logger.debug
+                log(f"Failed to connect to {key}: {link.last_error} (retry in {delay:.1f}s)")
+                await asyncio.sleep(delay)
+                continue
+
+            reconnect = link.connects > 0
+            link.up(time.monotonic())
+            endpoint['socket'] = writer
+            self.logger.info(f"{'Reconnected' if reconnect else 'Connected'} to endpoint {key}")
+            error = 'closed'
+            try:
+                await self._drain(key, writer)
+            except (OSError, ConnectionError) as e:
+                error = e
+                self.logger.warning(f"Failed to send to {key}: {e}")
+            finally:
+                endpoint = self._endpoint(key)
+                if endpoint is not None and endpoint.get('socket') is writer:
+                    endpoint['socket'] = None
+                    endpoint['queue'].reset_inflight()
+                writer.close()
+            if endpoint is not None and self.server.running:
+                # Back off before reconnecting, as the threaded supervisor does
+                delay = link.down(time.monotonic(), error)
+                self.logger.info(f"Reconnecting to {key} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _client_writer(self, key, client):
+        """A listen client: already connected, never reconnected."""
+        try:
+            _, writer = await asyncio.open_connection(sock=client['conn'])
+        except OSError as e:
+            self.server.remove_client(client, e)
+            return
+        client['socket'] = writer
+        try:
+            await self._drain(key, writer)
+        except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+            self.server.remove_client(client, e)
+        finally:
+            writer.close()
+
+    async def _datagram_writer(self, key):
+        """UDP / multicast: nothing to connect, nothing to reconnect."""
+        wake = self._wake[key]
+        attempt = 0
+        while self.server.running:
+            endpoint = self._endpoint(key)
+            if endpoint is None:
+                return
+            sock = endpoint.get('socket')
+            if sock is None:
+                # Socket couldn't be opened (e.g. host name didn't resolve)
+                if not self.server.open_datagram(endpoint):
+                    await asyncio.sleep(backoff_delay(attempt))
+                    attempt += 1
+                    continue
+                attempt = 0
+                sock = endpoint['socket']
+            queue = endpoint['queue']
+            if not queue:
+                wake.clear()
+                await wake.wait()
+                continue
+            if self.batch_window and queue.pending_since is not None and queue.backlog_bytes < self.batch_max_bytes:
+                wait = queue.pending_since + self.batch_window - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+            try:
+                send_datagrams(endpoint, self.logger)
+            except (BlockingIOError, InterruptedError):
+                await self._writable(sock)
+
+    async def _writable(self, sock):
+        ready = self.loop.create_future()
+        self.loop.add_writer(sock, ready.set_result, None)
+        try:
+            await ready
+        finally:
+            self.loop.remove_writer(sock)
+
+    async def _drain(self, key, writer):
+        wake = self._wake[key]
+        while self.server.running:
+            endpoint = self._endpoint(key)
+            if endpoint is None:
+                return
+            queue = endpoint['queue']
+            max_stall = endpoint.get('max_stall')
+            if max_stall is not None:
+                reason = stalled(queue, max_stall, time.monotonic())
+                if reason:
+                    raise TimeoutError(f"client too slow: {reason}")
+            if not queue:
+                wake.clear()
+                await wake.wait()
+                continue
+            # Coalesce: hold a small backlog until the batch window closes
+            if self.batch_window and queue.backlog_bytes < self.batch_max_bytes:
+                wait = queue.pending_since + self.batch_window - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+            # Hand over the whole backlog: the reader may have queued
+            # several chunks while this coroutine waited for its turn.
+            while queue:
+                writer.write(queue.pop_chunk())
+            # Backpressure: a slow peer parks only this coroutine (a
+            # listen client only up to its max_stall)
+            if max_stall is None:
+                await writer.drain()
+            else:
+                try:
+                    await asyncio.wait_for(writer.drain(), max_stall)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"client too slow: not reading for {max_stall:g}s") from None
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+    async def _stream_reader(self, source):
+        """One source's SBS1 text stream, or its Beast stream in beast mode."""
+        server = self.server
+        label = server.dump1090_stream()[0]
+        beast = label == 'Beast'
+        stats = source.stats
+        link = source.link
+
+        while server.running:
+            link.connecting(time.monotonic(), self.connect_timeout)
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(source.host, source.port), self.connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                delay = link.down(time.monotonic(), e if str(e) else TimeoutError('connect timed out'),
+                                  SOURCE_RETRY_BASE)
+                self.logger.error(f"Failed to connect to dump1090-fa {source}: {link.last_error}")
+                self.logger.info(f"Waiting for dump1090-fa connection... (retry in {delay:.0f}s)")
+                await asyncio.sleep(delay)
+                continue
+
+            link.up(time.monotonic())
+            stats.connects += 1
+            stats.connected_at = time.time()
+            self.logger.info(f"Connected to dump1090-fa {label} at {source}")
+            framer = BeastFramer() if beast else LineFramer()
+            process = server.process_beast_frames if beast else server.process_sbs1_lines
+            error = ConnectionError('closed')
+            try:
+                while server.running:
+                    data = await reader.read(RECV_SIZE)
+                    if not data:
+                        self.logger.warning(f"dump1090-fa connection lost: {source}")
+                        break
+                    stats.bytes += len(data)
+                    framer.feed(data)
+                    process(framer, source)
+                    # read() doesn't suspend while the stream has buffered
+                    # data; yield so the writers get to drain what we queued.
+                    await asyncio.sleep(0)
+            except (OSError, ConnectionError) as e:
+                error = e
+                self.logger.error(f"Error receiving data from {source}: {e}")
+            finally:
+                stats.connected_at = None
+                writer.close()
+            if server.running:
+                # Back off before reconnecting, as the threaded engine does
+                await asyncio.sleep(link.down(time.monotonic(), error, SOURCE_RETRY_BASE))
+
+    def _json_client(self):
+        server = self.server
+        client = server.json_client
+        if not isinstance(client, (AsyncJsonHttpClient, JsonFileSource)) or client.source != server.json_source:
+            if client is not None:
+                client.close()
+            if server.json_source[0] == 'file':
+                client = server.json_client = JsonFileSource(server.json_source[1])
+            else:
+                client = server.json_client = AsyncJsonHttpClient(*server.json_source[1:])
+        return client
+
+    async def _fetch_json(self):
+        """aircraft.json over a keep-alive connection (or from the local
+        file) without leaving the event loop; None if unchanged since the
+        last poll, [] on error."""
+        client = self._json_client()
+        scheduler = self.server.poll_scheduler
+        scheduler.started()
+        try:
+            if isinstance(client, JsonFileSource):
+                aircraft_list = client.fetch()   # one local read; doesn't block meaningfully
+            else:
+                aircraft_list = await client.fetch()
+        except (OSError, asyncio.TimeoutError, http.client.HTTPException) as e:
+            self.logger.warning(f"Cannot reach JSON endpoint: {e or 'timeout'}")
+            aircraft_list = []
+        except Exception as e:
+            # Anything else must not end the poller task: log, retry next poll
+            self.logger.error(f"Error fetching JSON from {client.url}: {e}")
+            aircraft_list = []
+        scheduler.observe(aircraft_list, client.snapshot_time)
+        return aircraft_list
+
+    async def _json_poller(self, convert):
+        server = self.server
+        label = "JSON→SBS1" if convert else "JSON"
+        self.logger.info(f"ADS-B Server starting in {label} mode (asyncio engine)...")
+        self.logger.info(f"Polling JSON data from: {server.json_source_url()}")
+
+        stats_time = self.loop.time()
+        first_success = False
+        total_sent = 0
+        aircraft_list = []
+        while server.running:
+            snapshot = await self._fetch_json()
+            if snapshot is not None:
+                aircraft_list = snapshot
+
+            if aircraft_list and not first_success:
+                self.logger.info(f"✓ Successfully connected to JSON endpoint ({len(aircraft_list)} aircraft visible)")
+                first_success = True
+
+            try:
+                sent_count = server.forward_json_snapshot(aircraft_list) if snapshot is not None else 0
+            except Exception as e:
+                self.logger.error(f"{label} mode error: {e}")
+                await asyncio.sleep(5)
+                continue
+            total_sent += sent_count
+
+            # Log stats every 30 seconds
+            if self.loop.time() - stats_time > 30:
+                self.logger.info(f"{label}: {len(aircraft_list)} aircraft, {sent_count} sent, {total_sent} total")
+                stats_time = self.loop.time()
+
+            await self._wait_for_snapshot()
+
+    async def _wait_for_snapshot(self):
+        """HTTP: sleep until the poll scheduler's next deadline.  File
+        source: wake as soon as dump1090 replaces aircraft.json (see
+        ADSBServer.wait_for_snapshot)."""
+        client = self.server.json_client
+        fd = client.fileno() if isinstance(client, JsonFileSource) else None
+        if fd is None:
+            await asyncio.sleep(self.server.poll_scheduler.delay())
+            return
+        ready = asyncio.Event()
+        self.loop.add_reader(fd, ready.set)
+        try:
+            deadline = self.loop.time() + FILE_WAIT_CEILING
+            while self.server.running:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return
+                ready.clear()
+                if client.changed():
+                    return
+        finally:
+            self.loop.remove_reader(fd)
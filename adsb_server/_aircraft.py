@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - per-aircraft state table
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+The JSON modes used to re-send every filtered aircraft as a full object
+on every 1 s poll, whether or not anything had changed -- a parked or
+slow aircraft cost the same backhaul as one climbing out.
+
+``AircraftTable`` remembers, per ICAO, what was last *emitted* and lets
+an aircraft through only when:
+
+* it is new (or reappeared after dropping out of aircraft.json)
+* it moved further than ``position_nm``
+* altitude / ground speed / track changed by more than their thresholds
+* callsign or squawk changed (discrete, always significant)
+* position or altitude became known or was lost
+* its last emission is older than ``keyframe_interval`` (periodic full
+  refresh so late-joining receivers converge)
+
+Records use ``__slots__`` to keep a few hundred aircraft to a few tens
+of KiB.  Aircraft missing from a snapshot are dropped from the table.
+
+``DeltaEncoder`` backs the ``json_delta`` output format: per ICAO it
+sends a full object first, then only the fields that differ from the
+last line sent for that aircraft (removed fields as ``null``), with a
+fresh full object every ``full_interval`` seconds.  Every line carries
+a stream-wide ``seq`` so a receiver can spot gaps (queue drops,
+reconnects) and wait for the next full object::
+
+    {"seq":1041,"full":true,"hex":"a92f2d","flight":"TEST1  ","alt_baro":3000,...}
+    {"seq":1042,"hex":"a92f2d","alt_baro":3100,"lat":51.51}
+"""
+
+import math
+import time
+
+import _serialize
+
+DEFAULT_POSITION_NM = 0.05       # ~90 m
+DEFAULT_ALTITUDE_FT = 100
+DEFAULT_SPEED_KT = 5.0
+DEFAULT_TRACK_DEG = 3.0
+DEFAULT_KEYFRAME_INTERVAL = 30.0  # seconds
+
+DEFAULT_FULL_INTERVAL = 60.0     # seconds between json_delta full objects
+# Counters that tick on every poll; left out of json_delta deltas (still
+# present in full objects) so they don't defeat the encoding
+DEFAULT_DELTA_EXCLUDE = ('messages', 'seen', 'seen_pos', 'rssi')
+
+
+def aircraft_altitude(aircraft):
+    """Barometric altitude, else geometric; 'ground' reads as 0."""
+    altitude = aircraft.get('alt_baro')
+    if altitude is None:
+        altitude = aircraft.get('alt_geom')
+    return 0 if altitude == 'ground' else altitude
+
+
+class AircraftState:
+    """Values last emitted for one aircraft."""
+
+    __slots__ = ('lat', 'lon', 'altitude', 'speed', 'track',
+                 'callsign', 'squawk', 'sent_at', 'generation')
+
+    def __init__(self):
+        self.sent_at = None
+        self.generation = 0
+
+    def record(self, lat, lon, altitude, speed, track, callsign, squawk, now):
+        self.lat = lat
+        self.lon = lon
+        self.altitude = altitude
+        self.speed = speed
+        self.track = track
+        self.callsign = callsign
+        self.squawk = squawk
+        self.sent_at = now
+
+
+class AircraftTable:
+    """Change detector over successive aircraft.json snapshots.
+
+    ``changed(aircraft_list)`` returns the subset of the snapshot worth
+    forwarding and updates the table as if those had been sent.
+    """
+
+    def __init__(self, position_nm=DEFAULT_POSITION_NM, altitude_ft=DEFAULT_ALTITUDE_FT,
+                 speed_kt=DEFAULT_SPEED_KT, track_deg=DEFAULT_TRACK_DEG,
+                 keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.states = {}        # hex -> AircraftState
+        self.generation = 0
+        self.emitted = 0
+        self.suppressed = 0
+        self.configure(position_nm, altitude_ft, speed_kt, track_deg, keyframe_interval)
+
+    def configure(self, position_nm, altitude_ft, speed_kt, track_deg, keyframe_interval):
+        """Apply thresholds (config reload); known aircraft are kept."""
+        self.position_nm = position_nm
+        self.altitude_ft = altitude_ft
+        self.speed_kt = speed_kt
+        self.track_deg = track_deg
+        self.keyframe_interval = keyframe_interval
+
+    def configure_from(self, config, section='Output'):
+        """Read thresholds from the [Output] keys."""
+        self.configure(
+            config.getfloat(section, 'position_threshold_nm', fallback=DEFAULT_POSITION_NM),
+            config.getfloat(section, 'altitude_threshold_ft', fallback=DEFAULT_ALTITUDE_FT),
+            config.getfloat(section, 'speed_threshold_kt', fallback=DEFAULT_SPEED_KT),
+            config.getfloat(section, 'track_threshold_deg', fallback=DEFAULT_TRACK_DEG),
+            config.getfloat(section, 'keyframe_interval', fallback=DEFAULT_KEYFRAME_INTERVAL),
+        )
+
+    def __len__(self):
+        return len(self.states)
+
+    def clear(self):
+        self.states.clear()
+
+    def changed(self, aircraft_list, now=None):
+        """Return the aircraft from this snapshot that should be sent."""
+        if now is None:
+            now = time.monotonic()
+        self.generation += 1
+        generation = self.generation
+        states = self.states
+        result = []
+        seen = 0
+
+        for aircraft in aircraft_list:
+            icao = aircraft.get('hex')
+            if not icao:
+                continue
+            seen += 1
+            state = states.get(icao)
+            if state is None:
+                state = states[icao] = AircraftState()
+            state.generation = generation
+
+            lat = aircraft.get('lat')
+            lon = aircraft.get('lon')
+            altitude = aircraft_altitude(aircraft)
+            speed = aircraft.get('gs')
+            track = aircraft.get('track')
+            callsign = aircraft.get('flight')
+            squawk = aircraft.get('squawk')
+
+            if state.sent_at is not None:
+                try:
+                    significant = self._significant(state, lat, lon, altitude, speed,
+                                                    track, callsign, squawk, now)
+                except (TypeError, ValueError):
+                    significant = True   # odd field types: just send it
+                if not significant:
+                    self.suppressed += 1
+                    continue
+
+            state.record(lat, lon, altitude, speed, track, callsign, squawk, now)
+            result.append(aircraft)
+
+        self.emitted += len(result)
+        # Forget aircraft that have dropped out of aircraft.json
+        if len(states) > seen:
+            stale = [icao for icao, state in states.items() if state.generation != generation]
+            for icao in stale:
+                del states[icao]
+        return result
+
+    def _significant(self, state, lat, lon, altitude, speed, track, callsign, squawk, now):
+        if now - state.sent_at >= self.keyframe_interval:
+            return True
+        if callsign != state.callsign or squawk != state.squawk:
+            return True
+
+        if (lat is None) != (state.lat is None) or (lon is None) != (state.lon is None):
+            return True
+        if lat is not None and lon is not None:
+            # Equirectangular approximation: plenty for sub-mile thresholds
+            dlat = (lat - state.lat) * 60.0
+            dlon = (lon - state.lon) * 60.0 * math.cos(math.radians(lat))
+            if dlat * dlat + dlon * dlon > self.position_nm * self.position_nm:
+                return True
+
+        if self._moved(altitude, state.altitude, self.altitude_ft):
+            return True
+        if self._moved(speed, state.speed, self.speed_kt):
+            return True
+        if (track is None) != (state.track is None):
+            return True
+        if track is not None:
+            delta = abs(track - state.track) % 360.0
+            if min(delta, 360.0 - delta) > self.track_deg:
+                return True
+        return False
+
+    @staticmethod
+    def _moved(value, previous, threshold):
+        if (value is None) != (previous is None):
+            return True
+        return value is not None and abs(value - previous) > threshold
+
+    def stats(self):
+        return {'tracked': len(self.states), 'emitted': self.emitted, 'suppressed': self.suppressed}
+
+
+class DeltaEncoder:
+    """Per-stream ``json_delta`` encoder (one per filter profile, since
+    each profile sees a different subset of aircraft)."""
+
+    def __init__(self, full_interval=DEFAULT_FULL_INTERVAL, exclude=DEFAULT_DELTA_EXCLUDE):
+        self.seq = 0
+        self.last = {}          # hex -> [fields last sent, full_at, sent_at]
+        self.configure(full_interval, exclude)
+
+    def configure(self, full_interval, exclude):
+        self.full_interval = full_interval
+        self.exclude = frozenset(exclude)
+
+    def encode(self, aircraft, now=None):
+        """Return the next ``json_delta`` line for this aircraft (bytes),
+        or None when nothing but excluded counters changed."""
+        if now is None:
+            now = time.monotonic()
+        icao = aircraft.get('hex')
+        entry = self.last.get(icao)
+
+        if entry is None or now - entry[1] >= self.full_interval:
+            line = {'seq': self.seq + 1, 'full': True}
+            line.update(aircraft)
+            self.last[icao] = [dict(aircraft), now, now]
+        else:
+            previous = entry[0]
+            exclude = self.exclude
+            line = {'seq': self.seq + 1, 'hex': icao}
+            for field, value in aircraft.items():
+                if field not in exclude and previous.get(field, line) != value:
+                    line[field] = value
+            for field in previous:
+                if field not in aircraft and field not in exclude:
+                    line[field] = None
+            if len(line) == 2:
+                return None
+            entry[0] = dict(aircraft)
+            entry[2] = now
+
+        self.seq += 1
+        if self.seq % 1000 == 0:
+            self._sweep(now)
+        return _serialize.dumps_line(line)
+
+    def _sweep(self, now):
+        """Forget aircraft not sent for two full intervals; if they come
+        back they start again with a full object."""
+        horizon = 2 * max(self.full_interval, DEFAULT_KEYFRAME_INTERVAL)
+        stale = [icao for icao, entry in self.last.items() if now - entry[2] > horizon]
+        for icao in stale:
+            del self.last[icao]
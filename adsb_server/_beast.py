@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - Beast binary framing (dump1090 port 30005)
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+dump1090's Beast output carries the raw Mode S / Mode A/C replies with
+their 12 MHz MLAT timestamp and signal level -- everything SBS1 text
+loses.  Each frame on the wire is::
+
+    0x1a  type  timestamp(6)  signal(1)  message(2 / 7 / 14)
+
+with type '1' (Mode A/C, 2 bytes), '2' (Mode S short, 7) or '3' (Mode S
+long, 14); type '4' (receiver status, 14) is skipped.  Any 0x1a byte
+after the type is sent twice, so a lone 0x1a always starts a frame.
+
+``BeastFramer`` is the Beast counterpart of ``LineFramer`` (and reuses
+its fixed ``bytearray`` and ``recv_into``): ``frames()`` returns the
+complete frames received so far as ``(raw, kind, timestamp, signal,
+message)``.  ``raw`` is the frame exactly as it arrived, escapes
+included, so relaying to Beast consumers is a plain copy with the
+original timestamp; ``message`` is the unescaped Mode S payload the
+filters look at.  Most frames contain no escaped byte and are sliced
+out with no per-byte work.
+
+``frame_icao(message)`` reads the aircraft address: in clear for
+DF11/17/18, recovered from the address/parity field (CRC-24 of the rest
+of the message XOR the last three bytes) for DF0/4/5/16/20/21.
+"""
+
+from _framing import LineFramer
+
+ESCAPE = 0x1a
+
+MODE_AC = 0x31      # '1'
+MODE_S_SHORT = 0x32  # '2'
+MODE_S_LONG = 0x33  # '3'
+STATUS = 0x34       # '4'
+
+# type -> timestamp + signal + message bytes
+BODY_LENGTHS = {MODE_AC: 6 + 1 + 2, MODE_S_SHORT: 6 + 1 + 7, MODE_S_LONG: 6 + 1 + 14, STATUS: 6 + 1 + 14}
+
+# Downlink formats whose address is sent in clear / overlaid on the parity
+ADDRESS_IN_CLEAR = frozenset((11, 17, 18))
+ADDRESS_PARITY = frozenset((0, 4, 5, 16, 20, 21))
+
+MODES_POLY = 0xFFF409
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 16
+        for _ in range(8):
+            crc = (crc << 1) ^ MODES_POLY if crc & 0x800000 else crc << 1
+        table.append(crc & 0xFFFFFF)
+    return tuple(table)
+
+
+_CRC_TABLE = _crc_table()
+
+
+def modes_crc(data):
+    """Mode S CRC-24 of ``data`` (bytes)."""
+    crc = 0
+    table = _CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ table[(crc >> 16) ^ byte]
+    return crc
+
+
+def downlink_format(message):
+    """DF of a Mode S message (0-24; DF24 uses only its top two bits)."""
+    df = message[0] >> 3
+    return 24 if df >= 24 else df
+
+
+def frame_icao(message):
+    """24-bit aircraft address of a Mode S message as an int, or None."""
+    if len(message) < 7:
+        return None
+    df = message[0] >> 3
+    if df in ADDRESS_IN_CLEAR:
+        return int.from_bytes(message[1:4], 'big')
+    if df in ADDRESS_PARITY:
+        return modes_crc(message[:-3]) ^ int.from_bytes(message[-3:], 'big')
+    return None
+
+
+class BeastFramer(LineFramer):
+    """Incremental Beast frame parser over LineFramer's ``bytearray``.
+
+    ``buf[start:end]`` holds bytes not yet returned as frames.  Bytes
+    that can't start a frame (mid-stream connect, corrupt data) are
+    skipped up to the next lone 0x1a and counted in ``resyncs``.
+    """
+
+    __slots__ = ('resyncs', 'status_frames')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resyncs = 0
+        self.status_frames = 0
+
+    def frames(self):
+        """Return the complete frames received so far, in order."""
+        buf = self.buf
+        end = self.end
+        pos = self.start
+        frames = []
+        while True:
+            sync = buf.find(ESCAPE, pos, end)
+            if sync < 0:
+                pos = end
+                break
+            if sync != pos:
+                self.resyncs += 1
+            if sync + 1 >= end:
+                pos = sync
+                break
+            length = BODY_LENGTHS.get(buf[sync + 1])
+            if length is None:
+                # Escaped 0x1a seen out of sync, or an unknown type
+                pos = sync + (2 if buf[sync + 1] == ESCAPE else 1)
+                continue
+
+            first = sync + 2
+            stop = first + length
+            if stop > end:
+                pos = sync
+                break
+            if buf.find(ESCAPE, first, stop) < 0:
+                # Fast path: no escaped bytes in this frame
+                body = bytes(buf[first:stop])
+                raw_end = stop
+            else:
+                body, raw_end = self._unescape(buf, first, end, length)
+                if body is None:
+                    if raw_end < 0:
+                        pos = sync      # incomplete: wait for more
+                        break
+                    self.resyncs += 1
+                    pos = raw_end       # lone 0x1a mid-frame: restart there
+                    continue
+
+            kind = buf[sync + 1]
+            pos = raw_end
+            if kind == STATUS:
+                self.status_frames += 1
+                continue
+            frames.append((bytes(buf[sync:raw_end]), kind,
+                           int.from_bytes(body[:6], 'big'), body[6], body[7:]))
+
+        if pos >= end:
+            self.start = self.end = 0
+        else:
+            self.start = pos
+        return frames
+
+    @staticmethod
+    def _unescape(buf, pos, end, length):
+        """Unescape ``length`` body bytes from ``pos``.  Returns
+        (body, raw_end); (None, -1) if incomplete, (None, index) if a
+        lone 0x1a (next frame) interrupts this one."""
+        body = bytearray()
+        while len(body) < length:
+            need = length - len(body)
+            escape = buf.find(ESCAPE, pos, min(end, pos + need))
+            if escape < 0:
+                if pos + need > end:
+                    return None, -1
+                body += buf[pos:pos + need]
+                return bytes(body), pos + need
+            body += buf[pos:escape + 1]
+            if escape + 1 >= end:
+                return None, -1
+            if buf[escape + 1] != ESCAPE:
+                return None, escape
+            pos = escape + 2
+        return bytes(body), pos
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - vectorized JSON filtering (optional NumPy path)
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``CompiledFilter.match_json`` evaluates one aircraft object at a time:
+a handful of ``.get`` lookups, then the geofence maths (a haversine and
+a polygon ray cast per aircraft) in pure Python.  With thousands of
+aircraft in a snapshot that loop dominates the JSON modes.
+
+When NumPy is installed (``pip install numpy``; optional) a snapshot
+can instead be turned into columns once --
+
+    icao    uint32   24-bit address; '~' (non-ICAO) addresses get bit 24
+    alt     float64  alt_baro, else alt_geom; 'ground' is 0, NaN when unknown
+    lat     float64  NaN when unknown
+    lon     float64
+    gs      float64
+    track   float64
+    squawk  str
+
+-- and every rule of a ``CompiledFilter`` becomes a boolean mask over
+the whole snapshot: ICAO allowlist via ``isin``, the altitude band, the
+circular fence as a vectorized haversine, the polygon as one even-odd
+pass per edge, squawks via ``isin``.  The callsign prefix / regex rule
+has no sensible array form; it runs per object, but only over the
+aircraft every other rule already accepted.
+
+``ColumnarSnapshot`` builds each column lazily and at most once, so
+several filter profiles share the extraction cost.  ``ColumnarMatcher``
+gives the same answers as ``match_json`` (floating-point ties exactly on
+a fence edge aside) and raises TypeError / ValueError on field values it
+can't convert -- callers fall back to the per-object path for that
+snapshot.  Without NumPy, ``AVAILABLE`` is False and nothing here is
+used.
+"""
+
+import math
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from _aircraft import aircraft_altitude
+from _filters import EARTH_RADIUS_NM
+
+AVAILABLE = np is not None
+
+# Below this many aircraft the per-object path is as fast (column
+# extraction is itself a Python pass over the snapshot)
+DEFAULT_MIN_AIRCRAFT = 1000
+
+NO_ICAO = 0xFFFFFFFF            # missing / unparseable 'hex'
+NON_ICAO = 0x1000000            # '~xxxxxx' addresses (TIS-B / ADS-R)
+
+
+def icao_value(text):
+    """uint32 form of an aircraft.json 'hex' (or a configured ICAO)."""
+    if text.__class__ is not str:
+        return NO_ICAO
+    flag = 0
+    if text.startswith('~'):
+        flag = NON_ICAO
+        text = text[1:]
+    if len(text) != 6:
+        return NO_ICAO
+    try:
+        return int(text, 16) | flag
+    except ValueError:
+        return NO_ICAO
+
+
+class ColumnarSnapshot:
+    """One aircraft.json snapshot as NumPy columns, built on first use."""
+
+    def __init__(self, aircraft_list):
+        self.aircraft = aircraft_list
+        self.count = len(aircraft_list)
+        self._columns = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = getattr(self, '_build_' + name)()
+        return column
+
+    def _numbers(self, field):
+        # None -> NaN; a non-numeric string raises ValueError
+        return np.array([aircraft.get(field) for aircraft in self.aircraft], dtype=np.float64)
+
+    def _build_icao(self):
+        hexes = [aircraft.get('hex') for aircraft in self.aircraft]
+        try:
+            # Common case, every address 6 hex digits: decode them all in C
+            if set(map(len, hexes)) == {6}:
+                octets = np.frombuffer(bytes.fromhex(''.join(hexes)), dtype=np.uint8)
+                octets = octets.reshape(-1, 3).astype(np.uint32)
+                return (octets[:, 0] << 16) | (octets[:, 1] << 8) | octets[:, 2]
+        except (TypeError, ValueError):
+            pass
+        return np.fromiter(map(icao_value, hexes), dtype=np.uint32, count=self.count)
+
+    def _build_alt(self):
+        return np.array([aircraft_altitude(aircraft) for aircraft in self.aircraft], dtype=np.float64)
+
+    def _build_lat(self):
+        return self._numbers('lat')
+
+    def _build_lon(self):
+        return self._numbers('lon')
+
+    def _build_gs(self):
+        return self._numbers('gs')
+
+    def _build_track(self):
+        return self._numbers('track')
+
+    def _build_squawk(self):
+        return np.array([aircraft.get('squawk') or '' for aircraft in self.aircraft], dtype=str)
+
+    def select(self, mask):
+        """The aircraft objects where ``mask`` is True, in order."""
+        aircraft = self.aircraft
+        return [aircraft[i] for i in np.flatnonzero(mask).tolist()]
+
+
+class ColumnarMatcher:
+    """Vectorized twin of one CompiledFilter's JSON matcher.
+
+    ``matcher(snapshot)`` returns the aircraft the filter accepts.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.masks = []
+
+        if not compiled.filter_all:
+            allowed = np.array(sorted({icao_value(icao) for icao in compiled.icao_list} - {NO_ICAO}),
+                               dtype=np.uint32)
+            self.masks.append(lambda snap: np.isin(snap['icao'], allowed))
+
+        if compiled.altitude_filter_enabled:
+            floor = compiled.min_altitude
+            ceiling = compiled.max_altitude
+
+            def altitude_ok(snap):
+                # Unknown altitude passes, as in match_json
+                altitude = snap['alt']
+                known_ok = altitude <= ceiling
+                if floor is not None:
+                    known_ok &= altitude >= floor
+                return known_ok | np.isnan(altitude)
+            self.masks.append(altitude_ok)
+
+        if compiled.has_geofence:
+            self.masks.append(self._fence_mask(compiled))
+
+        if compiled.squawks:
+            squawks = np.array(sorted(compiled.squawks), dtype=str)
+            self.masks.append(lambda snap: np.isin(snap['squawk'], squawks))
+
+        # Strings and regexes stay per object (applied to survivors only)
+        self.callsign = None
+        if compiled.callsign_prefixes or compiled.callsign_regex:
+            prefixes = compiled.callsign_prefixes
+            search = re.compile(compiled.callsign_regex).search if compiled.callsign_regex else None
+
+            def callsign_ok(aircraft):
+                callsign = aircraft.get('flight')
+                if not callsign:
+                    return False
+                callsign = callsign.strip().upper()
+                if not callsign:
+                    return False
+                if prefixes and callsign.startswith(prefixes):
+                    return True
+                return search is not None and search(callsign) is not None
+            self.callsign = callsign_ok
+
+    @staticmethod
+    def _fence_mask(compiled):
+        center = compiled.geofence_center
+        radius = compiled.geofence_radius_nm
+        polygon = compiled.geofence_polygon
+        circle = center is not None and radius is not None
+        if circle:
+            p1 = math.radians(center[0])
+            cos_p1 = math.cos(p1)
+            l1 = math.radians(center[1])
+        if polygon:
+            lats = [p[0] for p in polygon]
+            lons = [p[1] for p in polygon]
+            bbox = (min(lats), max(lats), min(lons), max(lons))
+            # Horizontal edges never cross a ray of constant latitude
+            edges = [(polygon[i - 1], polygon[i]) for i in range(len(polygon))
+                     if polygon[i - 1][0] != polygon[i][0]]
+
+        def inside_fence(snap):
+            lat = snap['lat']
+            lon = snap['lon']
+            # NaN (unknown position) compares False everywhere below
+            inside = np.zeros(len(snap), dtype=bool)
+            if circle:
+                p2 = np.radians(lat)
+                a = (np.sin((p2 - p1) / 2) ** 2 +
+                     cos_p1 * np.cos(p2) * np.sin((np.radians(lon) - l1) / 2) ** 2)
+                distance = 2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+                inside |= distance <= radius
+            if polygon:
+                candidate = ((lat >= bbox[0]) & (lat <= bbox[1]) &
+                             (lon >= bbox[2]) & (lon <= bbox[3]))
+                rows = np.flatnonzero(candidate & ~inside)
+                if len(rows):
+                    plat = lat[rows]
+                    plon = lon[rows]
+                    odd = np.zeros(len(rows), dtype=bool)
+                    for (lat_j, lon_j), (lat_i, lon_i) in edges:
+                        spans = (lat_i > plat) != (lat_j > plat)
+                        cross = (lon_j - lon_i) * (plat - lat_i) / (lat_j - lat_i) + lon_i
+                        odd ^= spans & (plon < cross)
+                    inside[rows[odd]] = True
+            return inside
+        return inside_fence
+
+    def __call__(self, snapshot):
+        mask = None
+        for build in self.masks:
+            part = build(snapshot)
+            mask = part if mask is None else mask & part
+        matched = snapshot.aircraft if mask is None else snapshot.select(mask)
+        if self.callsign is not None:
+            matched = [aircraft for aircraft in matched if self.callsign(aircraft)]
+        return matched
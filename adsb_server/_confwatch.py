@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - config file watcher
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+The server used to re-read its INI file every 30 s whether or not it
+had changed (rebuilding the endpoint list and logging a line each time),
+and the web UI restarted the whole service to apply an edit.
+
+``ConfigWatcher`` notices edits as they happen instead: the config
+directory is watched with inotify (``_filewatch.Inotify``; IN_CLOSE_WRITE
+for in-place writes, IN_MOVED_TO for the web UI's write-and-rename), and
+where inotify is unavailable the file's (inode, mtime, size) is checked
+every few seconds.  Either way the content is hashed, so rewriting
+identical settings -- or touching the file -- applies nothing.
+
+``config_changes(old, new)`` names the sections whose options differ, so
+the server can log what changed and leave untouched filter profiles
+compiled as they are.  A new ConfigParser is built for every change:
+``ConfigParser.read`` merges into the existing one, so an option deleted
+from the file would otherwise keep its old value until restart.
+"""
+
+import hashlib
+import os
+import stat
+import tempfile
+import time
+
+from _filewatch import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
+
+STAT_INTERVAL = 2.0     # seconds between stat checks without inotify
+
+
+def config_changes(old, new):
+    """Sorted names of the sections added, removed or edited between two
+    ConfigParsers."""
+    sections = set(old.sections()) | set(new.sections())
+    return sorted(name for name in sections
+                  if (dict(old.items(name, raw=True)) if old.has_section(name) else None)
+                  != (dict(new.items(name, raw=True)) if new.has_section(name) else None))
+
+
+def write_config(config, path):
+    """Write a ConfigParser to ``path`` atomically (temp file in the same
+    directory, fsync, rename), so no watcher ever reads half a file.  The
+    file keeps its permissions and, where this process may set them, its
+    owner and group.  Raises OSError."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            config.write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass    # not root: the file becomes ours, as any rewrite would
+            os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ConfigWatcher:
+    """Change detection for one config file."""
+
+    def __init__(self, path, interval=STAT_INTERVAL):
+        self.path = path
+        self.directory, name = os.path.split(os.path.abspath(path))
+        self.name = os.fsencode(name)
+        self.interval = interval
+        self.digest = None
+        self.signature = None
+        self.next_check = 0.0
+        self.inotify = None
+        self.watching = False
+        try:
+            self.inotify = Inotify()
+        except OSError:
+            pass
+        self._ensure_watch()
+
+    def fileno(self):
+        """inotify descriptor to wait on, or None when stat polling."""
+        return self.inotify.fileno() if self.watching else None
+
+    def _ensure_watch(self):
+        if self.inotify is None or self.watching:
+            return
+        try:
+            self.inotify.add_watch(self.directory, IN_CLOSE_WRITE | IN_MOVED_TO)
+            self.watching = True
+        except OSError:
+            pass
+
+    def read(self):
+        """Read the file and remember its content as current.  Raises
+        OSError."""
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        self.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self.digest = hashlib.sha256(data).digest()
+        return data
+
+    def poll(self, now=None, force=False):
+        """The file's new content if it changed since the last ``read`` /
+        ``poll``, else None.  Cheap enough to call every loop iteration:
+        with inotify it is one non-blocking read of the event queue.
+        ``force`` (reload request) re-reads the file whatever changed."""
+        if force:
+            if self.watching:
+                self.inotify.read_names()   # consumed: this read covers them
+            try:
+                return self.read()
+            except OSError:
+                return None
+        if self.watching:
+            names = self.inotify.read_names()
+            if self.inotify.lost:
+                # Directory deleted or replaced: re-add the watch and check
+                self.inotify.lost = False
+                self.watching = False
+                self._ensure_watch()
+            elif self.name not in names:
+                return None
+        else:
+            if now is None:
+                now = time.monotonic()
+            if now < self.next_check:
+                return None
+            self.next_check = now + self.interval
+            self._ensure_watch()
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return None
+            if (st.st_ino, st.st_mtime_ns, st.st_size) == self.signature:
+                return None
+
+        digest = self.digest
+        try:
+            data = self.read()
+        except OSError:
+            return None     # mid-replace or deleted: the next event retries
+        return None if self.digest == digest else data
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+        self.watching = False
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - local control socket
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+A Unix-domain stream socket (``[Server] control_socket``, default
+``/run/adsb-server/control.sock``; blank disables it) takes one JSON
+request per line and answers with one JSON line::
+
+    {"cmd": "reload"}
+    {"cmd": "get-stats"}
+    {"cmd": "add-endpoint", "endpoint": {"ip": "10.0.0.5", "port": 30003, "filter": "fleet"}}
+    {"cmd": "remove-endpoint", "ip": "10.0.0.5", "port": 30003}
+
+    -> {"ok": true, ...}  /  {"ok": false, "error": "..."}
+
+``add-endpoint`` / ``remove-endpoint`` edit ``[Endpoints]`` in the
+config file (written atomically, entries renumbered) and apply it at
+once, so the file stays the one source of truth and the change survives
+a restart.  SIGHUP is the same as ``reload``: the handler only pokes a
+socketpair, and the reload runs on the main loop like every other.
+
+Connections are served from the engine's own loop: each is a watched
+reader, answered once its request line is complete, so a client that
+connects and says nothing costs a file descriptor, not a stall.  The
+socket is created mode 0660 -- the web UI runs as the same user.
+"""
+
+import json
+import os
+import socket
+import stat
+
+DEFAULT_CONTROL_SOCKET = '/run/adsb-server/control.sock'
+MAX_CONNECTIONS = 8
+MAX_REQUEST_BYTES = 64 * 1024
+REPLY_TIMEOUT = 1.0     # seconds a client gets to take its reply
+
+# [Endpoints] per-endpoint options, endpoint_<i>_<option>
+ENDPOINT_OPTIONS = ('name', 'ip', 'port', 'filter', 'format', 'transport', 'mtu', 'ttl',
+                    'multicast_interface', 'queue_bytes', 'queue_messages', 'drop_policy')
+
+
+def read_endpoints(config):
+    """[Endpoints] -> list of {option: value} in config order."""
+    count = config.getint('Endpoints', 'count', fallback=0)
+    return [{option: config.get('Endpoints', f'endpoint_{i}_{option}')
+             for option in ENDPOINT_OPTIONS if config.has_option('Endpoints', f'endpoint_{i}_{option}')}
+            for i in range(count)]
+
+
+def write_endpoints(config, endpoints):
+    """Replace the endpoint entries of [Endpoints] (other keys kept)."""
+    if not config.has_section('Endpoints'):
+        config.add_section('Endpoints')
+    for key in list(config['Endpoints']):
+        if key.startswith('endpoint_'):
+            config.remove_option('Endpoints', key)
+    config.set('Endpoints', 'count', str(len(endpoints)))
+    for i, endpoint in enumerate(endpoints):
+        for option in ENDPOINT_OPTIONS:
+            value = str(endpoint.get(option, '')).strip()
+            if value:
+                config.set('Endpoints', f'endpoint_{i}_{option}', value)
+
+
+class ControlServer:
+    """Listening socket, client connections and the SIGHUP wakeup."""
+
+    def __init__(self):
+        self.path = ''
+        self.sock = None
+        self.connections = {}   # socket -> bytearray (request so far)
+        self.requests = 0
+        # SIGHUP handler -> main loop (signal-safe: one non-blocking send)
+        self.wakeup, self._wakeup_w = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+    def configure_from(self, config, section='Server'):
+        self.path = config.get(section, 'control_socket', fallback=DEFAULT_CONTROL_SOCKET).strip()
+
+    @property
+    def wanted(self):
+        return self.path or None
+
+    def open(self):
+        """Bind and listen (non-blocking), replacing a stale socket file.
+        OSError propagates."""
+        try:
+            if stat.S_ISSOCK(os.lstat(self.path).st_mode):
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.path)
+            os.chmod(self.path, 0o660)
+            sock.listen(MAX_CONNECTIONS)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.bound = self.path
+        return sock
+
+    def close(self):
+        for conn in list(self.connections):
+            self.drop(conn)
+        if self.sock is not None:
+            try:
+                self.sock.close()
+                os.unlink(self.bound)
+            except OSError:
+                pass
+        self.sock = None
+
+    def notify(self):
+        """Wake the main loop (safe to call from a signal handler)."""
+        try:
+            self._wakeup_w.send(b'\0')
+        except OSError:
+            pass    # buffer full: a wakeup is already pending
+
+    def drain_wakeup(self):
+        try:
+            while self.wakeup.recv(256):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def accept(self):
+        """New connections (non-blocking), beyond MAX_CONNECTIONS closed."""
+        accepted = []
+        while self.sock is not None:
+            try:
+                conn = self.sock.accept()[0]
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            if len(self.connections) >= MAX_CONNECTIONS:
+                conn.close()
+                continue
+            conn.setblocking(False)
+            self.connections[conn] = bytearray()
+            accepted.append(conn)
+        return accepted
+
+    def receive(self, conn):
+        """Read what the client sent; returns the decoded request once its
+        line is complete, None while incomplete.  Raises ValueError on a
+        malformed or oversized request, EOFError if the client left."""
+        buf = self.connections[conn]
+        try:
+            data = conn.recv(MAX_REQUEST_BYTES)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError as e:
+            raise EOFError(str(e))
+        if not data:
+            if not buf:
+                raise EOFError("closed")
+            data = b'\n'    # request without a trailing newline
+        buf += data
+        line, sep, _ = buf.partition(b'\n')
+        if not sep:
+            if len(buf) > MAX_REQUEST_BYTES:
+                raise ValueError("request too long")
+            return None
+        request = json.loads(line)
+        if not isinstance(request, dict) or not isinstance(request.get('cmd'), str):
+            raise ValueError('expected {"cmd": ...}')
+        self.requests += 1
+        return request
+
+    def reply(self, conn, response):
+        """Send the JSON reply and close the connection."""
+        try:
+            conn.settimeout(REPLY_TIMEOUT)
+            conn.sendall(json.dumps(response, default=str).encode() + b'\n')
+        except OSError:
+            pass
+        self.drop(conn)
+
+    def drop(self, conn):
+        self.connections.pop(conn, None)
+        try:
+            conn.close()
+        except OSError:
+            pass
@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - non-blocking endpoint fan-out
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Why this exists
+---------------
+``forward_message`` used to call a blocking ``sendall`` on every endpoint
+socket in turn, from inside the dump1090 recv loop, with a 30 s socket
+timeout.  One stalled endpoint (typically a 4G backhaul dropping into a
+dead zone) therefore froze the whole SBS1 pipeline and every other
+feeder fell behind with it.
+
+The engine below puts every endpoint socket in non-blocking mode, gives
+each endpoint its own bounded queue, and only writes when the selector
+reports the socket writable.  A slow consumer fills its own queue --
+which then sheds load according to that endpoint's drop policy -- while
+the other endpoints keep draining at line rate.
+
+Threading model
+---------------
+The engine is driven from the server's main loop only, reconnects
+included: its ``ReconnectSupervisor`` (see ``_reconnect``) starts
+non-blocking connects from ``poll()`` and finishes them off the same
+selector, so no thread ever touches a socket the loop owns.
+
+Transports
+----------
+Endpoints are TCP clients unless ``endpoint_N_transport`` says ``udp``
+(unicast) or ``multicast`` (the endpoint ip is the group).  Datagram
+endpoints have no connection to lose: their socket is opened once, and
+the same queue is sent as datagrams of as many whole messages as fit in
+``endpoint_N_mtu`` bytes of payload (1472 = a 1500-byte Ethernet/Wi-Fi
+MTU less IP and UDP headers), so an SBS1 consumer still only ever sees
+complete lines.  A send error loses that datagram, never the endpoint.
+"""
+
+import selectors
+import socket
+import time
+
+from collections import deque
+
+from _metrics import Histogram
+from _reconnect import ReconnectSupervisor
+
+# Default per-endpoint queue bound.  ~256 KiB is several seconds of a
+# busy SBS1 feed (~300 msg/s * ~110 B) -- enough to ride out a short
+# stall without letting a dead peer grow memory without bound.
+DEFAULT_QUEUE_BYTES = 256 * 1024
+DEFAULT_QUEUE_MESSAGES = 0          # 0 = no message-count bound
+
+# Drop policies (config values for ``drop_policy``)
+DROP_OLDEST = 'drop_oldest'         # keep the freshest data (default)
+DROP_NEWEST = 'drop_newest'         # keep what's queued, refuse new data
+LATEST_PER_ICAO = 'latest_per_icao' # newest message supersedes the queued
+                                    # one for the same aircraft
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, LATEST_PER_ICAO)
+
+# Upper bound on one write batch.  Messages are 60-1000 bytes, so the
+# count cap (well under Linux's IOV_MAX of 1024) only bites for SBS1.
+MAX_WRITE_BYTES = 64 * 1024
+MAX_WRITE_MESSAGES = 512
+
+# Coalescing defaults ([Output] batch_window_ms / batch_max_bytes).  A
+# window of 0 still coalesces everything accepted from one dump1090
+# recv (or one JSON snapshot) into a single write per endpoint.
+DEFAULT_BATCH_WINDOW_MS = 0
+DEFAULT_BATCH_MAX_BYTES = 16 * 1024
+
+# Endpoint transports (``endpoint_N_transport``)
+TCP = 'tcp'
+UDP = 'udp'
+MULTICAST = 'multicast'
+TRANSPORTS = (TCP, UDP, MULTICAST)
+DEFAULT_DATAGRAM_SIZE = 1500 - 20 - 8   # MTU less IPv4 + UDP headers
+DEFAULT_MULTICAST_TTL = 1               # stay on the local network
+
+_HAVE_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+
+def stalled(queue, max_stall, now):
+    """Why an evictable endpoint (``'max_stall'``: a listen client) is
+    too slow to keep, or None: its queue had to drop, or its backlog
+    has waited more than ``max_stall`` seconds."""
+    if queue.dropped:
+        return f"buffer overflow ({queue.max_bytes} bytes)"
+    if queue.pending_since is not None and now - queue.pending_since > max_stall:
+        return f"backlog of {queue.backlog_bytes} bytes older than {max_stall:g}s"
+    return None
+
+
+def open_datagram_socket(host, port, transport, ttl=DEFAULT_MULTICAST_TTL, interface=''):
+    """Non-blocking UDP socket for a datagram endpoint, and the resolved
+    destination to ``sendto``.  Left unconnected, so an ICMP "port
+    unreachable" from an absent consumer never surfaces as an error.
+    OSError (including a failed lookup) propagates."""
+    address = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        if transport == MULTICAST:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            if interface:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock, address
+
+
+def send_datagrams(endpoint, logger):
+    """Send a udp / multicast endpoint's backlog, fire-and-forget: a send
+    error loses that datagram, never the socket, and is logged when it
+    changes rather than per datagram.  BlockingIOError (socket buffer
+    full) propagates -- the datagram stays in flight."""
+    queue = endpoint['queue']
+    while queue:
+        try:
+            queue.write_datagrams(endpoint['socket'], endpoint['address'])
+        except (BlockingIOError, InterruptedError):
+            raise
+        except OSError as e:
+            queue.reset_inflight()
+            error = str(e)
+            if endpoint.get('last_error') != error:
+                endpoint['last_error'] = error
+                logger.warning(f"{endpoint['transport'].upper()} send to {endpoint['ip']}:{endpoint['port']} "
+                               f"failed: {error} (datagrams are dropped until it recovers)")
+            continue
+        if endpoint.get('last_error') is not None:
+            endpoint['last_error'] = None
+            logger.info(f"{endpoint['transport'].upper()} send to {endpoint['ip']}:{endpoint['port']} recovered")
+
+
+class EndpointQueue:
+    """Bounded per-endpoint message queue with an explicit drop policy.
+
+    Messages are whole SBS1 lines / JSON objects and are never truncated,
+    so the stream seen by the endpoint stays line-aligned even while the
+    queue is shedding load.  The queue is bounded by bytes and/or message
+    count (0 disables a bound).
+
+    Counters (see ``stats()``):
+        queued      messages accepted into the queue
+        sent        messages completely written to the socket
+        dropped     messages discarded by the drop policy, or lost
+                    half-written when the connection failed
+        high_water  largest backlog seen, in messages and bytes
+        latency     Histogram of queue + send time, one observation per
+                    write batch (its oldest message), in seconds
+    """
+
+    def __init__(self, max_bytes=DEFAULT_QUEUE_BYTES,
+                 max_messages=DEFAULT_QUEUE_MESSAGES, policy=DROP_OLDEST):
+        self._entries = deque()     # [key, data, alive, queued_at]
+        self._latest = {}           # key -> newest live entry (latest_per_icao)
+        self._bytes = 0
+        self._count = 0
+        # Batch taken off the queue but not yet fully written: a deque of
+        # message buffers, the head possibly a memoryview of a partly
+        # sent message.
+        self._inflight = deque()
+        self._inflight_bytes = 0
+        self._inflight_since = 0.0  # queued_at of the batch's oldest message
+        self.pending_since = None   # monotonic time the backlog began
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.high_water = 0
+        self.high_water_bytes = 0
+        self.batches = 0
+        self.batched = 0
+        self.latency = Histogram()
+        # Datagram endpoints: largest payload; multi-line chunks bigger
+        # than this are queued line by line so datagrams can be packed
+        # without cutting a line (0: stream endpoint)
+        self.datagram_size = 0
+        self.configure(max_bytes, max_messages, policy)
+
+    def configure(self, max_bytes, max_messages, policy):
+        """(Re)apply limits -- called on every config reload."""
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"unknown drop policy {policy!r}")
+        if policy != LATEST_PER_ICAO:
+            self._latest.clear()
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.policy = policy
+
+    def __len__(self):
+        return self._count + len(self._inflight)
+
+    @property
+    def backlog_bytes(self):
+        return self._bytes + self._inflight_bytes
+
+    @property
+    def blocked(self):
+        """True while a batch is part-written (waiting for writability)."""
+        return bool(self._inflight)
+
+    def _over(self, extra_bytes, extra_count):
+        return ((self.max_bytes and self._bytes + extra_bytes > self.max_bytes) or
+                (self.max_messages and self._count + extra_count > self.max_messages))
+
+    def append(self, message, key=None, now=None):
+        """Queue ``message``, applying the drop policy if the queue is
+        full.  Returns False when the message itself was refused.  ``now``
+        (monotonic) lets a caller queueing on several endpoints read the
+        clock once."""
+        size = len(message)
+        if self.datagram_size and size > self.datagram_size and key is None:
+            lines = message.splitlines(True)
+            if len(lines) > 1:
+                return all([self.append(line, None, now) for line in lines])
+        if self._over(size, 1):
+            if self.policy == DROP_NEWEST or (self.max_bytes and size > self.max_bytes):
+                self.dropped += 1
+                return False
+            if self.policy == LATEST_PER_ICAO and key is not None:
+                older = self._latest.get(key)
+                if older is not None and older[2]:
+                    self._kill(older)
+            while self._count and self._over(size, 1):
+                self._kill(self._entries.popleft())
+                self._trim_dead()
+
+        if now is None:
+            now = time.monotonic()
+        if not self._count:
+            self.pending_since = now
+        entry = [key, message, True, now]
+        self._entries.append(entry)
+        if self.policy == LATEST_PER_ICAO and key is not None:
+            self._latest[key] = entry
+        self._bytes += size
+        self._count += 1
+        self.queued += 1
+        if self._count > self.high_water:
+            self.high_water = self._count
+        if self._bytes > self.high_water_bytes:
+            self.high_water_bytes = self._bytes
+        return True
+
+    def _kill(self, entry):
+        """Drop a queued entry (entries are tombstoned, not removed, so
+        superseding one in the middle of the deque stays O(1))."""
+        if not entry[2]:
+            return
+        entry[2] = False
+        self._bytes -= len(entry[1])
+        self._count -= 1
+        self.dropped += 1
+        if self._latest.get(entry[0]) is entry:
+            del self._latest[entry[0]]
+
+    def _trim_dead(self):
+        entries = self._entries
+        while entries and not entries[0][2]:
+            entries.popleft()
+
+    def _take(self, limit, max_messages=MAX_WRITE_MESSAGES):
+        """Pop live messages totalling at most ``limit`` bytes (always at
+        least one message) as the next write batch."""
+        entries = self._entries
+        taken = []
+        total = 0
+        while entries and len(taken) < max_messages:
+            entry = entries[0]
+            if not entry[2]:
+                entries.popleft()
+                continue
+            size = len(entry[1])
+            if taken and total + size > limit:
+                break
+            entries.popleft()
+            entry[2] = False
+            if self._latest.get(entry[0]) is entry:
+                del self._latest[entry[0]]
+            if not taken:
+                self._inflight_since = entry[3]
+            taken.append(entry[1])
+            total += size
+        self._bytes -= total
+        self._count -= len(taken)
+        if not self._count:
+            self.pending_since = None
+        if taken:
+            self.batches += 1
+            self.batched += len(taken)
+        return taken, total
+
+    def write_to(self, sock):
+        """Send as much as the (non-blocking) socket accepts, one
+        scatter-gather ``sendmsg`` per batch -- no join, no per-message
+        syscall.
+
+        Raises BlockingIOError / OSError from the socket unchanged.
+        """
+        inflight = self._inflight
+        while True:
+            if not inflight:
+                messages, total = self._take(MAX_WRITE_BYTES)
+                if not messages:
+                    return
+                inflight.extend(messages)
+                self._inflight_bytes = total
+            if _HAVE_SENDMSG:
+                sent = sock.sendmsg(inflight)
+            else:
+                sent = sock.send(b''.join(inflight))
+            partial = sent < self._inflight_bytes
+            self._advance(sent)
+            if partial:
+                return
+
+    def write_datagrams(self, sock, address):
+        """Send the backlog as datagrams of whole messages, each at most
+        ``datagram_size`` bytes (a single longer message goes alone).  A
+        datagram is sent whole or not at all, so one the socket refused
+        stays in flight for the next call.
+
+        Raises BlockingIOError / OSError from the socket unchanged.
+        """
+        inflight = self._inflight
+        while True:
+            if not inflight:
+                messages, total = self._take(self.datagram_size)
+                if not messages:
+                    return
+                inflight.extend(messages)
+                self._inflight_bytes = total
+            if _HAVE_SENDMSG:
+                sock.sendmsg(inflight, (), 0, address)
+            else:
+                sock.sendto(b''.join(inflight), address)
+            self._advance(self._inflight_bytes)
+
+    def _advance(self, count):
+        """Retire ``count`` written bytes from the in-flight batch."""
+        self.bytes_sent += count
+        self._inflight_bytes -= count
+        inflight = self._inflight
+        while count:
+            head = inflight[0]
+            if count >= len(head):
+                count -= len(head)
+                inflight.popleft()
+                self.sent += 1
+            else:
+                inflight[0] = memoryview(head)[count:]
+                return
+        if not inflight:
+            self.latency.observe(time.monotonic() - self._inflight_since)
+
+    def pop_chunk(self, limit=MAX_WRITE_BYTES):
+        """Dequeue up to ``limit`` bytes of whole messages as one chunk.
+
+        For stream writers that buffer partial writes themselves (the
+        asyncio engine): the messages count as sent once handed over.
+        Returns b'' when the queue is empty.
+        """
+        messages, total = self._take(limit)
+        if not messages:
+            return b''
+        self.sent += len(messages)
+        self.bytes_sent += total
+        self.latency.observe(time.monotonic() - self._inflight_since)
+        return b''.join(messages)
+
+    def reset_inflight(self):
+        """Discard a half-written batch after a connection failure.  The
+        next connection starts on a clean line boundary; whole messages
+        still queued are kept and go out once reconnected."""
+        self.dropped += len(self._inflight)
+        self._inflight.clear()
+        self._inflight_bytes = 0
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'backlog': len(self),
+            'backlog_bytes': self.backlog_bytes,
+            'queued': self.queued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'bytes_sent': self.bytes_sent,
+            'high_water': self.high_water,
+            'high_water_bytes': self.high_water_bytes,
+            'batches': self.batches,
+            'avg_batch': round(self.batched / self.batches, 1) if self.batches else 0.0,
+        }
+
+
+class FanoutEngine:
+    """Selector-driven writer for the endpoint sockets.
+
+    ``on_failure(endpoint, exc)`` is called (on the main thread) when a
+    socket errors out; the server uses it to close the socket and hand
+    the endpoint to ``supervisor`` for reconnecting.
+    """
+
+    def __init__(self, logger, on_failure):
+        self.logger = logger
+        self.on_failure = on_failure
+        self.selector = selectors.DefaultSelector()
+        self._writers = {}   # socket -> endpoint dict (write interest)
+        self._readers = {}   # socket -> callback, or None to report it from poll()
+        self._connecting = {}  # socket -> callback once the connect completes
+        self.supervisor = ReconnectSupervisor(self, logger)
+        self.configure_batching(DEFAULT_BATCH_WINDOW_MS, DEFAULT_BATCH_MAX_BYTES)
+
+    def configure_batching(self, window_ms, max_bytes):
+        """Latency/throughput knob: hold an endpoint's backlog for up to
+        ``window_ms`` (or until ``max_bytes`` are waiting) so it goes
+        out as fewer, larger writes."""
+        self.batch_window = max(0, window_ms) / 1000.0
+        self.batch_max_bytes = max_bytes
+
+    def configure_connects(self, timeout):
+        """Seconds a non-blocking endpoint connect may take."""
+        self.supervisor.connect_timeout = timeout
+
+    # ------------------------------------------------------------------
+    # Endpoint bookkeeping
+    # ------------------------------------------------------------------
+    def adopt(self, sock):
+        """Prepare a freshly connected endpoint socket for the engine."""
+        sock.setblocking(False)
+        return sock
+
+    def forget(self, endpoint):
+        """Drop the selector registration for an endpoint's socket and any
+        half-written chunk (queued whole messages are kept).  A connect
+        still in flight is abandoned."""
+        self.supervisor.cancel(endpoint)
+        sock = endpoint.get('socket')
+        if sock is not None and sock in self._writers:
+            self._unregister(sock)
+            del self._writers[sock]
+        endpoint['queue'].reset_inflight()
+
+    # ------------------------------------------------------------------
+    # Data path
+    # ------------------------------------------------------------------
+    def submit(self, endpoints, data, key=None):
+        """Queue ``data`` for every endpoint.  Nothing is written until
+        ``flush()`` -- callers submit a whole recv chunk or snapshot and
+        then flush once, so each endpoint gets one write per batch.
+
+        Endpoints that are currently disconnected still queue (up to their
+        bound), so a short backhaul outage is bridged instead of lost.
+        ``key`` identifies the aircraft for the latest_per_icao policy.
+        """
+        now = time.monotonic()
+        for endpoint in endpoints:
+            queue = endpoint['queue']
+            dropped = queue.dropped
+            queue.append(data, key, now)
+            if queue.dropped != dropped:
+                if endpoint.get('max_stall') is None:
+                    self._log_drops(endpoint)
+                elif endpoint.get('socket') is not None:
+                    # Listen client whose buffer overflowed: evict, don't shed
+                    self._fail(endpoint, TimeoutError(
+                        f"client too slow: {stalled(queue, endpoint['max_stall'], now)}"))
+
+    def flush(self, endpoints, now=None):
+        """Write every endpoint whose batch is due; returns the number of
+        seconds until the next batch falls due (None if nothing waits)."""
+        if now is None:
+            now = time.monotonic()
+        window = self.batch_window
+        next_due = None
+        for endpoint in endpoints:
+            queue = endpoint['queue']
+            if endpoint.get('socket') is None or not queue:
+                continue
+            max_stall = endpoint.get('max_stall')
+            if max_stall is not None:
+                reason = stalled(queue, max_stall, now)
+                if reason:
+                    self._fail(endpoint, TimeoutError(f"client too slow: {reason}"))
+                    continue
+            if queue.blocked:
+                continue
+            if window and queue.backlog_bytes < self.batch_max_bytes:
+                wait = queue.pending_since + window - now
+                if wait > 0:
+                    if next_due is None or wait < next_due:
+                        next_due = wait
+                    continue
+            self._write(endpoint)
+        return next_due
+
+    def _log_drops(self, endpoint):
+        queue = endpoint['queue']
+        # First drop, then every 10k -- a saturated link must not turn
+        # into a log flood.
+        if queue.dropped == 1 or queue.dropped % 10000 == 0:
+            self.logger.warning(
+                f"Queue full for {endpoint['ip']}:{endpoint['port']} "
+                f"({queue.policy}: {len(queue)} messages / {queue.backlog_bytes} bytes "
+                f"queued, {queue.dropped} dropped so far)")
+
+    def _write(self, endpoint):
+        """Write as much of the endpoint's queue as the socket accepts.
+        Once a socket is found writable its whole backlog counts as
+        due."""
+        sock = endpoint.get('socket')
+        if sock is None or not endpoint['queue']:
+            return
+        try:
+            if endpoint.get('transport', TCP) == TCP:
+                endpoint['queue'].write_to(sock)
+            else:
+                send_datagrams(endpoint, self.logger)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._fail(endpoint, e)
+
+    def _fail(self, endpoint, exc):
+        self.forget(endpoint)
+        self.on_failure(endpoint, exc)
+
+    # ------------------------------------------------------------------
+    # Event loop
+    # ------------------------------------------------------------------
+    def watch_reader(self, sock, callback=None):
+        """Include an input socket (dump1090) in ``poll()``.  With a
+        callback (listen socket, config watcher) ``poll()`` calls it when
+        the socket is readable instead of returning the socket -- unless
+        the callback returns True.  Callbacks run once this poll's writes
+        are done, so one that reloads the endpoints doesn't pull them
+        from under the loop."""
+        self.selector.register(sock, selectors.EVENT_READ)
+        self._readers[sock] = callback
+
+    def unwatch_reader(self, sock):
+        if sock in self._readers:
+            del self._readers[sock]
+            self._unregister(sock)
+
+    def watch_connect(self, sock, callback):
+        """Call back from ``poll()`` once a non-blocking connect on
+        ``sock`` completes (the socket turns writable, failed or not)."""
+        self.selector.register(sock, selectors.EVENT_WRITE)
+        self._connecting[sock] = callback
+
+    def unwatch_connect(self, sock):
+        if sock in self._connecting:
+            del self._connecting[sock]
+            self._unregister(sock)
+
+    def poll(self, endpoints, timeout):
+        """Wait up to ``timeout`` seconds, writing due batches and
+        resuming blocked endpoints as they become writable.
+
+        Returns the watched readers that have data (a list, empty -- so
+        false -- when the timeout or the next batch deadline expires
+        first).
+        """
+        for next_due in (self.supervisor.service(endpoints), self.flush(endpoints)):
+            if next_due is not None and next_due < timeout:
+                timeout = next_due
+        self._sync(endpoints)
+        if not self.selector.get_map():
+            # Nothing to wait on (no reader, no blocked writer)
+            time.sleep(timeout)
+            self.flush(endpoints)
+            return []
+        readable = []
+        callbacks = []
+        for key, events in self.selector.select(timeout):
+            if key.fileobj in self._readers:
+                callback = self._readers[key.fileobj]
+                if callback is None:
+                    readable.append(key.fileobj)
+                else:
+                    callbacks.append((key.fileobj, callback))
+            elif key.fileobj in self._connecting:
+                self._connecting[key.fileobj]()
+            elif events & selectors.EVENT_WRITE and key.data is not None:
+                self._write(key.data)
+        self.flush(endpoints)
+        for sock, callback in callbacks:
+            if callback():
+                readable.append(sock)
+        return readable
+
+    def wait(self, endpoints, duration):
+        """Sleep for ``duration`` seconds while servicing endpoint writes.
+
+        Used by the JSON modes in place of ``time.sleep`` so a poll
+        interval is also a drain interval.  Returns True early if a
+        watched reader becomes readable, False after the full duration.
+        """
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.poll(endpoints, remaining):
+                return True
+
+    def _sync(self, endpoints):
+        """Register write interest for exactly those endpoints with a
+        part-written batch (a due batch is written by ``flush()``
+        directly; an endpoint merely holding a not-yet-due backlog must
+        not be registered, or an always-writable socket would spin the
+        loop).  Endpoint dicts are rebuilt on every config reload (and
+        sockets replaced on reconnect), so this is recomputed on every
+        poll rather than tracked incrementally."""
+        wanted = {}
+        for endpoint in endpoints:
+            sock = endpoint.get('socket')
+            if sock is not None and endpoint['queue'].blocked:
+                wanted[sock] = endpoint
+
+        for sock in list(self._writers):
+            if sock not in wanted:
+                self._unregister(sock)
+                del self._writers[sock]
+
+        for sock, endpoint in wanted.items():
+            current = self._writers.get(sock)
+            try:
+                if current is None:
+                    self.selector.register(sock, selectors.EVENT_WRITE, endpoint)
+                elif current is not endpoint:
+                    self.selector.modify(sock, selectors.EVENT_WRITE, endpoint)
+            except (ValueError, KeyError, OSError) as e:
+                # Socket closed underneath us (fileno == -1)
+                self._fail(endpoint, e)
+                continue
+            self._writers[sock] = endpoint
+
+    def _unregister(self, sock):
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def close(self):
+        for sock in list(self._writers) + list(self._readers) + list(self._connecting):
+            self._unregister(sock)
+        self._writers.clear()
+        self._readers.clear()
+        self._connecting.clear()
+        self.selector.close()
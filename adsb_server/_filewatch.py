@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - aircraft.json file source
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+dump1090-fa already writes ``aircraft.json`` to its run directory
+(``/run/dump1090-fa``) -- lighttpd on :8080 only serves that file back
+to us.  With ``[Dump1090] json_source = file`` the JSON modes read it
+straight from disk instead:
+
+* the run directory is watched with inotify (via ctypes, no extra
+  package); dump1090 writes a temp file and renames it over
+  ``aircraft.json``, so IN_MOVED_TO / IN_CLOSE_WRITE on that name means
+  a complete new snapshot is in place
+* the file is read with one ``os.read`` of its ``fstat`` size -- a
+  single syscall and a single copy; an mmap would still need copying
+  into ``bytes`` for the JSON decoder, so it buys nothing here
+* an unchanged (inode, mtime, size) signature reports "unchanged",
+  exactly like an HTTP 304 from the keep-alive client
+
+``JsonFileSource`` exposes ``fileno()`` so the server's selector (or
+the asyncio loop) can sleep until dump1090 writes the next snapshot
+rather than on a fixed tick.  Where inotify is unavailable (non-Linux,
+or the directory doesn't exist yet) it degrades to stat polling and
+keeps retrying the watch.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import time
+
+import _serialize
+from _http import PollStats
+
+DEFAULT_JSON_FILE = '/run/dump1090-fa/aircraft.json'
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_IGNORED = 0x00008000         # watch removed (directory deleted/recreated)
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')   # wd, mask, cookie, len (struct inotify_event)
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    return _libc
+
+
+class Inotify:
+    """Minimal non-blocking inotify instance (Linux)."""
+
+    def __init__(self):
+        libc = _load_libc()
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify not available")
+        self._libc = libc
+        self.lost = False
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_names(self):
+        """Drain pending events; return the set of file names seen."""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                if mask & IN_IGNORED:
+                    self.lost = True
+                names.add(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class JsonFileSource:
+    """aircraft.json read from the local filesystem.
+
+    Same interface as the HTTP clients in ``_http``: ``fetch()`` returns
+    the aircraft list, or None when the file hasn't changed.
+    """
+
+    def __init__(self, path=DEFAULT_JSON_FILE):
+        self.path = path
+        self.directory, name = os.path.split(os.path.abspath(path))
+        self.name = os.fsencode(name)
+        self.signature = None
+        self.snapshot_time = None   # 'now' field of the last snapshot read
+        self.stats = PollStats()
+        self.inotify = None
+        self.watching = False
+        try:
+            self.inotify = Inotify()
+        except OSError:
+            pass
+        self._ensure_watch()
+
+    @property
+    def source(self):
+        return ('file', self.path)
+
+    @property
+    def url(self):
+        return self.path
+
+    def fileno(self):
+        """inotify descriptor to wait on, or None when stat polling."""
+        return self.inotify.fileno() if self.watching else None
+
+    def _ensure_watch(self):
+        if self.inotify is None or self.watching:
+            return
+        try:
+            self.inotify.add_watch(self.directory, IN_CLOSE_WRITE | IN_MOVED_TO)
+            self.watching = True
+            self.stats.connects += 1
+        except OSError:
+            pass    # directory not there yet; dump1090 will create it
+
+    def changed(self):
+        """Consume pending inotify events; True if aircraft.json was
+        replaced (events for dump1090's temp file are ignored)."""
+        if not self.watching:
+            return True
+        names = self.inotify.read_names()
+        if self.inotify.lost:
+            # dump1090 restarted and recreated its run directory
+            self.inotify.lost = False
+            self.watching = False
+            return True
+        return self.name in names
+
+    def fetch(self):
+        """Return the aircraft list, or None if unchanged since the last
+        fetch.  Raises OSError / ValueError."""
+        start = time.monotonic()
+        self._ensure_watch()
+        try:
+            fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+        except OSError:
+            self.stats.errors += 1
+            raise
+        try:
+            st = os.fstat(fd)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if signature == self.signature:
+                self.stats.record(time.monotonic() - start, 0, modified=False)
+                return None
+            data = os.read(fd, st.st_size + 1)
+            while len(data) < st.st_size:
+                # Regular files normally fill the whole read in one go
+                more = os.read(fd, st.st_size + 1 - len(data))
+                if not more:
+                    break
+                data += more
+        finally:
+            os.close(fd)
+
+        try:
+            snapshot = _serialize.loads(data)
+            if not isinstance(snapshot, dict):
+                raise ValueError(f"expected a JSON object, got {type(snapshot).__name__}")
+            aircraft = snapshot.get('aircraft', [])
+        except ValueError:
+            # Caught mid-write (non-atomic writer): try again next event
+            self.stats.errors += 1
+            self.stats.decode_errors += 1
+            raise
+        self.signature = signature
+        self.snapshot_time = snapshot.get('now')
+        self.stats.record(time.monotonic() - start, len(data))
+        return aircraft
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+        self.watching = False
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - compiled message filters
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``filter_message`` used to split every SBS1 line into all of its ~22
+fields just to read field 4 (ICAO) and field 11 (altitude), then test
+the ICAO with a linear ``in`` over a Python list.
+
+A ``CompiledFilter`` is built once per config reload.  It picks a
+matcher specialised for the rules that are actually enabled:
+
+* nothing to check (``mode = all``, no other rule): no parsing at all
+  -- callers test ``accept_all`` and skip the matcher entirely
+* otherwise the line is split only as far as the highest field a rule
+  needs (``bytes.split`` with a maxsplit runs in C and stops early,
+  which measured faster than Python-level comma scanning)
+* ICAOs are held in frozensets (bytes for SBS1, str for JSON), so a
+  10k-entry watchlist costs the same per message as a 4-entry one
+
+Rules ([Filter] keys, all optional)
+-----------------------------------
+mode / icao_list            ICAO allowlist ('all' or 'specific')
+altitude_filter_enabled     enables the altitude band below
+min_altitude / max_altitude band in ft (min blank = no floor)
+geofence_center             "lat,lon" of a circular fence ...
+geofence_radius_nm          ... and its radius in nautical miles
+geofence_polygon            "lat lon; lat lon; ..." (3+ vertices)
+squawks                     e.g. "7500,7600,7700"
+callsign_prefixes           e.g. "BAW,EZY"
+callsign_regex              Python regex, searched in the callsign
+msg_types                   SBS1 transmission types, e.g. "1,3,4"
+downlink_formats            Mode S downlink formats for Beast input, e.g. "11,17"
+
+All rules are AND-ed; inside the geofence means inside the circle OR
+the polygon, and the callsign rule passes on any prefix OR the regex.
+
+SBS1 spreads an aircraft's state over several message types (callsign
+in MSG,1, position in MSG,3, squawk in MSG,6), so the geofence, squawk
+and callsign rules are evaluated against the last known value per
+aircraft, remembered across messages (and config reloads).  Those rules
+must be positively satisfied -- an aircraft whose position is not yet
+known is outside every geofence.  The altitude band keeps its original
+meaning: enforced whenever the message carries an altitude.  The same
+evaluator runs over JSON aircraft objects, where every field is in the
+one object; ``msg_types`` only applies to SBS1.
+
+Beast input (raw Mode S frames) is filtered on the frame itself: the
+ICAO allowlist against the frame's address (see ``_beast.frame_icao``)
+and ``downlink_formats`` against its DF; Mode A/C frames carry neither
+and pass only when neither rule is set.  Decoding altitude, position,
+squawk or callsign from raw frames is not attempted, so a profile using
+those rules forwards no Beast frames at all (``beast_unsupported()``
+names them) -- never more than it asked for.
+
+Profiles
+--------
+[Filter] is the 'default' profile.  Further profiles live in sections
+named [Filter.<name>] with the same keys (nothing is inherited from
+[Filter]) and are selected per endpoint with ``endpoint_N_filter``.
+"""
+
+import math
+import re
+import time
+
+from _aircraft import aircraft_altitude
+from _beast import MODE_AC, downlink_format, frame_icao
+
+# SBS1 field indices
+SBS1_TYPE = 1
+SBS1_ICAO = 4
+SBS1_CALLSIGN = 10
+SBS1_ALTITUDE = 11
+SBS1_LAT = 14
+SBS1_LON = 15
+SBS1_SQUAWK = 17
+
+DEFAULT_PROFILE = 'default'
+PROFILE_PREFIX = 'Filter.'
+
+EARTH_RADIUS_NM = 3440.065
+
+# Per-aircraft SBS1 rule state: forget aircraft unheard for 10 minutes,
+# swept every STATE_SWEEP_EVERY updates.
+STATE_TTL = 600
+STATE_SWEEP_EVERY = 20000
+
+
+def _accept(_message):
+    return True
+
+
+def _accept_frame(_kind, _message):
+    return True
+
+
+def _reject_frame(_kind, _message):
+    return False
+
+
+def _parse_icao_list(text):
+    return [icao.strip().upper() for icao in text.split(',') if icao.strip()]
+
+
+def _parse_list(text):
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+
+def _is_hex(text):
+    try:
+        int(text, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_optional_int(config, section, key):
+    value = config.get(section, key, fallback='').strip()
+    return int(value) if value else None
+
+
+def _parse_point(text):
+    lat, lon = (float(v) for v in text.replace(',', ' ').split())
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"coordinate out of range: {text!r}")
+    return lat, lon
+
+
+def _parse_polygon(text):
+    points = [_parse_point(p) for p in text.split(';') if p.strip()]
+    if len(points) < 3:
+        raise ValueError("geofence_polygon needs at least 3 'lat lon' points")
+    return points
+
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Great-circle distance in nautical miles."""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Even-odd ray cast in the lat/lon plane (fine for fences that do
+    not straddle the antimeridian)."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross = (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i
+            if lon < cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class CompiledFilter:
+    """Immutable filter evaluator for SBS1 lines and JSON aircraft.
+
+    ``match_sbs1(line_bytes)`` and ``match_json(aircraft_dict)`` are
+    plain functions chosen at build time; they return True when the
+    message should be forwarded.  Both funnel into one rule evaluator,
+    ``evaluate(altitude, lat, lon, squawk, callsign)``.
+    """
+
+    def __init__(self, filter_all=True, icao_list=(), altitude_filter_enabled=False,
+                 max_altitude=10000, min_altitude=None, geofence_center=None,
+                 geofence_radius_nm=None, geofence_polygon=None, squawks=(),
+                 callsign_prefixes=(), callsign_regex='', msg_types=(), downlink_formats=()):
+        self.filter_all = filter_all
+        self.icao_list = list(icao_list)
+        self.altitude_filter_enabled = altitude_filter_enabled
+        self.max_altitude = max_altitude
+        self.min_altitude = min_altitude
+        self.geofence_center = geofence_center
+        self.geofence_radius_nm = geofence_radius_nm
+        self.geofence_polygon = geofence_polygon
+        self.squawks = frozenset(squawks)
+        self.callsign_prefixes = tuple(p.upper() for p in callsign_prefixes)
+        self.callsign_regex = callsign_regex
+        self.msg_types = frozenset(msg_types)
+        self.downlink_formats = frozenset(int(df) for df in downlink_formats)
+
+        self.icaos = frozenset(self.icao_list)
+        self.icaos_bytes = frozenset(icao.encode('ascii', errors='replace') for icao in self.icao_list)
+
+        # Rules needing more than the current message (see module doc)
+        self.has_geofence = bool(geofence_polygon) or (
+            geofence_center is not None and geofence_radius_nm is not None)
+        self.stateful = self.has_geofence or bool(self.squawks) or bool(
+            self.callsign_prefixes) or bool(callsign_regex)
+        self.state = {}             # ICAO bytes -> [callsign, squawk, lat, lon, seen]
+        self._state_updates = 0
+
+        self.accept_all = (filter_all and not altitude_filter_enabled and
+                           not self.stateful and not self.msg_types)
+
+        self.evaluate = self._build_evaluator()
+        self.match_sbs1 = self._build_sbs1()
+        self.match_json = self._build_json()
+        self.beast_accept_all = filter_all and not self.downlink_formats and not self.beast_unsupported()
+        self.match_beast = self._build_beast()
+
+    @classmethod
+    def from_config(cls, config, section='Filter'):
+        """Build from an INI section (same keys the web UI writes).
+
+        Raises ValueError on a malformed rule so a typo can't silently
+        widen or blank the filter.
+        """
+        filter_all = config.get(section, 'mode', fallback='all').lower() == 'all'
+        icao_list = [] if filter_all else _parse_icao_list(config.get(section, 'icao_list', fallback=''))
+
+        center = config.get(section, 'geofence_center', fallback='').strip()
+        radius = config.get(section, 'geofence_radius_nm', fallback='').strip()
+        polygon = config.get(section, 'geofence_polygon', fallback='').strip()
+        regex = config.get(section, 'callsign_regex', fallback='').strip()
+        try:
+            re.compile(regex)
+        except re.error as e:
+            raise ValueError(f"invalid callsign_regex {regex!r}: {e}")
+        downlink_formats = _parse_list(config.get(section, 'downlink_formats', fallback=''))
+        for df in downlink_formats:
+            if not df.isdigit() or int(df) > 24:
+                raise ValueError(f"invalid downlink format {df!r}")
+
+        return cls(
+            filter_all=filter_all,
+            icao_list=icao_list,
+            altitude_filter_enabled=config.getboolean(section, 'altitude_filter_enabled', fallback=False),
+            max_altitude=config.getint(section, 'max_altitude', fallback=10000),
+            min_altitude=_parse_optional_int(config, section, 'min_altitude'),
+            geofence_center=_parse_point(center) if center else None,
+            geofence_radius_nm=float(radius) if radius else None,
+            geofence_polygon=_parse_polygon(polygon) if polygon else None,
+            squawks=_parse_list(config.get(section, 'squawks', fallback='')),
+            callsign_prefixes=_parse_list(config.get(section, 'callsign_prefixes', fallback='')),
+            callsign_regex=regex,
+            msg_types=_parse_list(config.get(section, 'msg_types', fallback='')),
+            downlink_formats=downlink_formats,
+        )
+
+    def adopt_state(self, previous):
+        """Carry per-aircraft SBS1 state over from the filter this one
+        replaces, so a config reload doesn't forget known positions."""
+        if previous is not None and self.stateful and previous.stateful:
+            self.state = previous.state
+
+    def describe(self):
+        """Short human-readable summary for the 'Configuration loaded' log line."""
+        if self.filter_all:
+            what = 'ALL'
+        elif len(self.icao_list) <= 10:
+            what = str(self.icao_list)
+        else:
+            what = f"{len(self.icao_list)} ICAOs"
+        if self.altitude_filter_enabled:
+            if self.min_altitude is not None:
+                what += f" {self.min_altitude}-{self.max_altitude} ft"
+            else:
+                what += f" below {self.max_altitude} ft"
+        extras = [name for name, on in (
+            ('geofence', self.has_geofence), ('squawk', self.squawks),
+            ('callsign', self.callsign_prefixes or self.callsign_regex),
+            ('msg_types', self.msg_types), ('df', self.downlink_formats)) if on]
+        if extras:
+            what += f" +{'/'.join(extras)}"
+        return what
+
+    # ------------------------------------------------------------------
+    # Shared rule evaluator
+    # ------------------------------------------------------------------
+    def _build_evaluator(self):
+        checks = []
+
+        if self.altitude_filter_enabled:
+            floor = self.min_altitude
+            ceiling = self.max_altitude
+
+            def altitude_ok(altitude, lat, lon, squawk, callsign):
+                # Only enforced when the altitude is known
+                if altitude is None:
+                    return True
+                if altitude > ceiling:
+                    return False
+                return floor is None or altitude >= floor
+            checks.append(altitude_ok)
+
+        if self.has_geofence:
+            center = self.geofence_center
+            radius = self.geofence_radius_nm
+            polygon = self.geofence_polygon
+            if polygon:
+                lats = [p[0] for p in polygon]
+                lons = [p[1] for p in polygon]
+                bbox = (min(lats), max(lats), min(lons), max(lons))
+
+            def inside_fence(altitude, lat, lon, squawk, callsign):
+                if lat is None or lon is None:
+                    return False
+                if center is not None and radius is not None:
+                    if haversine_nm(center[0], center[1], lat, lon) <= radius:
+                        return True
+                if polygon:
+                    if bbox[0] <= lat <= bbox[1] and bbox[2] <= lon <= bbox[3]:
+                        return point_in_polygon(lat, lon, polygon)
+                return False
+            checks.append(inside_fence)
+
+        if self.squawks:
+            squawks = self.squawks
+
+            def squawk_ok(altitude, lat, lon, squawk, callsign):
+                return squawk in squawks
+            checks.append(squawk_ok)
+
+        if self.callsign_prefixes or self.callsign_regex:
+            prefixes = self.callsign_prefixes
+            search = re.compile(self.callsign_regex).search if self.callsign_regex else None
+
+            def callsign_ok(altitude, lat, lon, squawk, callsign):
+                if not callsign:
+                    return False
+                if prefixes and callsign.startswith(prefixes):
+                    return True
+                return search is not None and search(callsign) is not None
+            checks.append(callsign_ok)
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+
+        def evaluate(altitude, lat, lon, squawk, callsign):
+            for check in checks:
+                if not check(altitude, lat, lon, squawk, callsign):
+                    return False
+            return True
+        return evaluate
+
+    # ------------------------------------------------------------------
+    # SBS1
+    # ------------------------------------------------------------------
+    def _build_sbs1(self):
+        if self.accept_all:
+            return _accept
+
+        check_icao = not self.filter_all
+        icaos = self.icaos_bytes
+        msg_types = frozenset(t.encode('ascii') for t in self.msg_types)
+        evaluate = self.evaluate
+        stateful = self.stateful
+        altitude_rule = self.altitude_filter_enabled
+        # Split no further than the last field we look at
+        if stateful:
+            maxsplit = SBS1_SQUAWK + 1
+        elif altitude_rule:
+            maxsplit = SBS1_ALTITUDE + 1
+        else:
+            maxsplit = SBS1_ICAO + 1
+
+        def match(line):
+            fields = line.split(b',', maxsplit)
+            count = len(fields)
+
+            if msg_types and (count <= SBS1_TYPE or fields[0] != b'MSG' or
+                              fields[SBS1_TYPE] not in msg_types):
+                return False
+
+            if check_icao:
+                if count <= SBS1_ICAO:
+                    return False
+                icao = fields[SBS1_ICAO]
+                # dump1090 already emits upper-case hex; normalise only on a miss
+                if icao not in icaos and icao.strip().upper() not in icaos:
+                    return False
+
+            if evaluate is None:
+                return True
+
+            altitude = None
+            if altitude_rule and count > SBS1_ALTITUDE:
+                try:
+                    altitude = int(fields[SBS1_ALTITUDE])
+                except ValueError:
+                    pass
+
+            if not stateful:
+                return evaluate(altitude, None, None, None, None)
+            if count <= SBS1_ICAO:
+                return False
+            callsign, squawk, lat, lon = self._update_state(fields, count)
+            return evaluate(altitude, lat, lon, squawk, callsign)
+
+        return match
+
+    def _update_state(self, fields, count):
+        """Fold this message's callsign/squawk/position into the
+        aircraft's remembered state and return the merged values."""
+        icao = fields[SBS1_ICAO].strip().upper()
+        now = time.monotonic()
+        entry = self.state.get(icao)
+        if entry is None:
+            entry = self.state[icao] = [None, None, None, None, now]
+            self._state_updates += 1
+            if self._state_updates % STATE_SWEEP_EVERY == 0:
+                self._sweep(now)
+        entry[4] = now
+
+        if count > SBS1_CALLSIGN:
+            callsign = fields[SBS1_CALLSIGN].strip()
+            if callsign:
+                entry[0] = callsign.decode('ascii', errors='replace').upper()
+        if count > SBS1_SQUAWK:
+            squawk = fields[SBS1_SQUAWK].strip()
+            if squawk:
+                entry[1] = squawk.decode('ascii', errors='replace')
+        if count > SBS1_LON:
+            try:
+                lat = float(fields[SBS1_LAT])
+                lon = float(fields[SBS1_LON])
+            except ValueError:
+                pass
+            else:
+                entry[2] = lat
+                entry[3] = lon
+        return entry[0], entry[1], entry[2], entry[3]
+
+    def _sweep(self, now):
+        stale = [icao for icao, entry in self.state.items() if now - entry[4] > STATE_TTL]
+        for icao in stale:
+            del self.state[icao]
+
+    # ------------------------------------------------------------------
+    # Beast (raw Mode S frames)
+    # ------------------------------------------------------------------
+    def beast_unsupported(self):
+        """Rules that can't be evaluated on raw Beast frames."""
+        return [name for name, on in (
+            ('altitude', self.altitude_filter_enabled), ('geofence', self.has_geofence),
+            ('squawk', self.squawks), ('callsign', self.callsign_prefixes or self.callsign_regex)) if on]
+
+    def _build_beast(self):
+        if self.beast_accept_all:
+            return _accept_frame
+        if self.beast_unsupported():
+            return _reject_frame
+        check_icao = not self.filter_all
+        icaos = frozenset(int(icao, 16) for icao in self.icao_list if _is_hex(icao))
+        formats = self.downlink_formats
+
+        def match(kind, message):
+            if kind == MODE_AC or not message:
+                return False
+            if formats and downlink_format(message) not in formats:
+                return False
+            return not check_icao or frame_icao(message) in icaos
+
+        return match
+
+    # ------------------------------------------------------------------
+    # JSON (aircraft.json objects)
+    # ------------------------------------------------------------------
+    def _build_json(self):
+        if self.accept_all:
+            return _accept
+
+        check_icao = not self.filter_all
+        icaos = self.icaos
+        evaluate = self.evaluate
+
+        def match(aircraft):
+            if check_icao and aircraft.get('hex', '').upper() not in icaos:
+                return False
+            if evaluate is None:
+                return True
+            callsign = aircraft.get('flight')
+            # 'ground' is 0 ft, so a floor drops it as in SBS1 mode; only
+            # a missing altitude is unknown
+            return evaluate(aircraft_altitude(aircraft),
+                            aircraft.get('lat'), aircraft.get('lon'),
+                            aircraft.get('squawk'),
+                            callsign.strip().upper() if callsign else None)
+
+        return match
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - input stream framing
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``run_sbs1_mode`` used to decode every 4 KiB chunk to ``str``, grow a
+string buffer by concatenation and peel lines off with
+``buffer.split('\\n', 1)`` -- which copies the whole remainder once per
+line, i.e. quadratic in the number of lines per chunk -- before
+re-encoding every forwarded line back to UTF-8.
+
+``LineFramer`` keeps the SBS1 path in bytes end to end: the socket is
+read with ``recv_into`` straight into a fixed ``bytearray``, the run of
+complete lines is located by index and split in C, and each line's
+``bytes`` object is filtered and then queued for the endpoints
+unchanged -- no decode, no re-encode, no per-line remainder copies.
+"""
+
+RECV_SIZE = 64 * 1024           # max bytes per recv_into()
+FRAME_BUFFER_SIZE = 4 * RECV_SIZE
+
+
+class LineFramer:
+    """Incremental newline framer over a fixed-size ``bytearray``.
+
+    ``buf[start:end]`` holds received bytes not yet returned as lines.
+    Free space is reclaimed by sliding the unterminated tail back to the
+    front (same-length slice assignment, so the exported memoryview stays
+    valid).  A "line" that outgrows the whole buffer isn't SBS1 and is
+    discarded.
+    """
+
+    __slots__ = ('buf', 'view', 'start', 'end', 'discarded')
+
+    def __init__(self, size=FRAME_BUFFER_SIZE):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+        self.discarded = 0
+
+    def reset(self):
+        """Forget any partial line (new input connection)."""
+        self.start = self.end = 0
+
+    def _make_room(self, need):
+        if len(self.buf) - self.end >= need:
+            return
+        pending = self.end - self.start
+        if pending + need > len(self.buf):
+            # Unterminated run longer than the buffer -- not a real line.
+            self.discarded += 1
+            self.start = self.end = 0
+            return
+        self.buf[:pending] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def recv_into(self, sock, size=RECV_SIZE):
+        """Receive straight into the framing buffer; returns bytes read
+        (0 on EOF), exceptions from ``sock.recv_into`` propagate."""
+        self._make_room(size)
+        count = sock.recv_into(self.view[self.end:self.end + size])
+        self.end += count
+        return count
+
+    def feed(self, data):
+        """Append already-received bytes (asyncio StreamReader path)."""
+        size = len(data)
+        self._make_room(size)
+        self.buf[self.end:self.end + size] = data
+        self.end += size
+
+    def lines(self):
+        """Return the complete lines received so far, terminators included,
+        as a list of ``bytes``.
+
+        The last ``\n`` is located by index; everything before it is
+        copied out once and split in C (``bytes.splitlines`` honours
+        dump1090's CRLF as a single terminator).
+        """
+        last = self.buf.rfind(b'\n', self.start, self.end)
+        if last < 0:
+            return []
+        block = bytes(self.view[self.start:last + 1])
+        if last + 1 == self.end:
+            # Fully consumed -- rewind for free so _make_room rarely copies.
+            self.start = self.end = 0
+        else:
+            self.start = last + 1
+        return block.splitlines(True)
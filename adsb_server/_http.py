@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - aircraft.json HTTP client
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``fetch_json_data`` used to open a fresh ``urllib.request.urlopen``
+connection to lighttpd for every 1 s poll -- a TCP handshake, a new
+HTTP parser and a full body transfer each time, even when dump1090 had
+not rewritten the file.
+
+``JsonHttpClient`` keeps one HTTP/1.1 keep-alive connection open (the
+pool is a single slot: we only ever talk to one lighttpd) and makes
+conditional requests: the last ``ETag`` / ``Last-Modified`` go back as
+``If-None-Match`` / ``If-Modified-Since``, and a ``304 Not Modified``
+is reported as "unchanged" so the caller can skip the snapshot
+entirely.  A dropped keep-alive connection is retried once on a fresh
+socket before the poll counts as failed.
+
+``AsyncJsonHttpClient`` is the same protocol over asyncio streams for
+the asyncio engine.  Both keep ``PollStats``: request latency, body
+bytes per poll, 304s and reconnects.
+"""
+
+import asyncio
+import http.client
+import time
+
+import _serialize
+
+DEFAULT_PATH = '/data/aircraft.json'
+DEFAULT_TIMEOUT = 10    # seconds
+
+
+class PollStats:
+    """Counters for one JSON source."""
+
+    __slots__ = ('polls', 'not_modified', 'errors', 'decode_errors', 'connects', 'bytes',
+                 'last_bytes', 'last_latency', 'max_latency', 'total_latency')
+
+    def __init__(self):
+        self.polls = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.decode_errors = 0  # of errors: body wasn't valid aircraft.json
+        self.connects = 0
+        self.bytes = 0
+        self.last_bytes = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def record(self, latency, size, modified=True):
+        self.polls += 1
+        self.last_latency = latency
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+        self.last_bytes = size
+        self.bytes += size
+        if not modified:
+            self.not_modified += 1
+
+    def as_dict(self):
+        ok = max(1, self.polls)
+        return {
+            'polls': self.polls,
+            'not_modified': self.not_modified,
+            'errors': self.errors,
+            'decode_errors': self.decode_errors,
+            'connects': self.connects,
+            'bytes': self.bytes,
+            'bytes_per_poll': round(self.bytes / ok),
+            'last_latency_ms': round(self.last_latency * 1000, 1),
+            'avg_latency_ms': round(self.total_latency / ok * 1000, 1),
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+        }
+
+
+class _Conditional:
+    """Validator bookkeeping shared by the sync and asyncio clients."""
+
+    def __init__(self, host, port, path=DEFAULT_PATH, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.etag = None
+        self.last_modified = None
+        self.snapshot_time = None   # 'now' field of the last snapshot decoded
+        self.stats = PollStats()
+
+    @property
+    def source(self):
+        return ('http', self.host, self.port)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def request_headers(self):
+        headers = {'Host': f"{self.host}:{self.port}", 'Accept-Encoding': 'identity'}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def remember(self, etag, last_modified):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def decode(self, body):
+        """aircraft list from a response body (bytes, no str round trip).
+        ValueError unless it is a JSON object."""
+        data = _serialize.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+        self.snapshot_time = data.get('now')
+        return data.get('aircraft', [])
+
+
+class JsonHttpClient(_Conditional):
+    """Blocking keep-alive client (threaded engine)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def fetch(self):
+        """Return the aircraft list, or None if unchanged since the last
+        fetch.  Raises OSError / http.client.HTTPException / ValueError."""
+        start = time.monotonic()
+        try:
+            try:
+                response = self._request()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # lighttpd closed the idle keep-alive socket; once more, fresh
+                self.close()
+                response = self._request()
+            body = response.read()
+        except Exception:
+            self.stats.errors += 1
+            self.close()
+            raise
+
+        if response.will_close:
+            self.close()
+        if response.status == 304:
+            self.stats.record(time.monotonic() - start, 0, modified=False)
+            return None
+        if response.status != 200:
+            self.stats.errors += 1
+            raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+        try:
+            aircraft = self.decode(body)
+        except ValueError:
+            self.stats.errors += 1
+            self.stats.decode_errors += 1
+            raise
+        self.remember(response.getheader('ETag'), response.getheader('Last-Modified'))
+        self.stats.record(time.monotonic() - start, len(body))
+        return aircraft
+
+    def _request(self):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.stats.connects += 1
+        self.conn.request('GET', self.path, headers=self.request_headers())
+        return self.conn.getresponse()
+
+
+class AsyncJsonHttpClient(_Conditional):
+    """Keep-alive client over asyncio streams (asyncio engine).
+
+    Handles the response shapes lighttpd produces for a static file:
+    Content-Length bodies, chunked bodies and close-delimited bodies.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def fetch(self):
+        """Return the aircraft list, or None if unchanged (see JsonHttpClient.fetch)."""
+        start = time.monotonic()
+        try:
+            try:
+                status, headers, body = await asyncio.wait_for(self._exchange(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                status, headers, body = await asyncio.wait_for(self._exchange(), self.timeout)
+        except Exception:
+            self.stats.errors += 1
+            self.close()
+            raise
+
+        if status == 304:
+            self.stats.record(time.monotonic() - start, 0, modified=False)
+            return None
+        if status != 200:
+            self.stats.errors += 1
+            raise http.client.HTTPException(f"HTTP {status}")
+        try:
+            aircraft = self.decode(body)
+        except ValueError:
+            self.stats.errors += 1
+            self.stats.decode_errors += 1
+            raise
+        self.remember(headers.get('etag'), headers.get('last-modified'))
+        self.stats.record(time.monotonic() - start, len(body))
+        return aircraft
+
+    async def _exchange(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.stats.connects += 1
+        request = f"GET {self.path} HTTP/1.1\r\n" + ''.join(
+            f"{name}: {value}\r\n" for name, value in self.request_headers().items()) + "\r\n"
+        self.writer.write(request.encode('latin-1'))
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise ConnectionError(f"bad status line {lines[0]!r}")
+        status = int(parts[1])
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        if status == 304 or status == 204:
+            body = b''
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        else:
+            body = await self.reader.read()
+            self.close()
+            return status, headers, body
+
+        if headers.get('connection', '').lower() == 'close' or parts[0] == 'HTTP/1.0':
+            self.close()
+        return status, headers, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            if size == 0:
+                # trailers, if any, end with an empty line
+                while (await self.reader.readuntil(b'\r\n')) != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - multi-receiver ingest
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+The streaming modes (sbs1, beast) used to read exactly one dump1090 at
+``[Dump1090] host``.  Vessels with a receiver fore and aft run a
+dump1090 on each, and most transmissions are heard by both.
+
+``[Dump1090] sources`` lists every stream to read::
+
+    sources = fore=127.0.0.1, aft=192.168.4.20:30003
+
+(``name=`` optional, port defaulting to sbs1_port / beast_port for the
+mode).  Left blank, the single ``host`` is read as before.
+
+With two or more sources, ``Deduplicator`` merges them into one clean
+stream: a message is dropped when the same content, from a *different*
+source, was seen within ``dedup_window`` seconds.  Repeats from the same
+source pass, so a single receiver's stream is never thinned.  The key
+is the ICAO plus the message content:
+
+* SBS1: transmission type, ICAO and fields 10+ (callsign onwards) --
+  the generated/logged timestamps differ between receivers and are
+  left out
+* Beast: the Mode S message bytes (address included; MLAT timestamp and
+  signal level left out)
+
+The cache is an insertion-ordered dict: expired keys are popped from the
+front as new ones arrive, and past ``dedup_max_entries`` the oldest is
+evicted early, so memory stays bounded however busy the sky is.
+
+Each ``InputSource`` keeps ``SourceStats``: messages, duplicates
+dropped, bytes, connects and the message rate since the last report.
+"""
+
+import time
+from collections import OrderedDict
+
+from _reconnect import Link
+
+DEFAULT_DEDUP_WINDOW = 1.0          # seconds
+DEFAULT_DEDUP_MAX_ENTRIES = 20000
+SOURCE_RETRY_BASE = 5.0             # first source retry delay (s), doubling to 60
+
+
+def parse_sources(text, default_host, default_port):
+    """``[Dump1090] sources`` -> [(name, host, port)]; blank means the
+    single default host.  Raises ValueError on a malformed entry."""
+    sources = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, address = item.partition('=')
+        if not sep:
+            name, address = '', name
+        host, sep, port = address.strip().rpartition(':')
+        if not sep:
+            host, port = port, ''
+        host = host.strip().strip('[]')
+        port = int(port) if port.strip() else default_port
+        if not host or not 0 < port < 65536:
+            raise ValueError(f"invalid source {item!r}")
+        sources.append((name.strip() or f"{host}:{port}", host, port))
+    if not sources:
+        sources.append((f"{default_host}:{default_port}", default_host, default_port))
+    return sources
+
+
+def sbs1_key(line):
+    """Dedup key of an SBS1 line: type + ICAO + content, no timestamps."""
+    fields = line.split(b',', 10)
+    if len(fields) < 11:
+        return line.rstrip()
+    return b','.join((fields[1], fields[4], fields[10].rstrip()))
+
+
+def beast_key(frame):
+    """Dedup key of a BeastFramer frame: the Mode S / Mode A/C message."""
+    return frame[4]
+
+
+class SourceStats:
+    """Counters for one input stream."""
+
+    __slots__ = ('messages', 'duplicates', 'bytes', 'connects', 'parse_errors', 'connected_at',
+                 'rate', '_last_messages', '_last_time')
+
+    def __init__(self):
+        self.messages = 0
+        self.duplicates = 0
+        self.bytes = 0
+        self.connects = 0
+        self.parse_errors = 0   # overlong lines / Beast resyncs
+        self.connected_at = None
+        self.rate = 0.0         # msg/s between the last two ticks
+        self._last_messages = 0
+        self._last_time = time.monotonic()
+
+    def tick(self, now=None):
+        """Close the rate window.  Only the resource monitor ticks, once per
+        check, so ``rate`` always covers its interval however often the
+        counters are read (control socket, /metrics)."""
+        if now is None:
+            now = time.monotonic()
+        elapsed = now - self._last_time
+        self.rate = (self.messages - self._last_messages) / elapsed if elapsed > 0 else 0.0
+        self._last_messages = self.messages
+        self._last_time = now
+
+    def as_dict(self):
+        """Counters plus the rate as of the last ``tick``."""
+        return {
+            'messages': self.messages,
+            'duplicates': self.duplicates,
+            'duplicate_pct': round(100.0 * self.duplicates / self.messages, 1) if self.messages else 0.0,
+            'bytes': self.bytes,
+            'connects': self.connects,
+            'parse_errors': self.parse_errors,
+            'connected': self.connected_at is not None,
+            'rate': round(self.rate, 1),
+        }
+
+
+class InputSource:
+    """One dump1090 stream: address, socket/framer while connected,
+    connect state (a ``_reconnect.Link``) and stats."""
+
+    __slots__ = ('name', 'host', 'port', 'sock', 'framer', 'link', 'stats')
+
+    def __init__(self, name, host, port):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.framer = None
+        self.link = Link()
+        self.stats = SourceStats()
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    def __str__(self):
+        return self.address if self.name == self.address else f"{self.name} ({self.address})"
+
+
+class Deduplicator:
+    """Time-windowed, size-bounded duplicate filter across sources."""
+
+    def __init__(self, window=DEFAULT_DEDUP_WINDOW, max_entries=DEFAULT_DEDUP_MAX_ENTRIES):
+        self.entries = OrderedDict()    # key -> (expires, source name), oldest first
+        self.duplicates = 0
+        self.expired = 0
+        self.evicted = 0
+        self.configure(window, max_entries)
+
+    def configure(self, window, max_entries):
+        self.window = max(0.0, window)
+        self.max_entries = max(1, max_entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def duplicate(self, key, source, now):
+        """True if ``key`` came from another source within the window;
+        otherwise records it for ``source`` and returns False."""
+        entries = self.entries
+        entry = entries.get(key)
+        if entry is not None:
+            if entry[0] > now and entry[1] != source:
+                self.duplicates += 1
+                return True
+            entries.move_to_end(key)
+        entries[key] = (now + self.window, source)
+
+        # Expire from the front (entries are in expiry order), then cap
+        while entries:
+            expires = next(iter(entries.values()))[0]
+            if expires > now:
+                break
+            entries.popitem(last=False)
+            self.expired += 1
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def stats(self):
+        return {'cached': len(self.entries), 'duplicates': self.duplicates,
+                'expired': self.expired, 'evicted': self.evicted}
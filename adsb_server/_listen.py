@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - embedded TCP listen server
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Endpoints in ``[Endpoints]`` are pushed to: adding a consumer means a
+config edit and a reload.  With ``[Listen] enabled = true`` the server
+also accepts connections itself, like dump1090's port 30003, and serves
+the filtered stream to whoever connects -- handy for ad-hoc consumers
+on the hotspot LAN::
+
+    [Listen]
+    enabled = true
+    bind = 0.0.0.0
+    port = 30103
+    max_clients = 16
+    client_buffer_bytes = 131072
+    slow_client_timeout = 10
+    filter = default
+    format =
+
+(``format`` blank: the input's own, as for endpoints.)
+
+Each accepted client becomes an endpoint dict with ``'client': True``
+and its own bounded ``EndpointQueue`` on a non-blocking socket, so it
+rides the same fan-out as the configured endpoints.  Unlike them it is
+never reconnected: a client is dropped when its socket errors, and
+evicted (``'max_stall'``, see ``_fanout.stalled``) once its buffer
+overflows or its backlog is older than ``slow_client_timeout`` -- a
+slow consumer loses its connection rather than thinning its own
+stream.  Clients beyond ``max_clients`` are closed straight after
+accept, once any that have hung up are pruned.
+
+Clients join a live stream: in the JSON modes with ``change_only`` an
+aircraft reaches a new client at its next change or keyframe, and a
+``json_delta`` client gets full records from the next full interval.
+"""
+
+import socket
+
+from _fanout import EndpointQueue, DROP_OLDEST
+from _filters import DEFAULT_PROFILE
+
+DEFAULT_LISTEN_PORT = 30103
+DEFAULT_MAX_CLIENTS = 16
+DEFAULT_CLIENT_BUFFER = 128 * 1024
+DEFAULT_SLOW_CLIENT_TIMEOUT = 10.0  # seconds
+LISTEN_BACKLOG = 16
+
+
+def peer_closed(sock):
+    """True if the client hung up (or its socket is gone)."""
+    try:
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return True
+
+
+class ListenServer:
+    """Listening socket, [Listen] settings and client bookkeeping."""
+
+    def __init__(self):
+        self.sock = None
+        self.address = None     # (bind, port) the socket is bound to
+        self.enabled = False
+        self.bind = '0.0.0.0'
+        self.port = DEFAULT_LISTEN_PORT
+        self.max_clients = DEFAULT_MAX_CLIENTS
+        self.buffer_bytes = DEFAULT_CLIENT_BUFFER
+        self.slow_timeout = DEFAULT_SLOW_CLIENT_TIMEOUT
+        self.profile = DEFAULT_PROFILE
+        self.format = ''
+        self.accepted = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def configure_from(self, config, section='Listen'):
+        self.enabled = config.getboolean(section, 'enabled', fallback=False)
+        self.bind = config.get(section, 'bind', fallback='0.0.0.0').strip() or '0.0.0.0'
+        self.port = config.getint(section, 'port', fallback=DEFAULT_LISTEN_PORT)
+        self.max_clients = max(1, config.getint(section, 'max_clients', fallback=DEFAULT_MAX_CLIENTS))
+        self.buffer_bytes = config.getint(section, 'client_buffer_bytes', fallback=DEFAULT_CLIENT_BUFFER)
+        self.slow_timeout = config.getfloat(section, 'slow_client_timeout', fallback=DEFAULT_SLOW_CLIENT_TIMEOUT)
+        self.profile = config.get(section, 'filter', fallback=DEFAULT_PROFILE).strip() or DEFAULT_PROFILE
+        self.format = config.get(section, 'format', fallback='').strip().lower()
+
+    @property
+    def wanted(self):
+        """(bind, port) the socket should be bound to, None if disabled."""
+        return (self.bind, self.port) if self.enabled else None
+
+    def open(self):
+        """Bind and listen (non-blocking).  OSError propagates."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.bind, self.port))
+            sock.listen(LISTEN_BACKLOG)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.address = (self.bind, self.port)
+        return sock
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.address = None
+
+    def accept(self, connected):
+        """Accept every pending connection; returns the new client
+        endpoints, closing those over ``max_clients`` (``connected``
+        being the number already served)."""
+        clients = []
+        while self.sock is not None:
+            try:
+                sock, (host, port) = self.sock.accept()[:2]
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break   # e.g. EMFILE: leave the rest in the backlog
+            if connected + len(clients) >= self.max_clients:
+                self.rejected += 1
+                sock.close()
+                continue
+            sock.setblocking(False)
+            self.accepted += 1
+            clients.append(self.client(sock, host, port))
+        return clients
+
+    def client(self, sock, host, port):
+        """Endpoint dict for an accepted connection."""
+        return {
+            'name': 'listen client',
+            'ip': host,
+            'port': port,
+            'socket': sock,
+            'conn': sock,           # the raw socket, whatever 'socket' becomes
+            'queue': EndpointQueue(self.buffer_bytes, 0, DROP_OLDEST),
+            'filter': self.profile,
+            'format': self.format,
+            'client': True,
+            'max_stall': self.slow_timeout,
+        }
+
+    def stats(self, connected):
+        return {'listening': self.sock is not None, 'port': self.port, 'clients': connected,
+                'max_clients': self.max_clients, 'accepted': self.accepted,
+                'rejected': self.rejected, 'evicted': self.evicted}
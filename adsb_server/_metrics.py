@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - Prometheus metrics
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Telemetry used to be a handful of log lines every five minutes, and
+nothing at all per message in SBS1 mode.  ``[Metrics]`` (on by default,
+loopback only) now serves every counter the server keeps as Prometheus
+text on ``http://127.0.0.1:9105/metrics``::
+
+    [Metrics]
+    enabled = true
+    bind = 127.0.0.1
+    port = 9105
+
+There is no registry to update on the data path.  The counters are the
+plain integer attributes the pipeline already kept (``EndpointQueue``,
+``SourceStats``, ``Link``, ``PollStats`` ...), plus a few new ones of
+the same kind: per-profile filter checked / matched counts, parse
+errors, and a send-latency ``Histogram`` per endpoint.  The main loop is
+the only writer and the scrape is served from that same loop, so
+nothing needs a lock and a scrape never sees a half-applied batch.  All
+the work -- walking the endpoints, formatting the text -- happens at
+scrape time.
+
+Send latency is observed once per write batch: how long the oldest
+message in it waited between being queued and its last byte reaching
+the socket (the asyncio engine: the transport).
+"""
+
+import socket
+
+from bisect import bisect_left
+
+DEFAULT_METRICS_BIND = '127.0.0.1'
+DEFAULT_METRICS_PORT = 9105
+MAX_CONNECTIONS = 4
+MAX_REQUEST_BYTES = 8 * 1024
+REPLY_TIMEOUT = 1.0     # seconds a scraper gets to take the response
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; queue + send latency of a healthy endpoint is well under 1 ms,
+# a backed-up one can wait out a whole reconnect backoff
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-on-render histogram: ``observe`` is a bisect and two
+    additions."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last: above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def buckets(self):
+        """[(upper bound, observations <= bound)], +Inf last."""
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsWriter:
+    """One scrape's worth of Prometheus text exposition (format 0.0.4)."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text, samples):
+        """``samples``: [(labels dict, value)]; a family without samples
+        is left out."""
+        samples = list(samples)
+        if not samples:
+            return
+        lines = self.lines
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def counter(self, name, help_text, samples):
+        self.family(name, 'counter', help_text, samples)
+
+    def gauge(self, name, help_text, samples):
+        self.family(name, 'gauge', help_text, samples)
+
+    def histogram(self, name, help_text, samples):
+        """``samples``: [(labels dict, Histogram)]."""
+        samples = list(samples)
+        if not samples:
+            return
+        lines = self.lines
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in samples:
+            for bound, count in histogram.buckets():
+                lines.append(f"{name}_bucket{_labels(dict(labels, le=_number(bound)))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    def summary(self, name, help_text, samples):
+        """Quantile-less summary: ``samples`` [(labels, (sum, count))]."""
+        samples = list(samples)
+        if not samples:
+            return
+        lines = self.lines
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} summary")
+        for labels, (total, count) in samples:
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    def text(self):
+        return ('\n'.join(self.lines) + '\n').encode('utf-8')
+
+
+class MetricsServer:
+    """The [Metrics] HTTP socket: one GET per connection, answered and
+    closed (HTTP/1.0), served from the engine's loop."""
+
+    def __init__(self):
+        self.sock = None
+        self.address = None     # (bind, port) the socket is bound to
+        self.enabled = True
+        self.bind = DEFAULT_METRICS_BIND
+        self.port = DEFAULT_METRICS_PORT
+        self.connections = {}   # socket -> bytearray (request so far)
+        self.scrapes = 0
+
+    def configure_from(self, config, section='Metrics'):
+        self.enabled = config.getboolean(section, 'enabled', fallback=True)
+        self.bind = config.get(section, 'bind', fallback=DEFAULT_METRICS_BIND).strip() or DEFAULT_METRICS_BIND
+        self.port = config.getint(section, 'port', fallback=DEFAULT_METRICS_PORT)
+
+    @property
+    def wanted(self):
+        """(bind, port) the socket should be bound to, None if disabled."""
+        return (self.bind, self.port) if self.enabled else None
+
+    def open(self):
+        """Bind and listen (non-blocking).  OSError propagates."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.bind, self.port))
+            sock.listen(MAX_CONNECTIONS)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.address = (self.bind, self.port)
+        return sock
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.address = None
+
+    def accept(self):
+        """New connections (non-blocking), beyond MAX_CONNECTIONS closed."""
+        accepted = []
+        while self.sock is not None:
+            try:
+                conn = self.sock.accept()[0]
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            if len(self.connections) >= MAX_CONNECTIONS:
+                conn.close()
+                continue
+            conn.setblocking(False)
+            self.connections[conn] = bytearray()
+            accepted.append(conn)
+        return accepted
+
+    def receive(self, conn):
+        """Read the request; returns (method, path) once its head is
+        complete, None while incomplete.  Raises ValueError on a
+        malformed or oversized request, EOFError if the client left."""
+        buf = self.connections[conn]
+        try:
+            data = conn.recv(MAX_REQUEST_BYTES)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError as e:
+            raise EOFError(str(e))
+        if not data:
+            raise EOFError("closed")
+        buf += data
+        if b'\r\n\r\n' not in buf and b'\n\n' not in buf:
+            if len(buf) > MAX_REQUEST_BYTES:
+                raise ValueError("request too long")
+            return None
+        parts = bytes(buf.split(b'\n', 1)[0]).decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ValueError("not an HTTP request")
+        return parts[0], parts[1].split('?', 1)[0]
+
+    def respond(self, conn, status, body, content_type=CONTENT_TYPE, head_only=False):
+        """Send the response and close the connection."""
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        head = (f"HTTP/1.0 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode('latin-1')
+        try:
+            conn.settimeout(REPLY_TIMEOUT)
+            conn.sendall(head if head_only else head + body)
+        except OSError:
+            pass
+        if status == 200:
+            self.scrapes += 1
+        self.drop(conn)
+
+    def drop(self, conn):
+        self.connections.pop(conn, None)
+        try:
+            conn.close()
+        except OSError:
+            pass
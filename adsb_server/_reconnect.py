@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - endpoint reconnect supervisor
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+A failed send used to spawn a one-shot reconnect thread with a blocking
+connect -- at most five at a time, the rest silently never retried until
+the next dump1090 reconnect re-ran ``connect_to_endpoints``.
+
+Every TCP endpoint now carries a ``Link`` (``endpoint['link']``, kept
+across config reloads like its queue) in one of three states:
+
+* ``connected`` -- the endpoint has a socket
+* ``connecting`` -- a non-blocking connect is in flight
+* ``backoff`` -- waiting for ``retry_at``; the delay doubles per failed
+  attempt (1 s up to 60 s, 'equal jitter') and resets on connect
+
+``ReconnectSupervisor`` drives the threaded engine: ``service()`` runs
+on every fan-out poll, starts the connects that are due and times out
+the ones that hang (after ``[Server] connect_timeout``, 5 s -- much
+shorter than the 30 s socket timeout, a peer that takes longer to
+answer a SYN isn't worth waiting on); the in-flight socket sits in the
+engine's selector for write readiness, so completion is picked up by
+the same ``select()`` that services the endpoints and the main loop
+never blocks on a connect.  The asyncio engine keeps its own writer
+coroutines but records the same transitions on the same ``Link``, so
+both report per-endpoint state, uptime, connects and reconnects.
+
+dump1090 sources (``InputSource.link``) connect the same way through
+``ReconnectSupervisor.dial``, so a receiver that doesn't answer can't
+stall the loop serving the live ones.
+"""
+
+import errno
+import os
+import random
+import socket
+import time
+
+CONNECTED = 'connected'
+CONNECTING = 'connecting'
+BACKOFF = 'backoff'
+
+DEFAULT_CONNECT_TIMEOUT = 5.0   # seconds, [Server] connect_timeout
+BACKOFF_BASE = 1.0          # first retry delay (s)
+BACKOFF_CAP = 60.0          # longest retry delay (s)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with 'equal jitter': half fixed, half random,
+    so a fleet of endpoints that dropped together doesn't reconnect in
+    lock-step."""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class Link:
+    """Connection state and counters of one TCP endpoint."""
+
+    __slots__ = ('state', 'attempt', 'retry_at', 'deadline', 'pending',
+                 'connected_at', 'connects', 'failures', 'last_error')
+
+    def __init__(self):
+        self.state = BACKOFF
+        self.attempt = 0
+        self.retry_at = 0.0         # due straight away
+        self.deadline = 0.0         # connect timeout while connecting
+        self.pending = None         # socket of the in-flight connect
+        self.connected_at = None    # monotonic
+        self.connects = 0
+        self.failures = 0
+        self.last_error = None
+
+    def connecting(self, now, timeout, sock=None):
+        self.state = CONNECTING
+        self.deadline = now + timeout
+        self.pending = sock
+
+    def up(self, now):
+        self.state = CONNECTED
+        self.attempt = 0
+        self.pending = None
+        self.connected_at = now
+        self.connects += 1
+        self.last_error = None
+
+    def down(self, now, error, base=BACKOFF_BASE):
+        """Connect failed or connection lost: back off, returns the delay."""
+        delay = backoff_delay(self.attempt, base)
+        self.attempt += 1
+        self.state = BACKOFF
+        self.retry_at = now + delay
+        self.pending = None
+        self.connected_at = None
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        return delay
+
+    @property
+    def reconnects(self):
+        return max(0, self.connects - 1)
+
+    def uptime(self, now=None):
+        if self.connected_at is None:
+            return 0.0
+        return (time.monotonic() if now is None else now) - self.connected_at
+
+    def stats(self, now=None):
+        return {'state': self.state, 'uptime': round(self.uptime(now), 1), 'connects': self.connects,
+                'reconnects': self.reconnects, 'failures': self.failures, 'last_error': self.last_error}
+
+
+class ReconnectSupervisor:
+    """Non-blocking (re)connects for the threaded engine's TCP endpoints.
+
+    ``engine`` is the FanoutEngine whose selector watches the connects
+    (``watch_connect`` / ``unwatch_connect``) and whose ``adopt`` takes
+    over a connected socket.
+    """
+
+    def __init__(self, engine, logger):
+        self.engine = engine
+        self.logger = logger
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+
+    def service(self, endpoints, now=None):
+        """Start due connects and expire hung ones.  Returns seconds until
+        the next retry or timeout falls due (None if nothing waits)."""
+        if now is None:
+            now = time.monotonic()
+        next_due = None
+        for endpoint in endpoints:
+            link = endpoint.get('link')
+            if link is None or endpoint.get('socket') is not None:
+                continue
+            if link.state == CONNECTED:
+                # Socket dropped without going through lost() (e.g. reload)
+                link.down(now, 'closed')
+            if link.state == BACKOFF and now >= link.retry_at:
+                self.start(endpoint, now)
+            if link.state == CONNECTING and now >= link.deadline:
+                self._failed(endpoint, TimeoutError('connect timed out'), now)
+            due = link.deadline if link.state == CONNECTING else link.retry_at
+            if link.state != CONNECTED and (next_due is None or due - now < next_due):
+                next_due = max(0.0, due - now)
+        return next_due
+
+    def start(self, endpoint, now=None):
+        """Begin a non-blocking connect to ``endpoint``."""
+        self.dial(endpoint['link'], endpoint['ip'], endpoint['port'],
+                  lambda: self._connected(endpoint),
+                  lambda error: self._failed(endpoint, error), now)
+
+    def dial(self, link, host, port, connected, failed, now=None):
+        """Begin a non-blocking connect for ``link``.  ``connected()``
+        (the socket is ``link.pending``) or ``failed(error)`` is called
+        once it completes -- possibly straight away."""
+        if now is None:
+            now = time.monotonic()
+        sock = None
+        try:
+            # Resolve first: a numeric IP (the usual case) never blocks
+            family, kind, proto, _, address = socket.getaddrinfo(
+                host, port, socket.AF_INET, socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, kind, proto)
+            sock.setblocking(False)
+            err = sock.connect_ex(address)
+        except OSError as e:
+            if sock is not None:
+                sock.close()
+            failed(e)
+            return
+        if err == 0:
+            link.connecting(now, self.connect_timeout, sock)
+            connected()
+        elif err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            link.connecting(now, self.connect_timeout, sock)
+            self.engine.watch_connect(sock, lambda: self._finish(link, sock, connected, failed))
+        else:
+            sock.close()
+            failed(OSError(err, os.strerror(err)))
+
+    def _finish(self, link, sock, connected, failed):
+        """Selector reported the in-flight connect writable: done, one way
+        or the other."""
+        self.engine.unwatch_connect(sock)
+        if link.pending is not sock:
+            return
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            failed(OSError(err, os.strerror(err)))
+        else:
+            connected()
+
+    def _connected(self, endpoint):
+        link = endpoint['link']
+        sock = link.pending
+        reconnect = link.connects > 0
+        link.up(time.monotonic())
+        endpoint['socket'] = self.engine.adopt(sock)
+        self.logger.info(f"{'Reconnected' if reconnect else 'Connected'} to endpoint {endpoint['ip']}:{endpoint['port']}")
+
+    def _failed(self, endpoint, error, now=None):
+        link = endpoint['link']
+        first = link.attempt == 0
+        self.abandon(link)
+        delay = link.down(time.monotonic() if now is None else now, error)
+        # First failure at WARNING, the retries quietly
+        log = self.logger.warning if first else self.logger.debug
+        log(f"Failed to connect to {endpoint['ip']}:{endpoint['port']}: {link.last_error} (retry in {delay:.1f}s)")
+
+    def lost(self, endpoint, error):
+        """An established connection failed (socket already closed)."""
+        link = endpoint.get('link')
+        if link is not None:
+            delay = link.down(time.monotonic(), error)
+            self.logger.info(f"Reconnecting to {endpoint['ip']}:{endpoint['port']} in {delay:.1f}s")
+
+    def cancel(self, endpoint):
+        """Abandon an in-flight connect (endpoint removed, server stopping)."""
+        link = endpoint.get('link')
+        if link is not None:
+            self.abandon(link)
+
+    def abandon(self, link):
+        """Close ``link``'s in-flight connect, if any; it is left in
+        backoff (already due unless ``down()`` says otherwise)."""
+        sock = link.pending
+        link.pending = None
+        if link.state == CONNECTING:
+            link.state = BACKOFF
+        if sock is not None:
+            self.engine.unwatch_connect(sock)
+            try:
+                sock.close()
+            except OSError:
+                pass
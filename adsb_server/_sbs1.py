@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - aircraft.json to SBS1 (BaseStation) conversion
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``json_to_sbs1`` used to call ``datetime.utcnow()`` and two
+``strftime``s for every aircraft, then pack everything it knew into a
+single, truncated ``MSG,3`` line -- callsign and ground speed included,
+which BaseStation consumers don't expect there.
+
+``SBS1Converter.convert(aircraft_list, now)`` converts a whole snapshot
+and emits what dump1090 itself would send on port 30003, one line per
+message type that has data (22 fields each):
+
+    MSG,1   identification      callsign
+    MSG,3   airborne position   altitude, lat, lon, on-ground flag
+    MSG,4   airborne velocity   ground speed, track, vertical rate
+    MSG,5   surveillance alt    altitude (aircraft without a position)
+    MSG,6   surveillance ID     squawk, alert / emergency / SPI flags
+
+Timestamps are derived rather than sampled: ``now`` is the snapshot's
+own ``now`` field (when dump1090 wrote it), "generated" is ``now`` minus
+the aircraft's ``seen`` age (``seen_pos`` for positions) and "logged" is
+``now``.  The formatted date/time for each distinct age is worked out
+once per snapshot -- dump1090 reports ages in 0.1 s steps, so a few
+dozen strings cover hundreds of aircraft -- and every line is a
+prebuilt ``%`` template.
+"""
+
+import time
+
+# Fields 6-9 (date/time generated, date/time logged) share one '%s' slot
+_COLLAPSED = 3
+
+
+def _template(msg_type, *fields):
+    row = ['MSG', str(msg_type), '1', '1', '%s', '1', '%s'] + [''] * 12
+    for field in fields:
+        row[field - _COLLAPSED] = '%s'
+    return ','.join(row) + '\n'
+
+
+# SBS1 field numbers (0-based, as in _filters)
+CALLSIGN, ALTITUDE, SPEED, TRACK, LAT, LON, VRATE, SQUAWK = 10, 11, 12, 13, 14, 15, 16, 17
+ALERT, EMERGENCY, SPI, GROUND = 18, 19, 20, 21
+
+MSG1 = _template(1, CALLSIGN)
+MSG3 = _template(3, ALTITUDE, LAT, LON, GROUND)
+MSG4 = _template(4, SPEED, TRACK, VRATE)
+MSG5 = _template(5, ALTITUDE, ALERT, SPI, GROUND)
+MSG6 = _template(6, SQUAWK, ALERT, EMERGENCY, SPI, GROUND)
+
+_FLAG = {1: '-1', 0: '0'}     # True / False hash alike
+
+
+class SBS1Converter:
+    """Batch aircraft.json -> SBS1 converter (see module docstring)."""
+
+    def __init__(self):
+        self.errors = 0
+        self._clock = {}        # whole UTC second -> (date, 'HH:MM:SS')
+
+    def _clock_for(self, second):
+        clock = self._clock.get(second)
+        if clock is None:
+            if len(self._clock) > 256:
+                self._clock.clear()
+            tm = time.gmtime(second)
+            clock = self._clock[second] = ('%04d/%02d/%02d' % tm[:3], '%02d:%02d:%02d' % tm[3:6])
+        return clock
+
+    def _stamp(self, t):
+        second, ms = divmod(int(round(t * 1000)), 1000)
+        date, hms = self._clock_for(second)
+        return '%s,%s.%03d' % (date, hms, ms)
+
+    def convert(self, aircraft_list, now=None):
+        """One entry per aircraft, in order: its SBS1 lines as bytes, or
+        None when there is nothing to send (no hex / no data)."""
+        if now is None:
+            now = time.time()
+        logged = self._stamp(now)
+        stamps = {}             # age -> 'gen date,gen time,log date,log time'
+
+        def stamp(age):
+            value = stamps.get(age)
+            if value is None:
+                try:
+                    value = self._stamp(now - age) + ',' + logged
+                except TypeError:
+                    value = logged + ',' + logged
+                stamps[age] = value
+            return value
+
+        result = []
+        for aircraft in aircraft_list:
+            try:
+                result.append(self._aircraft(aircraft, stamp))
+            except Exception:
+                self.errors += 1
+                result.append(None)
+        return result
+
+    @staticmethod
+    def _aircraft(aircraft, stamp):
+        icao = aircraft.get('hex')
+        if not icao:
+            return None
+        icao = icao.upper()
+        get = aircraft.get
+        age = stamp(get('seen', 0))
+        lines = []
+
+        callsign = get('flight')
+        if callsign:
+            callsign = callsign.strip()
+            if callsign:
+                lines.append(MSG1 % (icao, age, callsign))
+
+        altitude = get('alt_baro')
+        if altitude is None:
+            altitude = get('alt_geom')
+        if altitude == 'ground':
+            altitude, ground = '', '-1'
+        elif altitude is None:
+            altitude, ground = '', ''
+        else:
+            ground = '0'
+
+        lat = get('lat')
+        lon = get('lon')
+        if lat is not None and lon is not None:
+            lines.append(MSG3 % (icao, stamp(get('seen_pos', get('seen', 0))), altitude, lat, lon, ground))
+        elif altitude != '' or ground:
+            lines.append(MSG5 % (icao, age, altitude, _FLAG.get(get('alert'), ''),
+                                 _FLAG.get(get('spi'), ''), ground))
+
+        speed = get('gs')
+        track = get('track')
+        if speed is not None or track is not None:
+            rate = get('baro_rate')
+            if rate is None:
+                rate = get('geom_rate')
+            lines.append(MSG4 % (icao, age, '' if speed is None else speed,
+                                 '' if track is None else track, '' if rate is None else rate))
+
+        squawk = get('squawk')
+        if squawk:
+            emergency = get('emergency')
+            lines.append(MSG6 % (icao, age, squawk, _FLAG.get(get('alert'), ''),
+                                 '' if emergency is None else _FLAG[emergency not in ('none', '')],
+                                 _FLAG.get(get('spi'), ''), ground))
+
+        return ''.join(lines).encode('utf-8') if lines else None
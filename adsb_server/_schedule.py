@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - JSON poll scheduler
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Both JSON loops used to ``sleep(1)`` *after* fetching and processing,
+so the real period was 1 s + fetch + processing and slid steadily
+against dump1090's own 1 s refresh of aircraft.json -- some polls saw a
+snapshot that was almost a second old, others fetched the same one
+twice.
+
+``PollScheduler`` keeps deadlines on the monotonic clock:
+
+* fixed period -- each deadline is the previous *deadline* plus the
+  period, so time spent fetching never accumulates as drift; missed
+  slots are skipped rather than bunched up
+* phase locking -- each snapshot's ``now`` field says when dump1090
+  wrote it; the age at fetch time is steered towards a small margin
+  (fetch just after each refresh).  The correction wraps modulo the
+  period, so polling slightly *before* a refresh (stale snapshot, age
+  ~ one period) nudges later, not a whole period earlier, and is damped
+  by half per poll against network noise
+* idle backoff -- after ``idle_polls`` consecutive polls with no
+  aircraft, no change or an error, the period doubles per poll up to
+  ``max_interval``; the first busy snapshot snaps it back
+
+``stats()`` exports snapshot age and scheduling jitter (actual fetch
+start minus deadline).
+"""
+
+import time
+
+DEFAULT_POLL_INTERVAL = 1.0     # seconds, dump1090-fa's aircraft.json cadence
+DEFAULT_MAX_POLL_INTERVAL = 8.0
+DEFAULT_IDLE_POLLS = 5
+DEFAULT_MARGIN = 0.05           # target snapshot age at fetch (s)
+PHASE_GAIN = 0.5
+
+
+class PollScheduler:
+    """Monotonic deadline scheduler for aircraft.json polling."""
+
+    def __init__(self, interval=DEFAULT_POLL_INTERVAL, max_interval=DEFAULT_MAX_POLL_INTERVAL,
+                 idle_polls=DEFAULT_IDLE_POLLS, margin=DEFAULT_MARGIN):
+        self.configure(interval, max_interval, idle_polls, margin)
+        self.period = self.interval
+        self.deadline = None
+        self.idle = 0
+        self.polls = 0
+        self.last_age = None
+        self.total_age = 0.0
+        self.aged = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+
+    def configure(self, interval, max_interval, idle_polls, margin=DEFAULT_MARGIN):
+        self.interval = max(0.1, interval)
+        self.max_interval = max(self.interval, max_interval)
+        self.idle_polls = max(1, idle_polls)
+        self.margin = margin
+
+    def configure_from(self, config, section='Dump1090'):
+        self.configure(
+            config.getfloat(section, 'poll_interval', fallback=DEFAULT_POLL_INTERVAL),
+            config.getfloat(section, 'max_poll_interval', fallback=DEFAULT_MAX_POLL_INTERVAL),
+            config.getint(section, 'idle_polls', fallback=DEFAULT_IDLE_POLLS),
+        )
+        if not self.idle:
+            self.period = self.interval
+
+    def delay(self, now=None):
+        """Seconds until the next poll is due (0 if already due)."""
+        if self.deadline is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self.deadline - now)
+
+    def started(self, now=None):
+        """Call as a fetch begins; records how late it is against its deadline."""
+        if now is None:
+            now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now
+        jitter = now - self.deadline
+        self.last_jitter = jitter
+        self.total_jitter += abs(jitter)
+        if abs(jitter) > self.max_jitter:
+            self.max_jitter = abs(jitter)
+        self.polls += 1
+
+    def observe(self, aircraft, snapshot_time, now=None, wall=None):
+        """Plan the next deadline from the outcome of this poll.
+
+        ``aircraft`` is the fetched list (None: unchanged, []: empty or
+        failed); ``snapshot_time`` the snapshot's ``now`` field, if any.
+        """
+        if now is None:
+            now = time.monotonic()
+        if wall is None:
+            wall = time.time()
+        if self.deadline is None:
+            self.deadline = now
+
+        # Idle backoff
+        if not aircraft:
+            self.idle += 1
+            if self.idle >= self.idle_polls:
+                self.period = min(self.max_interval, self.period * 2)
+        else:
+            self.idle = 0
+            self.period = self.interval
+
+        # Phase: steer snapshot age at fetch time towards the margin
+        correction = 0.0
+        if snapshot_time:
+            age = wall - snapshot_time
+            self.last_age = age
+            self.total_age += age
+            self.aged += 1
+            if self.period == self.interval:
+                correction = self.margin - age
+                half = self.interval / 2
+                correction = (correction + half) % self.interval - half
+                correction *= PHASE_GAIN
+
+        deadline = self.deadline + self.period + correction
+        if deadline <= now:
+            # Overran: skip missed slots instead of firing back to back
+            missed = int((now - deadline) / self.period) + 1
+            deadline += missed * self.period
+        self.deadline = deadline
+
+    def stats(self):
+        return {
+            'polls': self.polls,
+            'period_s': round(self.period, 3),
+            'idle_polls': self.idle,
+            'snapshot_age_ms': None if self.last_age is None else round(self.last_age * 1000, 1),
+            'avg_snapshot_age_ms': round(self.total_age / self.aged * 1000, 1) if self.aged else None,
+            'jitter_ms': round(self.last_jitter * 1000, 1),
+            'avg_jitter_ms': round(self.total_jitter / max(1, self.polls) * 1000, 1),
+            'max_jitter_ms': round(self.max_jitter * 1000, 1),
+        }
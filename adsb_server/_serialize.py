@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+ADS-B Server - JSON serializer backend
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Each JSON poll used to ``json.loads(body.decode('utf-8'))`` the whole
+snapshot and then ``json.dumps()`` every forwarded aircraft separately
+-- with 200+ aircraft in view that was the bulk of ``run_json_mode``'s
+CPU time.
+
+This module picks one backend at import time:
+
+* ``orjson`` when installed (``pip install orjson``; optional) -- C
+  decode straight from bytes, encode straight to bytes
+* otherwise the stdlib: ``json.loads`` fed bytes and one pre-built
+  compact ``json.JSONEncoder`` (no ", "/": " padding on the wire)
+
+The speedup comes from orjson alone (about 5x per snapshot in
+``benchmarks/bench_json.py``).  The stdlib fallback runs at the old
+path's speed -- ``json.dumps`` with default arguments already reused a
+cached C encoder -- and is there so the same code runs without orjson.
+Both backends emit the same compact form, so receivers see identical
+lines whichever is installed.  ``dumps_lines`` serializes a whole
+filtered set in one call.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+
+    loads = orjson.loads
+
+    def dumps_line(obj):
+        """One object as a newline-terminated UTF-8 line (bytes)."""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    def dumps_lines(objs):
+        """Each object as its own newline-terminated line (list of bytes)."""
+        dumps = orjson.dumps
+        option = orjson.OPT_APPEND_NEWLINE
+        return [dumps(obj, option=option) for obj in objs]
+else:
+    BACKEND = 'json'
+
+    # json.loads accepts bytes and detects the UTF encoding itself
+    loads = json.loads
+
+    _encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+    def dumps_line(obj):
+        """One object as a newline-terminated UTF-8 line (bytes)."""
+        return (_encode(obj) + '\n').encode('utf-8')
+
+    def dumps_lines(objs):
+        """Each object as its own newline-terminated line (list of bytes).
+
+        Encoded as one newline-joined string and split back in C, so the
+        UTF-8 encode runs once per batch instead of once per aircraft.
+        """
+        if not objs:
+            return []
+        return ('\n'.join(map(_encode, objs)) + '\n').encode('utf-8').splitlines(True)
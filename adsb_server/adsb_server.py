@@ -20,34 +20,100 @@ import logging
 import configparser
 import os
 import sys
-import json
-import urllib.request
+import http.client
+import ipaddress
 from datetime import datetime, timedelta
 import psutil  # For resource monitoring
 
+from _beast import BeastFramer, frame_icao
+from _confwatch import ConfigWatcher, config_changes, write_config
+from _control import (ControlServer, read_endpoints, write_endpoints, ENDPOINT_OPTIONS,
+                      DEFAULT_CONTROL_SOCKET)
+from _aircraft import AircraftTable, DeltaEncoder, DEFAULT_FULL_INTERVAL, DEFAULT_DELTA_EXCLUDE
+import _columnar
+from _filters import CompiledFilter, DEFAULT_PROFILE, PROFILE_PREFIX
+from _framing import LineFramer
+from _filewatch import JsonFileSource, DEFAULT_JSON_FILE
+from _http import JsonHttpClient
+from _ingest import (InputSource, Deduplicator, parse_sources, sbs1_key, beast_key, DEFAULT_DEDUP_WINDOW,
+                     DEFAULT_DEDUP_MAX_ENTRIES, SOURCE_RETRY_BASE)
+from _metrics import MetricsServer, MetricsWriter, DEFAULT_METRICS_BIND, DEFAULT_METRICS_PORT
+from _listen import (ListenServer, peer_closed, DEFAULT_LISTEN_PORT, DEFAULT_MAX_CLIENTS, DEFAULT_CLIENT_BUFFER,
+                     DEFAULT_SLOW_CLIENT_TIMEOUT)
+from _reconnect import Link, BACKOFF, CONNECTED, CONNECTING, DEFAULT_CONNECT_TIMEOUT
+from _sbs1 import SBS1Converter
+from _schedule import PollScheduler
+import _serialize
+from _fanout import (FanoutEngine, EndpointQueue, DEFAULT_QUEUE_BYTES, DEFAULT_QUEUE_MESSAGES,
+                     DROP_OLDEST, DROP_POLICIES, LATEST_PER_ICAO,
+                     DEFAULT_BATCH_WINDOW_MS, DEFAULT_BATCH_MAX_BYTES, TCP, MULTICAST, TRANSPORTS,
+                     DEFAULT_DATAGRAM_SIZE, DEFAULT_MULTICAST_TTL, open_datagram_socket)
+
+# Per-endpoint output formats each input source can produce.  The source
+# is picked by [Output] format; endpoints may choose any format listed
+# for it (endpoint_N_format), defaulting to the source's own.
+ENDPOINT_FORMATS = {
+    'sbs1': ('sbs1',),
+    'json': ('json', 'json_to_sbs1', 'json_delta'),
+    'json_to_sbs1': ('json_to_sbs1', 'json', 'json_delta'),
+    'json_delta': ('json_delta', 'json', 'json_to_sbs1'),
+    'beast': ('beast',),
+}
+# Input formats read as a TCP stream from dump1090 (the rest poll aircraft.json)
+STREAM_FORMATS = ('sbs1', 'beast')
+
+# File source: longest wait between re-checks of aircraft.json when no
+# inotify event arrives (missed event, dump1090 stopped)
+FILE_WAIT_CEILING = 5
+
 class ADSBServer:
     def __init__(self, config_file):
         self.config_file = config_file
         self.config = configparser.ConfigParser()
+        self.config_watcher = ConfigWatcher(config_file)  # hot reload on edit
+        self.config_error = None  # why the file on disk isn't running, if it isn't
+        self.control = ControlServer()  # local control socket + SIGHUP
+        self.metrics = MetricsServer()  # [Metrics]: Prometheus text over HTTP
+        self.filter_counts = {}  # profile -> [checked, matched] (hit ratio)
+        self.aircraft_in = 0  # JSON modes: aircraft records read
+        self.started = time.time()
+        self.engine = 'threaded'  # fixed at run(); [Server] engine needs a restart
         self.running = False
-        self.dump1090_socket = None
+        self.sources = []  # InputSource per dump1090 stream (sbs1/beast modes)
+        self.dedup = Deduplicator()  # across sources, when there is more than one
+        self.dedup_active = False
         self.endpoint_sockets = []
-        self.filter_icao_list = []
-        self.filter_all = True
-        self.altitude_filter_enabled = False
-        self.max_altitude = 10000
-        self.endpoints = []
-        self.aircraft_states = {}
+        self.filter = CompiledFilter()  # rebuilt from [Filter] on every reload
+        self.filters = {DEFAULT_PROFILE: self.filter}  # profile name -> CompiledFilter
+        self.endpoints = []  # configured endpoints, then listen clients ('client': True)
+        self.listener = ListenServer()  # [Listen]: consumers connecting to us
+        self.routes = []  # [(profile, CompiledFilter, {format: [endpoint, ...]}), ...]
+        self.delta_encoders = {}  # profile -> DeltaEncoder (json_delta endpoints)
+        self.columnar_matchers = {}  # profile -> ColumnarMatcher (NumPy installed and enabled)
+        self.columnar_min_aircraft = _columnar.DEFAULT_MIN_AIRCRAFT
+        self.need_queue_keys = False
+        self.aircraft_table = AircraftTable()  # JSON modes: what was last sent per ICAO
+        self.change_only = True
         self.output_format = 'sbs1'
+        self.json_source = ('http', '127.0.0.1', 8080)  # or ('file', path)
+        self.json_client = None  # keep-alive client / file source, owned by the JSON loop
+        self.poll_scheduler = PollScheduler()  # JSON modes: when to fetch next
+        self.sbs1_converter = SBS1Converter()  # json_to_sbs1 output
+        self.batch_window_ms = DEFAULT_BATCH_WINDOW_MS
+        self.batch_max_bytes = DEFAULT_BATCH_MAX_BYTES
         
         # Stability improvements
-        self.reconnection_threads = set()  # Track reconnection threads
-        self.max_reconnect_threads = 5  # Limit concurrent reconnections
         self.socket_timeout = 30  # 30 second socket timeout
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT  # connects only, see _reconnect
         self.last_resource_check = time.time()
         
         # Setup logging
         self.setup_logging()
+        
+        # Non-blocking fan-out: every endpoint gets its own bounded output
+        # buffer so one stalled peer can't hold up the others.
+        self.fanout = FanoutEngine(self.logger, self.endpoint_failed)
+        
         self.load_config()
         
     def setup_logging(self):
@@ -96,6 +162,53 @@ class ADSBServer:
                                f"Endpoints={len([e for e in self.endpoints if e.get('socket')])}, "
                                f"Threads={threading.active_count()}")
                 
+                # Per-endpoint backpressure and link state
+                for endpoint in self.endpoints:
+                    stats = endpoint['queue'].stats()
+                    link = endpoint.get('link')
+                    state = (f"{link.state} (up {link.uptime():.0f}s, {link.reconnects} reconnects, "
+                             f"{link.failures} failures)" if link else 'up' if endpoint.get('socket') else 'down')
+                    self.logger.info(f"Endpoint {endpoint['ip']}:{endpoint['port']} {state}: "
+                                   f"queued={stats['queued']} sent={stats['sent']} "
+                                   f"dropped={stats['dropped']} backlog={stats['backlog']} "
+                                   f"high_water={stats['high_water']}/{stats['high_water_bytes']}B "
+                                   f"avg_batch={stats['avg_batch']}")
+                
+                if self.listener.sock is not None:
+                    listen = self.listener.stats(len(self.clients()))
+                    self.logger.info(f"Listen port {listen['port']}: {listen['clients']}/{listen['max_clients']} clients, "
+                                   f"{listen['accepted']} accepted, {listen['rejected']} rejected, "
+                                   f"{listen['evicted']} evicted")
+                
+                if self.output_format in STREAM_FORMATS:
+                    for source in self.sources:
+                        source.stats.tick()
+                    for source, stats in self.get_source_stats().items():
+                        self.logger.info(f"Source {source} {'up' if stats['connected'] else 'down'}: "
+                                       f"{stats['rate']} msg/s, messages={stats['messages']} "
+                                       f"duplicates={stats['duplicates']} ({stats['duplicate_pct']}%) "
+                                       f"bytes={stats['bytes']} connects={stats['connects']}")
+                    if self.dedup_active:
+                        dedup = self.dedup.stats()
+                        self.logger.info(f"Dedup: {dedup['cached']} keys cached, {dedup['duplicates']} duplicates "
+                                       f"dropped, {dedup['expired']} expired, {dedup['evicted']} evicted early")
+                
+                if self.json_client is not None:
+                    poll = self.json_client.stats.as_dict()
+                    self.logger.info(f"JSON source: {poll['polls']} polls ({poll['not_modified']} unchanged, "
+                                   f"{poll['errors']} errors, {poll['connects']} connects), "
+                                   f"{poll['bytes_per_poll']}B/poll, latency avg={poll['avg_latency_ms']}ms "
+                                   f"max={poll['max_latency_ms']}ms")
+                    sched = self.poll_scheduler.stats()
+                    self.logger.info(f"JSON schedule: period={sched['period_s']}s, "
+                                   f"snapshot age={sched['snapshot_age_ms']}ms (avg {sched['avg_snapshot_age_ms']}ms), "
+                                   f"jitter avg={sched['avg_jitter_ms']}ms max={sched['max_jitter_ms']}ms")
+                
+                if self.output_format not in STREAM_FORMATS and self.change_only:
+                    table = self.aircraft_table.stats()
+                    self.logger.info(f"Change-only: tracking {table['tracked']} aircraft, "
+                                   f"{table['emitted']} sent, {table['suppressed']} unchanged skipped")
+                
                 # Warn if resources high
                 if mem_mb > 200:
                     self.logger.warning(f"High memory usage: {mem_mb:.1f}MB")
@@ -104,9 +217,6 @@ class ADSBServer:
                 if threading.active_count() > 10:
                     self.logger.warning(f"High thread count: {threading.active_count()}")
                     
-                # Clean up dead threads from reconnection set
-                self.reconnection_threads = {t for t in self.reconnection_threads if t.is_alive()}
-                    
             except Exception as e:
                 self.logger.error(f"Resource monitor error: {e}")
         
@@ -129,371 +239,1228 @@ class ADSBServer:
         try:
             if not os.path.exists(self.config_file):
                 self.create_default_config()
-                
-            self.config.read(self.config_file)
-            
-            # Load output format
-            self.output_format = self.config.get('Output', 'format', fallback='sbs1')
             
-            # Load filter settings
-            filter_mode = self.config.get('Filter', 'mode', fallback='all')
-            self.filter_all = (filter_mode.lower() == 'all')
+            config = configparser.ConfigParser()
+            config.read_string(self.config_watcher.read().decode('utf-8'), self.config_file)
+            self.apply_config(config)
+        except Exception as e:
+            self.logger.error(f"Error loading config: {e}")
+    
+    def check_config(self, force=False):
+        """Apply the config file if its content changed (see _confwatch).
+        
+        Called from the main loop, between batches: the new file is parsed
+        into a fresh ConfigParser first and swapped in whole, so a file
+        that doesn't parse changes nothing (``config_error`` says why).
+        ``force`` re-reads the file even without a change event (reload
+        request, SIGHUP).  Returns the names of the sections applied,
+        empty (false) if nothing was.
+        """
+        try:
+            data = self.config_watcher.poll(force=force)
+            if data is None:
+                return []
+            config = configparser.ConfigParser()
+            config.read_string(data.decode('utf-8'), self.config_file)
+        except (configparser.Error, UnicodeDecodeError) as e:
+            self.config_error = str(e)
+            self.logger.error(f"Config file not applied, keeping the current configuration: {e}")
+            return []
+        self.config_error = None
+        changed = config_changes(self.config, config)
+        if not changed:
+            return []    # comments / formatting only
+        self.logger.info(f"Config file changed: {', '.join(f'[{name}]' for name in changed)}")
+        engine = config.get('Server', 'engine', fallback='threaded').strip().lower()
+        if engine != self.engine:
+            self.logger.warning(f"[Server] engine = {engine} takes effect on restart (running {self.engine})")
+        try:
+            self.apply_config(config, changed)
+        except Exception as e:
+            self.config_error = str(e)
+            self.logger.error(f"Error loading config: {e}")
+        return changed
+    
+    def apply_config(self, config, changed=None):
+        """Make ``config`` the running configuration.  ``changed`` names
+        the sections that differ from the previous one (None: all).
+        
+        Everything is reconciled against what is running: unchanged
+        endpoints keep their connection and queue, unchanged sources their
+        connection, unchanged filter profiles their compiled filter.
+        """
+        self.config = config
+        
+        # Load output format
+        self.output_format = self.config.get('Output', 'format', fallback='sbs1')
+        # aircraft.json via lighttpd (http) or straight from dump1090's run dir (file)
+        if self.config.get('Dump1090', 'json_source', fallback='http').strip().lower() == 'file':
+            self.json_source = ('file', self.config.get('Dump1090', 'json_file', fallback=DEFAULT_JSON_FILE))
+        else:
+            self.json_source = ('http', self.config.get('Dump1090', 'host', fallback='127.0.0.1'),
+                                self.config.getint('Dump1090', 'json_port', fallback=8080))
+        self.poll_scheduler.configure_from(self.config)
+        self.load_sources()
+        
+        # JSON modes: forward only aircraft that changed meaningfully
+        # (thresholds + keyframe interval in [Output])
+        self.change_only = self.config.getboolean('Output', 'change_only', fallback=True)
+        self.aircraft_table.configure_from(self.config)
+        
+        # Compile filter profiles once per reload (edited ones only)
+        self.filters = self.load_filter_profiles(changed)
+        self.filter = self.filters[DEFAULT_PROFILE]
+        formats = ENDPOINT_FORMATS.get(self.output_format, ENDPOINT_FORMATS['sbs1'])
             
-            if not self.filter_all:
-                icao_string = self.config.get('Filter', 'icao_list', fallback='')
-                self.filter_icao_list = [icao.strip().upper() for icao in icao_string.split(',') if icao.strip()]
+        # Write coalescing: latency/throughput knob (0 ms = one write
+        # per endpoint per dump1090 recv / JSON snapshot)
+        self.batch_window_ms = self.config.getint('Output', 'batch_window_ms', fallback=DEFAULT_BATCH_WINDOW_MS)
+        self.batch_max_bytes = self.config.getint('Output', 'batch_max_bytes', fallback=DEFAULT_BATCH_MAX_BYTES)
+        self.fanout.configure_batching(self.batch_window_ms, self.batch_max_bytes)
+        
+        # Connect timeout (dump1090 + endpoints), kept apart from the
+        # socket timeout so an unreachable peer is given up on quickly
+        self.connect_timeout = max(0.5, self.config.getfloat('Server', 'connect_timeout', fallback=DEFAULT_CONNECT_TIMEOUT))
+        self.fanout.configure_connects(self.connect_timeout)
+        
+        # Per-endpoint queue defaults (each endpoint may override)
+        queue_bytes = self.config.getint('Queue', 'max_bytes', fallback=DEFAULT_QUEUE_BYTES)
+        queue_messages = self.config.getint('Queue', 'max_messages', fallback=DEFAULT_QUEUE_MESSAGES)
+        drop_policy = self.config.get('Queue', 'drop_policy', fallback=DROP_OLDEST)
             
-            # Load altitude filter settings
-            self.altitude_filter_enabled = self.config.getboolean('Filter', 'altitude_filter_enabled', fallback=False)
-            self.max_altitude = self.config.getint('Filter', 'max_altitude', fallback=10000)
-                
-            # Load endpoints - properly clean up old ones
-            old_endpoints = {f"{ep['ip']}:{ep['port']}": ep for ep in self.endpoints}
-            new_endpoints = []
-            endpoint_count = self.config.getint('Endpoints', 'count', fallback=0)
+        # Listen server: clients get the [Listen] profile and format
+        self.listener.configure_from(self.config)
+        if self.listener.format not in formats:
+            if self.listener.format:
+                self.logger.warning(f"Format '{self.listener.format}' for [Listen] not available from {self.output_format} input, using {formats[0]}")
+            self.listener.format = formats[0]
+        if self.listener.profile not in self.filters:
+            self.logger.error(f"Unknown filter profile '{self.listener.profile}' for [Listen]; nothing will be forwarded to clients")
+            self.filters[self.listener.profile] = CompiledFilter(filter_all=False)
             
-            for i in range(endpoint_count):
-                name = self.config.get('Endpoints', f'endpoint_{i}_name', fallback='')
-                ip = self.config.get('Endpoints', f'endpoint_{i}_ip', fallback=None)
-                port = self.config.getint('Endpoints', f'endpoint_{i}_port', fallback=None)
-                
-                if ip and port:
-                    key = f"{ip}:{port}"
-                    # Reuse existing socket if endpoint unchanged
-                    if key in old_endpoints and old_endpoints[key].get('socket'):
-                        new_endpoints.append({
-                            'name': name,
-                            'ip': ip,
-                            'port': port,
-                            'socket': old_endpoints[key]['socket']
-                        })
-                    else:
-                        new_endpoints.append({
-                            'name': name,
-                            'ip': ip,
-                            'port': port,
-                            'socket': None
-                        })
+        # Load endpoints - properly clean up old ones
+        old_endpoints = {f"{ep['ip']}:{ep['port']}": ep for ep in self.endpoints if not ep.get('client')}
+        new_endpoints = []
+        endpoint_count = self.config.getint('Endpoints', 'count', fallback=0)
+        
+        for i in range(endpoint_count):
+            name = self.config.get('Endpoints', f'endpoint_{i}_name', fallback='')
+            ip = self.config.get('Endpoints', f'endpoint_{i}_ip', fallback=None)
+            port = self.config.getint('Endpoints', f'endpoint_{i}_port', fallback=None)
             
-            # Close sockets for removed endpoints
-            new_keys = {f"{ep['ip']}:{ep['port']}" for ep in new_endpoints}
-            for key, old_ep in old_endpoints.items():
-                if key not in new_keys and old_ep.get('socket'):
+            if ip and port:
+                key = f"{ip}:{port}"
+                limits = (
+                    self.config.getint('Endpoints', f'endpoint_{i}_queue_bytes', fallback=queue_bytes),
+                    self.config.getint('Endpoints', f'endpoint_{i}_queue_messages', fallback=queue_messages),
+                    self.config.get('Endpoints', f'endpoint_{i}_drop_policy', fallback=drop_policy).strip().lower(),
+                )
+                if limits[2] not in DROP_POLICIES:
+                    self.logger.warning(f"Unknown drop_policy '{limits[2]}' for {key}, using {DROP_OLDEST}")
+                    limits = (limits[0], limits[1], DROP_OLDEST)
+                
+                # Filter profile and output format for this endpoint
+                profile = self.config.get('Endpoints', f'endpoint_{i}_filter', fallback=DEFAULT_PROFILE).strip() or DEFAULT_PROFILE
+                if profile not in self.filters:
+                    # Never fall back to a wider filter on a typo
+                    self.logger.error(f"Unknown filter profile '{profile}' for {key}; nothing will be forwarded to it")
+                    self.filters[profile] = CompiledFilter(filter_all=False)
+                fmt = self.config.get('Endpoints', f'endpoint_{i}_format', fallback=formats[0]).strip().lower() or formats[0]
+                if fmt not in formats:
+                    self.logger.warning(f"Format '{fmt}' for {key} not available from {self.output_format} input, using {formats[0]}")
+                    fmt = formats[0]
+                
+                # Transport: TCP client, or fire-and-forget UDP / multicast datagrams
+                transport = self.config.get('Endpoints', f'endpoint_{i}_transport', fallback=TCP).strip().lower() or TCP
+                if transport not in TRANSPORTS:
+                    self.logger.warning(f"Unknown transport '{transport}' for {key}, using {TCP}")
+                    transport = TCP
+                datagram = None
+                if transport != TCP:
+                    datagram = (
+                        self.config.getint('Endpoints', f'endpoint_{i}_mtu', fallback=DEFAULT_DATAGRAM_SIZE),
+                        self.config.getint('Endpoints', f'endpoint_{i}_ttl', fallback=DEFAULT_MULTICAST_TTL),
+                        self.config.get('Endpoints', f'endpoint_{i}_multicast_interface', fallback='').strip(),
+                    )
                     try:
-                        old_ep['socket'].close()
-                        self.logger.info(f"Closed connection to removed endpoint {key}")
-                    except:
-                        pass
-            
-            self.endpoints = new_endpoints
-                    
-            self.logger.info(f"Configuration loaded: Filter={'ALL' if self.filter_all else self.filter_icao_list}, Endpoints={len(self.endpoints)}")
-            
-        except Exception as e:
-            self.logger.error(f"Error loading config: {e}")
-            
+                        is_group = ipaddress.ip_address(ip).is_multicast
+                    except ValueError:
+                        is_group = False  # host name
+                    if is_group != (transport == MULTICAST):
+                        self.logger.warning(f"{key} is {'' if is_group else 'not '}a multicast group but its transport is {transport}")
+                
+                # Reuse existing socket and queue if endpoint unchanged
+                old = old_endpoints.get(key)
+                if old:
+                    queue = old['queue']
+                    queue.configure(*limits)
+                    if (old.get('transport', TCP), old.get('datagram')) != (transport, datagram):
+                        # Transport settings changed: start over on a new
+                        # socket.  Connected or not -- forget also abandons
+                        # a connect in flight and stops the engine's writer,
+                        # which would otherwise carry on against the old dict
+                        self.fanout.forget(old)
+                        if old.get('socket'):
+                            try:
+                                old['socket'].close()
+                            except:
+                                pass
+                            old['socket'] = None
+                else:
+                    queue = EndpointQueue(*limits)
+                queue.datagram_size = datagram[0] if datagram else 0
+                endpoint = {
+                    'name': name,
+                    'ip': ip,
+                    'port': port,
+                    'socket': old['socket'] if old else None,
+                    'queue': queue,
+                    'filter': profile,
+                    'format': fmt,
+                    'transport': transport
+                }
+                if transport == TCP:
+                    # Reconnect state, uptime and counters (see _reconnect)
+                    endpoint['link'] = old.get('link') if old and old.get('link') else Link()
+                if datagram:
+                    endpoint.update(datagram=datagram, address=old.get('address') if old else None, last_error=None)
+                    if endpoint['socket'] is None:
+                        self.open_datagram(endpoint)
+                new_endpoints.append(endpoint)
+        
+        # Close sockets for removed endpoints
+        new_keys = {f"{ep['ip']}:{ep['port']}" for ep in new_endpoints}
+        for key, old_ep in old_endpoints.items():
+            if key not in new_keys:
+                self.fanout.forget(old_ep)   # abandons a connect in flight too
+            if key not in new_keys and old_ep.get('socket'):
+                try:
+                    old_ep['socket'].close()
+                    self.logger.info(f"Closed connection to removed endpoint {key}")
+                except:
+                    pass
+        
+        # Connected clients carry on under the new [Listen] settings
+        clients = self.clients()
+        for client in clients:
+            client['queue'].configure(self.listener.buffer_bytes, 0, DROP_OLDEST)
+            client.update(filter=self.listener.profile, format=self.listener.format,
+                          max_stall=self.listener.slow_timeout)
+        
+        self.endpoints = new_endpoints + clients
+        self.build_routes()
+        # Profile -> formats in use, counting [Listen] before any client connects
+        groups = {}
+        for ep in new_endpoints:
+            groups.setdefault(ep['filter'], set()).add(ep['format'])
+        if self.listener.enabled:
+            groups.setdefault(self.listener.profile, set()).add(self.listener.format)
+        
+        # json_delta: one encoder per profile, kept across reloads so
+        # sequence numbers and per-aircraft baselines carry on
+        full_interval = self.config.getfloat('Output', 'delta_full_interval', fallback=DEFAULT_FULL_INTERVAL)
+        exclude = [f.strip() for f in self.config.get('Output', 'delta_exclude', fallback=','.join(DEFAULT_DELTA_EXCLUDE)).split(',') if f.strip()]
+        delta_encoders = {}
+        for name, used_formats in groups.items():
+            if 'json_delta' in used_formats:
+                encoder = self.delta_encoders.get(name) or DeltaEncoder()
+                encoder.configure(full_interval, exclude)
+                delta_encoders[name] = encoder
+        self.delta_encoders = delta_encoders
+        
+        # Large JSON snapshots: evaluate filters as NumPy masks (optional)
+        vectorized = self.config.get('Output', 'vectorized_filter', fallback='auto').strip().lower()
+        self.columnar_min_aircraft = self.config.getint('Output', 'vectorized_min_aircraft',
+                                                        fallback=_columnar.DEFAULT_MIN_AIRCRAFT)
+        columnar_matchers = {}
+        if vectorized != 'off' and _columnar.AVAILABLE and self.output_format not in STREAM_FORMATS:
+            for name in groups:
+                if not self.filters[name].accept_all:
+                    columnar_matchers[name] = _columnar.ColumnarMatcher(self.filters[name])
+        elif vectorized == 'on' and not _columnar.AVAILABLE:
+            self.logger.warning("vectorized_filter = on but NumPy is not installed; filtering per aircraft")
+        self.columnar_matchers = columnar_matchers
+        # Only pay for ICAO extraction when some endpoint needs it
+        self.need_queue_keys = any(ep['queue'].policy == LATEST_PER_ICAO for ep in new_endpoints)
+                
+        if self.output_format == 'beast':
+            for name in groups:
+                unsupported = self.filters[name].beast_unsupported()
+                if unsupported:
+                    self.logger.warning(f"Filter profile '{name}' uses {'/'.join(unsupported)} rules, which "
+                                        f"raw Beast frames can't be checked against; nothing will be forwarded for it")
+        
+        profiles = ', '.join(f"{name}={self.filters[name].describe()}" for name in groups if name != DEFAULT_PROFILE)
+        self.control.configure_from(self.config)
+        self.metrics.configure_from(self.config)
+        if self.running:
+            self.update_listener()
+            self.update_control()
+            self.update_metrics()
+        
+        self.logger.info(f"Configuration loaded: Filter={self.filter.describe()}, Endpoints={len(new_endpoints)}"
+                         + (f", Profiles: {profiles}" if profiles else ''))
+        
+    def build_routes(self):
+        """Group endpoints by profile, then format, so each distinct
+        profile is evaluated once per message"""
+        groups = {}
+        for ep in self.endpoints:
+            groups.setdefault(ep['filter'], {}).setdefault(ep['format'], []).append(ep)
+        self.routes = [(name, self.filters[name], by_format) for name, by_format in groups.items()]
+        for name in groups:
+            self.filter_counts.setdefault(name, [0, 0])
+        
+    def load_sources(self):
+        """Reconcile self.sources with [Dump1090] sources (blank: the one
+        host).  Unchanged addresses keep their connection and counters."""
+        _, host, port = self.dump1090_stream()
+        try:
+            specs = parse_sources(self.config.get('Dump1090', 'sources', fallback=''), host, port)
+        except ValueError as e:
+            self.logger.error(f"Invalid [Dump1090] sources, keeping previous: {e}")
+            if self.sources:
+                return
+            specs = parse_sources('', host, port)
+        
+        old_sources = {source.address: source for source in self.sources}
+        sources = []
+        for name, source_host, source_port in specs:
+            address = f"{source_host}:{source_port}"
+            if any(source.address == address for source in sources):
+                continue  # listed twice
+            source = old_sources.pop(address, None) or InputSource(name, source_host, source_port)
+            source.name = name
+            sources.append(source)
+        
+        # Close connections (and connects in flight) to removed sources
+        for source in old_sources.values():
+            connected = source.sock is not None
+            self.close_source(source)
+            if connected:
+                self.logger.info(f"Closed connection to removed source {source}")
+        
+        self.sources = sources
+        self.dedup_active = len(sources) > 1
+        self.dedup.configure(self.config.getfloat('Dump1090', 'dedup_window', fallback=DEFAULT_DEDUP_WINDOW),
+                             self.config.getint('Dump1090', 'dedup_max_entries', fallback=DEFAULT_DEDUP_MAX_ENTRIES))
+        
+    def load_filter_profiles(self, changed=None):
+        """Compile [Filter] (profile 'default') and every [Filter.<name>] section.
+        
+        A profile whose rules don't parse keeps its previous compiled
+        filter (or forwards nothing if it is new) rather than widening.
+        With ``changed`` (section names), only those are recompiled.
+        """
+        sections = {DEFAULT_PROFILE: 'Filter'}
+        for section in self.config.sections():
+            if section.startswith(PROFILE_PREFIX) and len(section) > len(PROFILE_PREFIX):
+                sections[section[len(PROFILE_PREFIX):]] = section
+        
+        filters = {}
+        for name, section in sections.items():
+            previous = self.filters.get(name)
+            if previous is not None and changed is not None and section not in changed:
+                filters[name] = previous
+                continue
+            try:
+                compiled = CompiledFilter.from_config(self.config, section)
+                compiled.adopt_state(previous)
+            except ValueError as e:
+                self.logger.error(f"Invalid [{section}] settings, keeping previous filter: {e}")
+                compiled = previous or CompiledFilter(filter_all=False)
+            filters[name] = compiled
+        return filters
+        
     def create_default_config(self):
         """Create default configuration file"""
+        self.config['Server'] = {
+            'engine': 'threaded',
+            'connect_timeout': str(DEFAULT_CONNECT_TIMEOUT),
+            'control_socket': DEFAULT_CONTROL_SOCKET
+        }
         self.config['Dump1090'] = {
             'host': '127.0.0.1',
+            'sources': '',
+            'dedup_window': str(DEFAULT_DEDUP_WINDOW),
+            'dedup_max_entries': str(DEFAULT_DEDUP_MAX_ENTRIES),
             'sbs1_port': '30003',
-            'json_port': '8080'
+            'beast_port': '30005',
+            'json_port': '8080',
+            'json_source': 'http',
+            'json_file': DEFAULT_JSON_FILE,
+            'poll_interval': '1.0',
+            'max_poll_interval': '8',
+            'idle_polls': '5'
         }
         self.config['Output'] = {
-            'format': 'sbs1'
+            'format': 'sbs1',
+            'batch_window_ms': str(DEFAULT_BATCH_WINDOW_MS),
+            'batch_max_bytes': str(DEFAULT_BATCH_MAX_BYTES),
+            'change_only': 'true',
+            'keyframe_interval': '30',
+            'position_threshold_nm': '0.05',
+            'altitude_threshold_ft': '100',
+            'speed_threshold_kt': '5',
+            'track_threshold_deg': '3',
+            'delta_full_interval': str(int(DEFAULT_FULL_INTERVAL)),
+            'delta_exclude': ','.join(DEFAULT_DELTA_EXCLUDE),
+            'vectorized_filter': 'auto',
+            'vectorized_min_aircraft': str(_columnar.DEFAULT_MIN_AIRCRAFT)
         }
         self.config['Filter'] = {
             'mode': 'specific',
             'icao_list': 'A92F2D,A932E4,A9369B,A93A52',
             'altitude_filter_enabled': 'false',
-            'max_altitude': '10000'
+            'max_altitude': '10000',
+            'min_altitude': '',
+            'geofence_center': '',
+            'geofence_radius_nm': '',
+            'geofence_polygon': '',
+            'squawks': '',
+            'callsign_prefixes': '',
+            'callsign_regex': '',
+            'msg_types': ''
+        }
+        self.config['Queue'] = {
+            'max_bytes': str(DEFAULT_QUEUE_BYTES),
+            'max_messages': str(DEFAULT_QUEUE_MESSAGES),
+            'drop_policy': DROP_OLDEST
         }
         self.config['Endpoints'] = {
             'count': '0'
         }
+        self.config['Listen'] = {
+            'enabled': 'false',
+            'bind': '0.0.0.0',
+            'port': str(DEFAULT_LISTEN_PORT),
+            'max_clients': str(DEFAULT_MAX_CLIENTS),
+            'client_buffer_bytes': str(DEFAULT_CLIENT_BUFFER),
+            'slow_client_timeout': str(int(DEFAULT_SLOW_CLIENT_TIMEOUT)),
+            'filter': DEFAULT_PROFILE,
+            'format': ''
+        }
+        self.config['Metrics'] = {
+            'enabled': 'true',
+            'bind': DEFAULT_METRICS_BIND,
+            'port': str(DEFAULT_METRICS_PORT)
+        }
         
         with open(self.config_file, 'w') as f:
             self.config.write(f)
             
-    def connect_to_dump1090(self):
-        """Connect to dump1090-fa SBS1 port with timeout"""
+    def dump1090_stream(self):
+        """(label, host, port) of the default dump1090 stream the streaming modes read"""
         host = self.config.get('Dump1090', 'host', fallback='127.0.0.1')
-        port = self.config.getint('Dump1090', 'sbs1_port', fallback=30003)
+        if self.output_format == 'beast':
+            return 'Beast', host, self.config.getint('Dump1090', 'beast_port', fallback=30005)
+        return 'SBS1', host, self.config.getint('Dump1090', 'sbs1_port', fallback=30003)
+    
+    def service_sources(self, now=None):
+        """(Re)connect the dump1090-fa sources that are due and time out
+        hung connects.  Connects never block: like an endpoint's, the
+        in-flight socket waits in the fan-out selector (see _reconnect),
+        so a receiver that doesn't answer leaves the live ones streaming.
+        Returns seconds until the next retry or timeout (None if none)."""
+        if now is None:
+            now = time.monotonic()
+        next_due = None
+        for source in self.sources:
+            link = source.link
+            if source.sock is not None:
+                continue
+            if link.state == BACKOFF and now >= link.retry_at:
+                self.connect_source(source, now)
+            if link.state == CONNECTING and now >= link.deadline:
+                self.source_failed(source, TimeoutError('connect timed out'), now)
+            if link.state != CONNECTED:
+                due = max(0.0, (link.deadline if link.state == CONNECTING else link.retry_at) - now)
+                if next_due is None or due < next_due:
+                    next_due = due
+        return next_due
+    
+    def connect_source(self, source, now=None):
+        """Start a non-blocking connect to one dump1090-fa SBS1 (or Beast)
+        source; source_connected / source_failed follow."""
+        self.fanout.supervisor.dial(source.link, source.host, source.port,
+                                    lambda: self.source_connected(source),
+                                    lambda error: self.source_failed(source, error), now)
+    
+    def source_connected(self, source):
+        label = self.dump1090_stream()[0]
+        link = source.link
+        sock = link.pending
+        link.up(time.monotonic())
+        sock.settimeout(self.socket_timeout)
+        source.sock = sock
+        source.framer = BeastFramer() if label == 'Beast' else LineFramer()
+        source.stats.connects += 1
+        source.stats.connected_at = time.time()
+        self.fanout.watch_reader(sock)
+        self.logger.info(f"Connected to dump1090-fa {label} at {source}")
+    
+    def source_failed(self, source, error, now=None):
+        self.fanout.supervisor.abandon(source.link)
+        delay = source.link.down(time.monotonic() if now is None else now, error, SOURCE_RETRY_BASE)
+        self.logger.error(f"Failed to connect to dump1090-fa {source}: {source.link.last_error}")
+        self.logger.info(f"Waiting for dump1090-fa connection... (retry in {delay:.0f}s)")
+    
+    def close_source(self, source, error=None):
+        """Drop a source's connection, or abandon its connect in flight.
+        With ``error`` (connection lost) it is retried after a backoff,
+        otherwise as soon as it is serviced again."""
+        link = source.link
+        self.fanout.supervisor.abandon(link)
+        if source.sock is not None:
+            self.fanout.unwatch_reader(source.sock)
+            try:
+                source.sock.close()
+            except:
+                pass
+        source.sock = None
+        source.framer = None
+        source.stats.connected_at = None
+        if error is not None:
+            link.down(time.monotonic(), error, SOURCE_RETRY_BASE)
+        elif link.state == CONNECTED:
+            link.state = BACKOFF
+            link.connected_at = None
+    
+    def get_source_stats(self):
+        """Per-source input counters, keyed by source name/address"""
+        return {str(source): source.stats.as_dict() for source in self.sources}
+    
+    def fetch_json_data(self):
+        """Fetch the aircraft list from dump1090 (keep-alive HTTP or file).
         
+        Returns None when the snapshot is unchanged since the last poll
+        (HTTP 304 / same file), [] on error.  Every outcome feeds the poll
+        scheduler, which plans the next fetch.
+        """
+        client = self.json_client
+        if client is None or client.source != self.json_source:
+            if client is not None:
+                client.close()
+            if self.json_source[0] == 'file':
+                client = self.json_client = JsonFileSource(self.json_source[1])
+                if client.fileno() is None:
+                    self.logger.warning(f"inotify unavailable for {client.path}, polling it instead")
+            else:
+                client = self.json_client = JsonHttpClient(*self.json_source[1:])
+        self.poll_scheduler.started()
         try:
-            self.dump1090_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.dump1090_socket.settimeout(self.socket_timeout)  # Set timeout
-            self.dump1090_socket.connect((host, port))
-            self.logger.info(f"Connected to dump1090-fa SBS1 at {host}:{port}")
-            return True
+            aircraft_list = client.fetch()
+        except (OSError, http.client.HTTPException) as e:
+            self.logger.warning(f"Cannot reach JSON endpoint: {e}")
+            aircraft_list = []
         except Exception as e:
-            self.logger.error(f"Failed to connect to dump1090-fa: {e}")
-            if self.dump1090_socket:
-                try:
-                    self.dump1090_socket.close()
-                except:
-                    pass
-            self.dump1090_socket = None
-            return False
+            self.logger.error(f"Error fetching JSON from {client.url}: {e}")
+            aircraft_list = []
+        self.poll_scheduler.observe(aircraft_list, client.snapshot_time)
+        return aircraft_list
     
-    def fetch_json_data(self):
-        """Fetch JSON data from dump1090 with timeout"""
+    def json_source_url(self):
+        """Where the JSON modes read aircraft.json from (for logs)"""
+        if self.json_source[0] == 'file':
+            return f"file://{self.json_source[1]}"
+        return f"http://{self.json_source[1]}:{self.json_source[2]}/data/aircraft.json"
+    
+    def wait_for_snapshot(self):
+        """Service endpoint writes until the next snapshot is due.
+        
+        HTTP sleeps until the poll scheduler's next deadline.  The file
+        source returns as soon as dump1090 replaces aircraft.json
+        (re-checking at least every FILE_WAIT_CEILING seconds in case an
+        event is missed).
+        """
+        client = self.json_client
+        fd = client.fileno() if isinstance(client, JsonFileSource) else None
+        if fd is None:
+            self.fanout.wait(self.endpoints, self.poll_scheduler.delay())
+            return
+        deadline = time.monotonic() + FILE_WAIT_CEILING
+        self.fanout.watch_reader(fd)
         try:
-            host = self.config.get('Dump1090', 'host', fallback='127.0.0.1')
-            json_port = self.config.getint('Dump1090', 'json_port', fallback=8080)
-            
-            url = f"http://{host}:{json_port}/data/aircraft.json"
-            # FIXED: Added timeout to prevent infinite hang
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
-                return data.get('aircraft', [])
-        except urllib.error.URLError as e:
-            self.logger.warning(f"Cannot reach JSON endpoint: {e.reason}")
-            return []
-        except Exception as e:
-            self.logger.error(f"Error fetching JSON from {url}: {e}")
-            return []
+            while self.running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (self.fanout.wait(self.endpoints, remaining) and client.changed()):
+                    return
+        finally:
+            self.fanout.unwatch_reader(fd)
     
     def filter_json_aircraft(self, aircraft):
         """Filter JSON aircraft object"""
         try:
-            icao = aircraft.get('hex', '').upper()
-            altitude = aircraft.get('alt_baro') or aircraft.get('alt_geom')
-            
-            # Check altitude filter
-            if self.altitude_filter_enabled and altitude:
-                if altitude > self.max_altitude:
-                    return False
-            
-            # Check ICAO filter
-            if self.filter_all:
-                return True
-            
-            return icao in self.filter_icao_list
+            return self.filter.match_json(aircraft)
         except:
             return False
     
     def json_to_sbs1(self, aircraft):
-        """Convert JSON aircraft object to SBS1 format"""
-        try:
-            icao = aircraft.get('hex', '').upper()
-            callsign = aircraft.get('flight', '').strip()
-            altitude = aircraft.get('alt_baro') or aircraft.get('alt_geom') or ''
-            speed = aircraft.get('gs') or ''
-            track = aircraft.get('track') or ''
-            lat = aircraft.get('lat') or ''
-            lon = aircraft.get('lon') or ''
-            
-            now = datetime.utcnow()
-            date_str = now.strftime('%Y/%m/%d')
-            time_str = now.strftime('%H:%M:%S.%f')[:-3]
-            
-            sbs1_line = f"MSG,3,1,1,{icao},1,{date_str},{time_str},{date_str},{time_str},{callsign},{altitude},{speed},{track},{lat},{lon}"
-            
-            return sbs1_line + '\n'
-        except Exception as e:
-            self.logger.error(f"JSON→SBS1 conversion error: {e}")
-            return None
+        """Convert JSON aircraft object to SBS1 format (MSG,1/3/4/5/6 lines)"""
+        lines = self.sbs1_converter.convert([aircraft], self.snapshot_now())[0]
+        return lines.decode('utf-8') if lines else None
+    
+    def snapshot_now(self):
+        """When dump1090 wrote the current snapshot (its 'now' field), else now"""
+        client = self.json_client
+        snapshot_time = client.snapshot_time if client is not None else None
+        return snapshot_time if isinstance(snapshot_time, (int, float)) else time.time()
             
-    def connect_to_endpoints(self):
-        """Connect to all configured endpoints with timeout"""
-        for endpoint in self.endpoints:
-            if not endpoint.get('socket'):
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(self.socket_timeout)  # Set timeout
-                    sock.connect((endpoint['ip'], endpoint['port']))
-                    endpoint['socket'] = sock
-                    self.logger.info(f"Connected to endpoint {endpoint['ip']}:{endpoint['port']}")
-                except Exception as e:
-                    self.logger.warning(f"Failed to connect to {endpoint['ip']}:{endpoint['port']}: {e}")
-                    endpoint['socket'] = None
-                
-    def reconnect_endpoint(self, endpoint):
-        """Attempt to reconnect to a failed endpoint"""
-        try:
-            # Clean up old socket
-            if endpoint.get('socket'):
-                try:
-                    endpoint['socket'].close()
-                except:
-                    pass
-                endpoint['socket'] = None
-                    
-            # Create new socket with timeout
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.socket_timeout)
-            sock.connect((endpoint['ip'], endpoint['port']))
-            endpoint['socket'] = sock
-            self.logger.info(f"Reconnected to endpoint {endpoint['ip']}:{endpoint['port']}")
-            return True
-        except Exception as e:
-            self.logger.debug(f"Reconnect failed for {endpoint['ip']}:{endpoint['port']}: {e}")
-            endpoint['socket'] = None
-            return False
-        finally:
-            # Remove this thread from tracking
+    def clients(self):
+        """Endpoints for consumers connected to the listen server"""
+        return [ep for ep in self.endpoints if ep.get('client')]
+    
+    def update_listener(self):
+        """Open, move or close the listen socket to match [Listen]"""
+        listener = self.listener
+        if listener.sock is not None and listener.address != listener.wanted:
+            self.fanout.unwatch_reader(listener.sock)
+            listener.close()
+            self.logger.info("Listen server closed")
+            if not listener.enabled:
+                for client in self.clients():
+                    self.remove_client(client, "listen server disabled")
+        if listener.enabled and listener.sock is None:
             try:
-                self.reconnection_threads.discard(threading.current_thread())
+                self.fanout.watch_reader(listener.open(), self.accept_clients)
+                self.logger.info(f"Listening for clients on {listener.bind}:{listener.port} "
+                                 f"({listener.format}, filter '{listener.profile}', max {listener.max_clients})")
+            except OSError as e:
+                listener.close()
+                self.logger.error(f"Cannot listen on {listener.bind}:{listener.port}: {e}")
+    
+    def accept_clients(self):
+        """Listen socket readable: take on new clients up to max_clients"""
+        clients = self.clients()
+        if len(clients) >= self.listener.max_clients:
+            # Full: first drop clients that have hung up without us noticing
+            for client in clients:
+                if peer_closed(client['conn']):
+                    self.remove_client(client, "closed by peer")
+            clients = self.clients()
+        rejected = self.listener.rejected
+        new_clients = self.listener.accept(len(clients))
+        if self.listener.rejected != rejected:
+            self.logger.warning(f"Listen server full ({self.listener.max_clients} clients), "
+                                f"refused {self.listener.rejected - rejected} connection(s)")
+        if not new_clients:
+            return
+        for client in new_clients:
+            self.logger.info(f"Client connected: {client['ip']}:{client['port']}")
+        self.endpoints = self.endpoints + new_clients
+        self.build_routes()
+    
+    def remove_client(self, client, reason):
+        """Disconnect a listen client (a TimeoutError reason counts as a
+        slow-client eviction); clients are never reconnected"""
+        if not any(ep is client for ep in self.endpoints):
+            return
+        self.endpoints = [ep for ep in self.endpoints if ep is not client]
+        self.build_routes()
+        self.fanout.forget(client)
+        if client.get('socket') is not None:
+            try:
+                client['socket'].close()
             except:
                 pass
+            client['socket'] = None
+        if isinstance(reason, TimeoutError):
+            self.listener.evicted += 1
+        self.logger.info(f"Client {client['ip']}:{client['port']} disconnected: {reason}")
             
-    def filter_message(self, message):
-        """Check if message should be forwarded based on filter"""
+    def update_control(self):
+        """Open, move or close the control socket to match [Server] control_socket"""
+        control = self.control
+        if control.sock is not None and control.bound != control.wanted:
+            self.fanout.unwatch_reader(control.sock)
+            control.close()
+            self.logger.info(f"Control socket {control.bound} closed")
+        if control.wanted and control.sock is None:
+            try:
+                self.fanout.watch_reader(control.open(), self.accept_control)
+                self.logger.info(f"Control socket: {control.path}")
+            except OSError as e:
+                control.close()
+                self.logger.warning(f"Cannot open control socket {control.path}: {e}")
+    
+    def update_metrics(self):
+        """Open, move or close the metrics HTTP socket to match [Metrics]"""
+        metrics = self.metrics
+        if metrics.sock is not None and metrics.address != metrics.wanted:
+            self.fanout.unwatch_reader(metrics.sock)
+            metrics.close()
+            self.logger.info("Metrics endpoint closed")
+        if metrics.enabled and metrics.sock is None:
+            try:
+                self.fanout.watch_reader(metrics.open(), self.accept_metrics)
+                self.logger.info(f"Serving metrics on http://{metrics.bind}:{metrics.port}/metrics")
+            except OSError as e:
+                metrics.close()
+                self.logger.warning(f"Cannot serve metrics on {metrics.bind}:{metrics.port}: {e}")
+    
+    def accept_metrics(self):
+        """Metrics socket readable: watch each new scrape for its request"""
+        for conn in self.metrics.accept():
+            self.fanout.watch_reader(conn, lambda conn=conn: self.serve_metrics(conn))
+    
+    def serve_metrics(self, conn):
+        """Scrape connection readable: answer GET /metrics once the request is in"""
+        metrics = self.metrics
         try:
-            parts = message.split(',')
-            
-            # Check altitude filter
-            if self.altitude_filter_enabled and len(parts) > 11:
-                altitude_str = parts[11].strip()
-                if altitude_str:
-                    try:
-                        altitude = int(altitude_str)
-                        if altitude > self.max_altitude:
-                            return False
-                    except ValueError:
-                        pass
-            
-            # If filter_all mode, accept everything
-            if self.filter_all:
-                return True
+            request = metrics.receive(conn)
+        except EOFError:
+            self.fanout.unwatch_reader(conn)
+            metrics.drop(conn)
+            return
+        except ValueError as e:
+            self.fanout.unwatch_reader(conn)
+            metrics.respond(conn, 400, f"{e}\n".encode(), 'text/plain')
+            return
+        if request is None:
+            return
+        self.fanout.unwatch_reader(conn)
+        method, path = request
+        if path != '/metrics':
+            metrics.respond(conn, 404, b"Try /metrics\n", 'text/plain')
+        elif method not in ('GET', 'HEAD'):
+            metrics.respond(conn, 405, b"GET only\n", 'text/plain')
+        else:
+            metrics.respond(conn, 200, self.collect_metrics(), head_only=method == 'HEAD')
+    
+    def accept_control(self):
+        """Control socket readable: watch each new connection for its request"""
+        for conn in self.control.accept():
+            self.fanout.watch_reader(conn, lambda conn=conn: self.serve_control(conn))
+    
+    def serve_control(self, conn):
+        """Control connection readable: once its request line is in, run
+        it and reply.  Returns the sections a command applied, so the
+        loop picks up endpoint or mode changes straight away."""
+        try:
+            request = self.control.receive(conn)
+        except EOFError:
+            self.fanout.unwatch_reader(conn)
+            self.control.drop(conn)
+            return []
+        except ValueError as e:
+            request, response = None, {'ok': False, 'error': f"Bad request: {e}"}
+        else:
+            if request is None:
+                return []   # rest of the line still to come
+            response = self.control_command(request)
+        self.fanout.unwatch_reader(conn)
+        self.control.reply(conn, response)
+        return response.get('changed', [])
+    
+    def reload_signalled(self):
+        """SIGHUP (via the control wakeup socket): re-read the config file"""
+        self.control.drain_wakeup()
+        self.logger.info("SIGHUP: reloading configuration")
+        return self.check_config(force=True)
+    
+    def control_command(self, request):
+        """Run one control socket request (see _control), returning the reply"""
+        cmd = request['cmd']
+        try:
+            if cmd == 'get-stats':
+                return dict(ok=True, **self.get_stats())
+            if cmd == 'reload':
+                changed = self.check_config(force=True)
+            elif cmd == 'add-endpoint':
+                changed = self.edit_endpoints(add=request.get('endpoint'))
+            elif cmd == 'remove-endpoint':
+                changed = self.edit_endpoints(remove=request)
+            else:
+                return {'ok': False, 'error': f"Unknown command '{cmd}'"}
+        except (ValueError, TypeError, OSError, configparser.Error) as e:
+            return {'ok': False, 'error': str(e)}
+        if self.config_error:
+            return {'ok': False, 'error': f"Config file not applied: {self.config_error}"}
+        self.logger.info(f"Control: {cmd} ({', '.join(changed) or 'no change'})")
+        return {'ok': True, 'changed': changed}
+    
+    def edit_endpoints(self, add=None, remove=None):
+        """Add an endpoint to, or remove one from, [Endpoints] in the
+        config file, then apply the file.  ``add`` holds endpoint options
+        (ip and port required); ``remove`` picks an endpoint by ip and
+        port, or by name.  Raises ValueError for a bad or unknown
+        endpoint."""
+        with open(self.config_file, encoding='utf-8') as f:
+            config = configparser.ConfigParser()
+            config.read_file(f, self.config_file)
+        endpoints = read_endpoints(config)
+        if add is not None:
+            if not isinstance(add, dict):
+                raise ValueError("'endpoint' must be an object")
+            unknown = set(add) - set(ENDPOINT_OPTIONS)
+            if unknown:
+                raise ValueError(f"Unknown endpoint option(s): {', '.join(sorted(unknown))}")
+            endpoint = {option: str(value).strip() for option, value in add.items() if value is not None}
+            ip = endpoint.get('ip', '')
+            port = int(endpoint.get('port', 0))
+            if not ip or not 0 < port < 65536:
+                raise ValueError("Endpoint needs an ip and a port (1-65535)")
+            if any(ep.get('ip') == ip and int(ep.get('port', 0)) == port for ep in endpoints):
+                raise ValueError(f"Endpoint {ip}:{port} already exists")
+            endpoint['port'] = str(port)
+            endpoints.append(endpoint)
+        if remove is not None:
+            name, ip = remove.get('name'), remove.get('ip')
+            port = int(remove['port']) if remove.get('port') is not None else None
+            if ip is not None and port is not None:
+                keep = [ep for ep in endpoints if not (ep.get('ip') == ip and int(ep.get('port', 0)) == port)]
+            elif name:
+                keep = [ep for ep in endpoints if ep.get('name') != name]
+            else:
+                raise ValueError("remove-endpoint needs ip and port, or name")
+            if len(keep) == len(endpoints):
+                raise ValueError(f"No endpoint {f'{ip}:{port}' if ip is not None else repr(name)}")
+            endpoints = keep
+        write_endpoints(config, endpoints)
+        write_config(config, self.config_file)
+        return self.check_config(force=True)
+    
+    def open_datagram(self, endpoint):
+        """Open a udp / multicast endpoint's socket (there is no connection to make)"""
+        mtu, ttl, interface = endpoint['datagram']
+        try:
+            endpoint['socket'], endpoint['address'] = open_datagram_socket(
+                endpoint['ip'], endpoint['port'], endpoint['transport'], ttl, interface)
+        except OSError as e:
+            self.logger.warning(f"Cannot open {endpoint['transport']} socket for {endpoint['ip']}:{endpoint['port']}: {e}")
+            return False
+        self.logger.info(f"Sending to endpoint {endpoint['ip']}:{endpoint['port']} over {endpoint['transport']} "
+                         f"({mtu}-byte datagrams)")
+        return True
+    
+    def connect_to_endpoints(self):
+        """Start connecting every endpoint that has no socket.
+        
+        TCP connects are non-blocking and all in flight at once; the
+        supervisor completes them (or times them out after
+        connect_timeout) from the main loop's fan-out poll, so ingest
+        starts straight away instead of after each connect in turn.
+        """
+        for endpoint in self.endpoints:
+            if endpoint.get('socket') or endpoint.get('client'):
+                continue
+            if endpoint.get('transport', TCP) != TCP:
+                self.open_datagram(endpoint)
+            elif endpoint['link'].state != CONNECTING:
+                self.fanout.supervisor.start(endpoint)
             
-            # Check ICAO filter
-            if len(parts) > 4:
-                icao = parts[4].strip().upper()
-                return icao in self.filter_icao_list
-                
+    def filter_message(self, message):
+        """Check if SBS1 message (bytes) should be forwarded based on filter"""
+        return self.filter.match_sbs1(message)
+        
+    def forward_message(self, message, key=None):
+        """Queue message (bytes, or str from the JSON modes) for all endpoints (never blocks)"""
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        self.fanout.submit(self.endpoints, message, key)
+    
+    def get_endpoint_stats(self):
+        """Per-endpoint queue counters and link state, keyed by ip:port"""
+        now = time.monotonic()
+        return {f"{ep['ip']}:{ep['port']}": dict(ep['queue'].stats(), connected=bool(ep.get('socket')),
+                                                  filter=ep['filter'], format=ep['format'],
+                                                  transport=ep.get('transport', TCP),
+                                                  **(ep['link'].stats(now) if ep.get('link') else {}))
+                for ep in self.endpoints}
+        
+    def get_stats(self):
+        """Everything the resource monitor logs, as one dict (control
+        socket get-stats)"""
+        stats = {'format': self.output_format, 'engine': self.engine, 'running': self.running,
+                 'config_error': self.config_error, 'endpoints': self.get_endpoint_stats()}
+        if self.output_format in STREAM_FORMATS:
+            stats['sources'] = self.get_source_stats()
+            if self.dedup_active:
+                stats['dedup'] = self.dedup.stats()
+        if self.listener.sock is not None:
+            stats['listen'] = self.listener.stats(len(self.clients()))
+        client = self.json_client
+        if client is not None:
+            stats['json_source'] = client.stats.as_dict()
+            stats['json_schedule'] = self.poll_scheduler.stats()
+        if self.output_format not in STREAM_FORMATS and self.change_only:
+            stats['change_only'] = self.aircraft_table.stats()
+        return stats
+    
+    def collect_metrics(self):
+        """Every counter the server keeps, as Prometheus text (see _metrics)"""
+        out = MetricsWriter()
+        out.gauge('adsb_info', "Running configuration", [({'format': self.output_format, 'engine': self.engine}, 1)])
+        out.gauge('adsb_start_time_seconds', "Unix time the server started", [({}, self.started)])
+        
+        if self.output_format in STREAM_FORMATS:
+            sources = [({'source': str(source)}, source.stats) for source in self.sources]
+            out.gauge('adsb_source_up', "1 while connected to the dump1090 source",
+                      [(labels, stats.connected_at is not None) for labels, stats in sources])
+            for name, attr, help_text in (
+                    ('adsb_source_messages_total', 'messages', "Messages received from the source"),
+                    ('adsb_source_bytes_total', 'bytes', "Bytes received from the source"),
+                    ('adsb_source_duplicates_total', 'duplicates', "Messages dropped as already received from another source"),
+                    ('adsb_source_parse_errors_total', 'parse_errors', "Overlong SBS1 lines / Beast resyncs"),
+                    ('adsb_source_connects_total', 'connects', "Connections made to the source")):
+                out.counter(name, help_text, [(labels, getattr(stats, attr)) for labels, stats in sources])
+        
+        client = self.json_client
+        if client is not None:
+            poll = client.stats
+            out.counter('adsb_json_aircraft_total', "Aircraft records read from aircraft.json", [({}, self.aircraft_in)])
+            out.counter('adsb_json_polls_total', "aircraft.json fetches (including unchanged)", [({}, poll.polls)])
+            out.counter('adsb_json_not_modified_total', "Fetches that found aircraft.json unchanged", [({}, poll.not_modified)])
+            out.counter('adsb_json_errors_total', "Failed fetches", [({}, poll.errors)])
+            out.counter('adsb_json_parse_errors_total', "Fetches whose body wasn't valid aircraft.json", [({}, poll.decode_errors)])
+            out.counter('adsb_json_bytes_total', "Bytes of aircraft.json read", [({}, poll.bytes)])
+            out.summary('adsb_json_fetch_seconds', "Time to fetch aircraft.json", [({}, (poll.total_latency, poll.polls))])
+            sched = self.poll_scheduler
+            out.gauge('adsb_json_poll_period_seconds', "Current aircraft.json poll period", [({}, sched.period)])
+            ages = [({'stat': 'last'}, sched.last_age)] if sched.last_age is not None else []
+            if sched.aged:
+                ages.append(({'stat': 'avg'}, sched.total_age / sched.aged))
+            out.gauge('adsb_json_snapshot_age_seconds', "Age of aircraft.json when fetched (last poll, average)", ages)
+            out.gauge('adsb_json_poll_jitter_seconds', "Poll start error against the schedule (last poll, maximum)",
+                      [({'stat': 'last'}, sched.last_jitter), ({'stat': 'max'}, sched.max_jitter)])
+            out.counter('adsb_sbs1_conversion_errors_total', "Aircraft that couldn't be converted to SBS1",
+                        [({}, self.sbs1_converter.errors)])
+            if self.change_only:
+                table = self.aircraft_table.stats()
+                out.counter('adsb_change_only_suppressed_total', "Aircraft skipped as unchanged since last sent",
+                            [({}, table['suppressed'])])
+        
+        profiles = [({'profile': name}, self.filter_counts[name]) for name, _, _ in self.routes]
+        out.counter('adsb_filter_checked_total', "Messages / aircraft checked against the filter profile",
+                    [(labels, counts[0]) for labels, counts in profiles])
+        out.counter('adsb_filter_matched_total', "Messages / aircraft the filter profile accepted",
+                    [(labels, counts[1]) for labels, counts in profiles])
+        
+        # Configured endpoints; listen clients come and go, so only in aggregate
+        endpoints = [({'endpoint': f"{ep['ip']}:{ep['port']}", 'name': ep['name'],
+                       'transport': ep.get('transport', TCP)}, ep)
+                     for ep in self.endpoints if not ep.get('client')]
+        out.gauge('adsb_endpoint_up', "1 while the endpoint has a connection (udp / multicast: an open socket)",
+                  [(labels, ep.get('socket') is not None) for labels, ep in endpoints])
+        for name, attr, help_text in (
+                ('adsb_endpoint_queued_messages_total', 'queued', "Messages accepted into the endpoint's queue"),
+                ('adsb_endpoint_sent_messages_total', 'sent', "Messages written to the endpoint"),
+                ('adsb_endpoint_dropped_messages_total', 'dropped', "Messages dropped by the queue's drop policy or a failed send"),
+                ('adsb_endpoint_sent_bytes_total', 'bytes_sent', "Bytes written to the endpoint"),
+                ('adsb_endpoint_write_batches_total', 'batches', "Write batches (one send per batch)")):
+            out.counter(name, help_text, [(labels, getattr(ep['queue'], attr)) for labels, ep in endpoints])
+        out.gauge('adsb_endpoint_backlog_messages', "Messages queued for the endpoint",
+                  [(labels, len(ep['queue'])) for labels, ep in endpoints])
+        out.gauge('adsb_endpoint_backlog_bytes', "Bytes queued for the endpoint",
+                  [(labels, ep['queue'].backlog_bytes) for labels, ep in endpoints])
+        out.histogram('adsb_endpoint_send_latency_seconds', "Queue + send time of each write batch's oldest message",
+                      [(labels, ep['queue'].latency) for labels, ep in endpoints])
+        links = [(labels, ep['link']) for labels, ep in endpoints if ep.get('link') is not None]
+        out.counter('adsb_endpoint_connects_total', "Connections made to the endpoint",
+                    [(labels, link.connects) for labels, link in links])
+        out.counter('adsb_endpoint_reconnects_total', "Connections made after the first",
+                    [(labels, link.reconnects) for labels, link in links])
+        out.counter('adsb_endpoint_connect_failures_total', "Failed connects and lost connections",
+                    [(labels, link.failures) for labels, link in links])
+        
+        if self.listener.sock is not None:
+            listener = self.listener
+            out.gauge('adsb_listen_clients', "Clients connected to the listen port", [({}, len(self.clients()))])
+            out.counter('adsb_listen_accepted_total', "Clients accepted", [({}, listener.accepted)])
+            out.counter('adsb_listen_rejected_total', "Clients refused (max_clients)", [({}, listener.rejected)])
+            out.counter('adsb_listen_evicted_total', "Clients disconnected for being too slow", [({}, listener.evicted)])
+        
+        if self.dedup_active:
+            out.gauge('adsb_dedup_cached_keys', "Messages remembered for deduplication", [({}, self.dedup.stats()['cached'])])
+        return out.text()
+    
+    def endpoint_failed(self, endpoint, error):
+        """Fan-out callback: an endpoint socket errored while writing"""
+        if endpoint.get('client'):
+            self.remove_client(endpoint, error)
+            return
+        self.logger.warning(f"Failed to send to {endpoint['ip']}:{endpoint['port']}: {error}")
+        try:
+            endpoint['socket'].close()
         except:
             pass
-            
-        return False
+        endpoint['socket'] = None
+        self.fanout.supervisor.lost(endpoint, error)
+                    
+    def deduplicate(self, messages, source, key):
+        """Count a source's messages and, with several sources, drop the
+        ones another source already delivered (see _ingest)."""
+        stats = source.stats
+        stats.messages += len(messages)
+        if not self.dedup_active:
+            return messages
+        duplicate = self.dedup.duplicate
+        name = source.name
+        now = time.monotonic()
+        kept = [message for message in messages if not duplicate(key(message), name, now)]
+        stats.duplicates += len(messages) - len(kept)
+        return kept
+    
+    def process_sbs1_lines(self, framer, source=None):
+        """Filter and forward the complete SBS1 lines held by framer.
         
-    def forward_message(self, message):
-        """Forward message to all connected endpoints"""
-        message_bytes = message.encode('utf-8')
+        Lines stay bytes throughout and are forwarded exactly as received
+        (dump1090's own CRLF terminator included).  Shared by the threaded
+        and asyncio engines so both apply identical filter semantics.
+        With a source, lines are counted and deduplicated first.
+        """
+        lines = framer.lines()
+        if source is not None:
+            if framer.discarded:
+                source.stats.parse_errors += framer.discarded
+                framer.discarded = 0
+            lines = self.deduplicate([line for line in lines if not line.isspace()], source, sbs1_key)
+        need_keys = self.need_queue_keys
+        submit = self.fanout.submit
+        # One [matcher, endpoints, matched, counts] per filter profile
+        # (stream formats have one format each); matcher None is the
+        # 'all' fast path that never parses a line
+        routes = [[None if compiled.accept_all else compiled.match_sbs1, endpoints, 0, self.filter_counts[name]]
+                  for name, compiled, by_format in self.routes for endpoints in by_format.values()]
         
-        for endpoint in self.endpoints:
-            if endpoint.get('socket'):
+        if len(routes) == 1:
+            match, endpoints, matched, counts = routes[0]
+            for line in lines:
+                if line.isspace() or (match is not None and not match(line)):
+                    continue
+                # latest_per_icao key: ICAO + transmission type, so
+                # a position update can't evict an identification
+                key = tuple(line.split(b',', 5)[1:5:3]) if need_keys else None
+                submit(endpoints, line, key)
+                matched += 1
+            counts[0] += len(lines)
+            counts[1] += matched
+            return
+        
+        for line in lines:
+            if line.isspace():
+                continue
+            key = tuple(line.split(b',', 5)[1:5:3]) if need_keys else None
+            for route in routes:
+                if route[0] is None or route[0](line):
+                    submit(route[1], line, key)
+                    route[2] += 1
+        for _, _, matched, counts in routes:
+            counts[0] += len(lines)
+            counts[1] += matched
+    
+    def process_beast_frames(self, framer, source=None):
+        """Filter and forward the complete Beast frames held by framer.
+        
+        Frames are forwarded byte for byte as received (escapes, MLAT
+        timestamp and signal level intact); filters see the unescaped
+        Mode S message.  With a source, frames are counted and
+        deduplicated (on the Mode S message) first.
+        """
+        frames = framer.frames()
+        if source is not None:
+            if framer.resyncs:
+                source.stats.parse_errors += framer.resyncs
+                framer.resyncs = 0
+            frames = self.deduplicate(frames, source, beast_key)
+        need_keys = self.need_queue_keys
+        submit = self.fanout.submit
+        routes = [[None if compiled.beast_accept_all else compiled.match_beast, endpoints, 0, self.filter_counts[name]]
+                  for name, compiled, by_format in self.routes for endpoints in by_format.values()]
+        
+        for raw, kind, _, _, message in frames:
+            # latest_per_icao key: address + DF, like ICAO + type for SBS1
+            key = (frame_icao(message), message[0] >> 3) if need_keys and message else None
+            for route in routes:
+                if route[0] is None or route[0](kind, message):
+                    submit(route[1], raw, key)
+                    route[2] += 1
+        for _, _, matched, counts in routes:
+            counts[0] += len(frames)
+            counts[1] += matched
+    
+    def encode_json_batch(self, aircraft_list, fmt):
+        """Render aircraft in an endpoint output format: one line (bytes,
+        or None if unconvertible) per aircraft, in order"""
+        if fmt == 'json':
+            return _serialize.dumps_lines(aircraft_list)
+        converter = self.sbs1_converter
+        errors = converter.errors
+        lines = converter.convert(aircraft_list, self.snapshot_now())
+        if converter.errors != errors:
+            self.logger.error(f"JSON→SBS1 conversion error: {converter.errors - errors} aircraft skipped")
+        return lines
+    
+    @staticmethod
+    def match_json_batch(compiled, aircraft_list):
+        """The aircraft a compiled filter accepts (malformed objects never match)"""
+        if compiled.accept_all:
+            return aircraft_list
+        match = compiled.match_json
+        try:
+            return [aircraft for aircraft in aircraft_list if match(aircraft)]
+        except Exception:
+            matched = []
+            for aircraft in aircraft_list:
                 try:
-                    endpoint['socket'].sendall(message_bytes)
+                    if match(aircraft):
+                        matched.append(aircraft)
+                except Exception:
+                    pass
+            return matched
+    
+    def forward_json_snapshot(self, aircraft_list):
+        """Filter a JSON snapshot per profile and forward it to each endpoint
+        in that endpoint's format; returns the number of aircraft sent.
+        
+        With change_only on, aircraft that haven't moved beyond the
+        thresholds since they were last sent are skipped up front.  Each
+        profile is evaluated once per aircraft (as NumPy masks over the
+        whole snapshot once it is large enough, see _columnar); each
+        format is encoded in one batch per snapshot and at most once per
+        aircraft, however many profiles and endpoints share it (json_delta
+        once per profile, as each profile is its own stream).  Unless a latest_per_icao queue
+        needs per-aircraft keys, an endpoint group gets the whole batch as
+        a single queued chunk.
+        """
+        self.aircraft_in += len(aircraft_list)
+        if self.change_only:
+            aircraft_list = self.aircraft_table.changed(aircraft_list)
+        if not aircraft_list:
+            return 0
+        submit = self.fanout.submit
+        need_keys = self.need_queue_keys
+        encoded = {}    # format -> {id(aircraft): line}, shared across profiles
+        sent = set()
+        columnar = self.columnar_matchers
+        # Columns are built lazily, once, and shared by every profile
+        columns = (_columnar.ColumnarSnapshot(aircraft_list)
+                   if columnar and len(aircraft_list) >= self.columnar_min_aircraft else None)
+        for name, compiled, by_format in self.routes:
+            matched = None
+            if columns is not None and name in columnar:
+                try:
+                    matched = columnar[name](columns)
                 except Exception as e:
-                    self.logger.warning(f"Failed to send to {endpoint['ip']}:{endpoint['port']}: {e}")
-                    try:
-                        endpoint['socket'].close()
-                    except:
-                        pass
-                    endpoint['socket'] = None
-                    
-                    # FIXED: Limit concurrent reconnection threads
-                    if len(self.reconnection_threads) < self.max_reconnect_threads:
-                        thread = threading.Thread(target=self.reconnect_endpoint, args=(endpoint,), daemon=True)
-                        self.reconnection_threads.add(thread)
-                        thread.start()
+                    # Odd field values: per-aircraft path for this snapshot
+                    self.logger.debug(f"Vectorized filter fell back: {e}")
+                    columns = None
+            if matched is None:
+                matched = self.match_json_batch(compiled, aircraft_list)
+            counts = self.filter_counts[name]
+            counts[0] += len(aircraft_list)
+            counts[1] += len(matched)
+            if not matched:
+                continue
+            for fmt, endpoints in by_format.items():
+                if fmt == 'json_delta':
+                    encode = self.delta_encoders[name].encode
+                    lines = [encode(aircraft) for aircraft in matched]
+                else:
+                    cache = encoded.setdefault(fmt, {})
+                    missing = [aircraft for aircraft in matched if id(aircraft) not in cache]
+                    if missing:
+                        cache.update(zip(map(id, missing), self.encode_json_batch(missing, fmt)))
+                    lines = [cache[id(aircraft)] for aircraft in matched]
+                
+                if need_keys:
+                    for aircraft, line in zip(matched, lines):
+                        if line:
+                            submit(endpoints, line, aircraft.get('hex'))
+                else:
+                    batch = b''.join(line for line in lines if line)
+                    if batch:
+                        submit(endpoints, batch)
+                sent.update(id(aircraft) for aircraft, line in zip(matched, lines) if line)
+        return len(sent)
                     
     def run_sbs1_mode(self):
-        """Run in SBS1 streaming mode"""
-        self.logger.info("ADS-B Server starting in SBS1 mode...")
+        """Run in SBS1 (or Beast) streaming mode, reading every configured source"""
+        beast = self.output_format == 'beast'
+        self.logger.info(f"ADS-B Server starting in {'Beast' if beast else 'SBS1'} mode...")
+        if len(self.sources) > 1:
+            self.logger.info(f"Reading {len(self.sources)} sources, deduplicating within {self.dedup.window}s")
+        process = self.process_beast_frames if beast else self.process_sbs1_lines
+        mode = self.run_mode()
+        self.connect_to_endpoints()
         
-        while self.running:
-            # Connect to dump1090
-            if not self.dump1090_socket:
-                if not self.connect_to_dump1090():
-                    self.logger.info("Waiting for dump1090-fa connection... (retry in 10s)")
-                    time.sleep(10)
-                    continue
-                    
-            # Connect to endpoints
-            self.connect_to_endpoints()
-            
-            # Main data processing loop
-            buffer = ""
-            reconnect_time = time.time()
-            
+        while self.running and self.run_mode() == mode:
             try:
-                while self.running:
-                    # Reload config periodically
-                    if time.time() - reconnect_time > 30:
-                        self.load_config()
-                        reconnect_time = time.time()
-                        
+                # Apply config edits (the watcher also wakes poll())
+                self.check_config()
+                
+                # (Re)connect sources that are due (endpoints reconnect
+                # on their own, see _reconnect)
+                next_due = self.service_sources()
+                
+                # Service writable endpoints until a source has data (or a
+                # source connect falls due)
+                readable = self.fanout.poll(self.endpoints, 1.0 if next_due is None else min(1.0, next_due))
+                if not readable:
+                    continue
+                by_socket = {source.sock: source for source in self.sources if source.sock is not None}
+                for sock in readable:
+                    source = by_socket.get(sock)
+                    if source is None:
+                        continue
                     try:
-                        # Receive with timeout
-                        data = self.dump1090_socket.recv(4096)
-                        if not data:
-                            self.logger.warning("dump1090-fa connection lost")
-                            break
-                            
-                        buffer += data.decode('utf-8', errors='ignore')
-                        
-                        # Process complete messages
-                        while '\n' in buffer:
-                            line, buffer = buffer.split('\n', 1)
-                            line = line.strip()
-                            
-                            if line and self.filter_message(line):
-                                self.forward_message(line + '\n')
-                                
+                        count = source.framer.recv_into(sock)
                     except socket.timeout:
                         # Timeout is normal, just continue
                         continue
                     except Exception as e:
-                        self.logger.error(f"Error receiving data: {e}")
-                        break
-                        
+                        self.logger.error(f"Error receiving data from {source}: {e}")
+                        error = e
+                        count = 0
+                    else:
+                        if not count:
+                            self.logger.warning(f"dump1090-fa connection lost: {source}")
+                            error = ConnectionError('closed')
+                    if not count:
+                        self.close_source(source, error)
+                        continue
+                    source.stats.bytes += count
+                    process(source.framer, source)
+                    
             except Exception as e:
                 self.logger.error(f"Server error: {e}")
-                
-            # Clean up connection
-            if self.dump1090_socket:
-                try:
-                    self.dump1090_socket.close()
-                except:
-                    pass
-                self.dump1090_socket = None
-                
-            # Wait before reconnecting
-            if self.running:
                 time.sleep(5)
-                
-        self.logger.info("ADS-B Server stopped")
+        
+        for source in self.sources:
+            self.close_source(source)
+        if not self.running:
+            self.logger.info("ADS-B Server stopped")
     
     def run_json_mode(self):
         """Run in JSON polling mode"""
         self.logger.info("ADS-B Server starting in JSON mode...")
         
-        host = self.config.get('Dump1090', 'host', fallback='127.0.0.1')
-        json_port = self.config.getint('Dump1090', 'json_port', fallback=8080)
-        url = f"http://{host}:{json_port}/data/aircraft.json"
-        self.logger.info(f"Polling JSON data from: {url}")
+        self.logger.info(f"Polling JSON data from: {self.json_source_url()}")
         
+        mode = self.run_mode()
         self.connect_to_endpoints()
         
-        reconnect_time = time.time()
         stats_time = time.time()
         first_success = False
         total_sent = 0
+        aircraft_list = []
         
-        while self.running:
+        while self.running and self.run_mode() == mode:
             try:
-                # Reload config periodically
-                if time.time() - reconnect_time > 30:
-                    self.load_config()
-                    reconnect_time = time.time()
+                # Apply config edits (the watcher also wakes poll())
+                self.check_config()
                 
-                # Fetch JSON data
-                aircraft_list = self.fetch_json_data()
+                # Fetch JSON data (None: unchanged since the last poll)
+                snapshot = self.fetch_json_data()
+                if snapshot is not None:
+                    aircraft_list = snapshot
                 
                 if aircraft_list and not first_success:
                     self.logger.info(f"✓ Successfully connected to JSON endpoint ({len(aircraft_list)} aircraft visible)")
                     first_success = True
                 
                 # Filter and forward
-                sent_count = 0
-                for aircraft in aircraft_list:
-                    if self.filter_json_aircraft(aircraft):
-                        json_str = json.dumps(aircraft) + '\n'
-                        self.forward_message(json_str)
-                        sent_count += 1
+                sent_count = self.forward_json_snapshot(aircraft_list) if snapshot is not None else 0
                 
                 total_sent += sent_count
                 
@@ -502,53 +1469,47 @@ class ADSBServer:
                     self.logger.info(f"JSON polling: {len(aircraft_list)} aircraft, {sent_count} filtered, {total_sent} total sent")
                     stats_time = time.time()
                 
-                time.sleep(1)
+                # Drain endpoint buffers while waiting for the next snapshot
+                self.wait_for_snapshot()
                 
             except Exception as e:
                 self.logger.error(f"JSON mode error: {e}")
                 time.sleep(5)
         
-        self.logger.info("ADS-B Server stopped")
+        if not self.running:
+            self.logger.info("ADS-B Server stopped")
     
     def run_json_to_sbs1_mode(self):
         """Run in JSON→SBS1 conversion mode"""
         self.logger.info("ADS-B Server starting in JSON→SBS1 mode...")
         
-        host = self.config.get('Dump1090', 'host', fallback='127.0.0.1')
-        json_port = self.config.getint('Dump1090', 'json_port', fallback=8080)
-        url = f"http://{host}:{json_port}/data/aircraft.json"
-        self.logger.info(f"Polling JSON data from: {url}")
+        self.logger.info(f"Polling JSON data from: {self.json_source_url()}")
         self.logger.info("Converting JSON → SBS1 format")
         
+        mode = self.run_mode()
         self.connect_to_endpoints()
         
-        reconnect_time = time.time()
         stats_time = time.time()
         first_success = False
         total_sent = 0
+        aircraft_list = []
         
-        while self.running:
+        while self.running and self.run_mode() == mode:
             try:
-                # Reload config periodically
-                if time.time() - reconnect_time > 30:
-                    self.load_config()
-                    reconnect_time = time.time()
+                # Apply config edits (the watcher also wakes poll())
+                self.check_config()
                 
-                # Fetch JSON data
-                aircraft_list = self.fetch_json_data()
+                # Fetch JSON data (None: unchanged since the last poll)
+                snapshot = self.fetch_json_data()
+                if snapshot is not None:
+                    aircraft_list = snapshot
                 
                 if aircraft_list and not first_success:
                     self.logger.info(f"✓ Successfully connected to JSON endpoint ({len(aircraft_list)} aircraft visible)")
                     first_success = True
                 
                 # Filter, convert and forward
-                sent_count = 0
-                for aircraft in aircraft_list:
-                    if self.filter_json_aircraft(aircraft):
-                        sbs1_message = self.json_to_sbs1(aircraft)
-                        if sbs1_message:
-                            self.forward_message(sbs1_message)
-                            sent_count += 1
+                sent_count = self.forward_json_snapshot(aircraft_list) if snapshot is not None else 0
                 
                 total_sent += sent_count
                 
@@ -557,42 +1518,84 @@ class ADSBServer:
                     self.logger.info(f"JSON→SBS1: {len(aircraft_list)} aircraft, {sent_count} converted & sent, {total_sent} total")
                     stats_time = time.time()
                 
-                time.sleep(1)
+                # Drain endpoint buffers while waiting for the next snapshot
+                self.wait_for_snapshot()
                 
             except Exception as e:
                 self.logger.error(f"JSON→SBS1 mode error: {e}")
                 time.sleep(5)
         
-        self.logger.info("ADS-B Server stopped")
+        if not self.running:
+            self.logger.info("ADS-B Server stopped")
     
     def run(self):
         """Main server loop"""
         self.running = True
         
-        self.logger.info(f"Starting ADS-B Server in {self.output_format} mode")
+        engine = self.engine = self.config.get('Server', 'engine', fallback='threaded').strip().lower()
+        self.logger.info(f"Starting ADS-B Server in {self.output_format} mode ({engine} engine)")
+        if self.output_format not in STREAM_FORMATS:
+            self.logger.info(f"JSON serializer: {_serialize.BACKEND}")
+            if self.columnar_matchers:
+                self.logger.info(f"Vectorized filtering: NumPy, snapshots of {self.columnar_min_aircraft}+ aircraft")
         
-        # Route to appropriate mode
-        if self.output_format == 'json':
-            self.run_json_mode()
-        elif self.output_format == 'json_to_sbs1':
-            self.run_json_to_sbs1_mode()
-        else:
-            self.run_sbs1_mode()
+        if engine == 'asyncio':
+            # Single event loop for reader, writers, reconnects and reload.
+            # It takes over the fan-out role from the selector engine.
+            from _aio_engine import AsyncEngine
+            self.fanout = AsyncEngine(self)
+            self.fanout.run()
+            return
+        elif engine != 'threaded':
+            self.logger.warning(f"Unknown engine '{engine}', using threaded")
+            self.engine = 'threaded'
+        
+        self.update_listener()
+        self.fanout.watch_reader(self.control.wakeup, self.reload_signalled)
+        self.update_control()
+        self.update_metrics()
+        if self.config_watcher.fileno() is not None:
+            # A config edit wakes the loop (check_config returns True once applied)
+            self.fanout.watch_reader(self.config_watcher, self.check_config)
+        
+        # Route to appropriate mode; an output format edit that needs a
+        # different loop ends the current one
+        while self.running:
+            mode = self.run_mode()
+            if mode == 'json':
+                self.run_json_mode()
+            elif mode == 'json_to_sbs1':
+                self.run_json_to_sbs1_mode()
+            else:
+                self.run_sbs1_mode()
+            if self.running:
+                self.logger.info(f"Output format is now {self.output_format}, switching mode")
+    
+    def run_mode(self):
+        """Which run loop the output format needs (json and json_delta share one)"""
+        return 'json' if self.output_format in ('json', 'json_delta') else self.output_format
         
     def stop(self):
         """Stop the server and clean up all resources"""
         self.logger.info("Stopping ADS-B Server...")
         self.running = False
         
-        # Close dump1090 connection
-        if self.dump1090_socket:
-            try:
-                self.dump1090_socket.close()
-            except:
-                pass
+        # Close dump1090 connections
+        for source in self.sources:
+            if source.sock is not None:
+                try:
+                    source.sock.close()
+                except:
+                    pass
                 
-        # Close all endpoint connections
+        # Stop accepting clients and control connections
+        self.listener.close()
+        self.control.close()
+        self.metrics.close()
+        
+        # Close all endpoint connections (and connects in flight)
         for endpoint in self.endpoints:
+            self.fanout.forget(endpoint)
             if endpoint.get('socket'):
                 try:
                     endpoint['socket'].close()
@@ -600,11 +1603,6 @@ class ADSBServer:
                     pass
                 endpoint['socket'] = None
         
-        # Wait for reconnection threads to finish (with timeout)
-        for thread in list(self.reconnection_threads):
-            if thread.is_alive():
-                thread.join(timeout=2)
-        
         self.logger.info("ADS-B Server stopped - all resources cleaned up")
 
 def main():
@@ -621,6 +1619,8 @@ def main():
         
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    # systemctl reload: re-read the config file (on the main loop, not here)
+    signal.signal(signal.SIGHUP, lambda sig, frame: server.control.notify())
     
     try:
         server.run()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - aircraft.json snapshots
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+``load_snapshot()`` returns the raw bytes of an aircraft.json snapshot:
+a file given on the command line (e.g. one saved from a live receiver
+with ``curl -o snap.json http://127.0.0.1:8080/data/aircraft.json`` or
+copied from ``/run/dump1090-fa/aircraft.json``), else the bundled
+``data/aircraft_sample.json``.
+
+The bundled sample is synthetic -- produced by ``synthetic_snapshot()``
+below in dump1090-fa's field layout (mix of ADS-B with full state,
+position-less Mode S and MLAT targets) -- so results are reproducible
+without a receiver.
+"""
+
+import json
+import os
+import random
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE = os.path.join(HERE, 'data', 'aircraft_sample.json')
+
+# Make the server modules importable (they import each other by bare name)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'adsb_server'))
+
+_AIRLINES = ('BAW', 'EZY', 'RYR', 'DLH', 'KLM', 'AFR', 'VIR', 'UAL', 'AAL', 'SHT')
+
+
+def synthetic_snapshot(count=250, seed=1090, now=1760000000.0, center=(51.47, -0.45)):
+    """A dump1090-fa style snapshot dict with ``count`` aircraft."""
+    rng = random.Random(seed)
+    aircraft = []
+    for i in range(count):
+        icao = f"{rng.randrange(0x400000, 0x4fffff):06x}"
+        kind = rng.random()
+        ac = {'hex': icao, 'type': 'adsb_icao'}
+        if kind < 0.15:
+            # Mode S only: no position, sparse state
+            ac.update({'alt_baro': rng.randrange(1000, 40000, 25), 'messages': rng.randrange(10, 500),
+                       'seen': round(rng.uniform(0, 30), 1), 'rssi': round(rng.uniform(-35, -10), 1)})
+            aircraft.append(ac)
+            continue
+        on_ground = rng.random() < 0.05
+        altitude = 'ground' if on_ground else rng.randrange(0, 43000, 25)
+        ac.update({
+            'flight': f"{rng.choice(_AIRLINES)}{rng.randrange(1, 9999)}".ljust(8),
+            'alt_baro': altitude,
+            'alt_geom': 0 if on_ground else altitude + rng.randrange(-300, 300, 25),
+            'gs': round(rng.uniform(5, 30) if on_ground else rng.uniform(140, 520), 1),
+            'ias': rng.randrange(120, 320),
+            'tas': rng.randrange(140, 500),
+            'mach': round(rng.uniform(0.3, 0.85), 3),
+            'track': round(rng.uniform(0, 360), 2),
+            'track_rate': round(rng.uniform(-2, 2), 2),
+            'roll': round(rng.uniform(-20, 20), 2),
+            'mag_heading': round(rng.uniform(0, 360), 2),
+            'baro_rate': rng.randrange(-3000, 3000, 64),
+            'geom_rate': rng.randrange(-3000, 3000, 64),
+            'squawk': f"{rng.randrange(0, 8)}{rng.randrange(0, 8)}{rng.randrange(0, 8)}{rng.randrange(0, 8)}",
+            'emergency': 'none',
+            'category': rng.choice(('A1', 'A2', 'A3', 'A5')),
+            'nav_qnh': 1013.6,
+            'nav_altitude_mcp': rng.randrange(3000, 41000, 1000),
+            'nav_heading': round(rng.uniform(0, 360), 2),
+            'lat': round(center[0] + rng.uniform(-2.5, 2.5), 6),
+            'lon': round(center[1] + rng.uniform(-4.0, 4.0), 6),
+            'nic': 8, 'rc': 186, 'seen_pos': round(rng.uniform(0, 5), 1),
+            'version': 2, 'nic_baro': 1, 'nac_p': 9, 'nac_v': 1, 'sil': 3, 'sil_type': 'perhour',
+            'gva': 2, 'sda': 2, 'mlat': [], 'tisb': [],
+            'messages': rng.randrange(100, 50000),
+            'seen': round(rng.uniform(0, 2), 1),
+            'rssi': round(rng.uniform(-35, -5), 1),
+        })
+        if kind > 0.95:
+            ac['type'] = 'mlat'
+            ac['mlat'] = ['lat', 'lon', 'track', 'gs', 'altitude']
+        aircraft.append(ac)
+    return {'now': now, 'messages': 12345678, 'aircraft': aircraft}
+
+
+def load_snapshot(argv=None):
+    """Raw snapshot bytes: argv[1] if given, else the bundled sample."""
+    argv = sys.argv if argv is None else argv
+    path = argv[1] if len(argv) > 1 else SAMPLE
+    with open(path, 'rb') as f:
+        return path, f.read()
+
+
+def scaled(snapshot, count, seed=7):
+    """Copy of a decoded snapshot grown/shrunk to ``count`` aircraft
+    (extra aircraft get fresh ICAOs and jittered positions)."""
+    rng = random.Random(seed)
+    source = snapshot['aircraft']
+    aircraft = []
+    for i in range(count):
+        ac = dict(source[i % len(source)])
+        if i >= len(source):
+            ac['hex'] = f"{rng.randrange(0x400000, 0xffffff):06x}"
+            if 'lat' in ac:
+                ac['lat'] = round(ac['lat'] + rng.uniform(-0.5, 0.5), 6)
+                ac['lon'] = round(ac['lon'] + rng.uniform(-0.5, 0.5), 6)
+        aircraft.append(ac)
+    return dict(snapshot, aircraft=aircraft)
+
+
+if __name__ == '__main__':
+    # Regenerate the bundled sample
+    with open(SAMPLE, 'w') as f:
+        json.dump(synthetic_snapshot(), f)
+    print(f"wrote {SAMPLE}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - per-object vs vectorized JSON filtering
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Runs each filter rule set over snapshots of 1k and 10k aircraft (the
+bundled sample, or a given snapshot, scaled with fresh ICAOs and
+jittered positions) through ``CompiledFilter.match_json`` one object
+at a time and through ``_columnar.ColumnarMatcher``, checks both accept
+the same aircraft, and reports the time per snapshot.  The columnar
+time includes building the columns from the decoded objects.
+
+    python3 benchmarks/bench_filter.py [snapshot.json]
+
+Needs NumPy for the columnar side (``pip install numpy``).
+"""
+
+import json
+import timeit
+
+from _snapshots import load_snapshot, scaled
+
+import _columnar
+from _filters import CompiledFilter
+
+SIZES = (1000, 10000)
+
+RULE_SETS = [
+    ('altitude band', dict(altitude_filter_enabled=True, min_altitude=2000, max_altitude=25000)),
+    ('icao allowlist (500)', None),     # filled from the snapshot below
+    ('circle geofence', dict(geofence_center=(51.47, -0.45), geofence_radius_nm=60)),
+    ('polygon geofence', dict(geofence_polygon=[(50.5, -2.0), (52.6, -1.5), (52.2, 1.2),
+                                                (51.0, 1.5), (50.2, 0.0)])),
+    ('fence + altitude + callsign', dict(geofence_center=(51.47, -0.45), geofence_radius_nm=90,
+                                         altitude_filter_enabled=True, max_altitude=30000,
+                                         callsign_prefixes=('BAW', 'EZY'))),
+]
+
+
+def per_object(compiled, aircraft_list):
+    match = compiled.match_json
+    return [aircraft for aircraft in aircraft_list if match(aircraft)]
+
+
+def columnar(matcher, aircraft_list):
+    return matcher(_columnar.ColumnarSnapshot(aircraft_list))
+
+
+def best_ms(func, number, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    path, body = load_snapshot()
+    snapshot = json.loads(body)
+    print(f"snapshot: {path} ({len(snapshot['aircraft'])} aircraft, scaled to {SIZES})")
+    if not _columnar.AVAILABLE:
+        print("NumPy not installed -- only the per-object path can run (pip install numpy)")
+
+    for size in SIZES:
+        aircraft_list = scaled(snapshot, size)['aircraft']
+        number = max(1, 20000 // size)
+        print(f"\n{size} aircraft")
+        for label, rules in RULE_SETS:
+            if rules is None:
+                rules = dict(filter_all=False, icao_list=[a['hex'].upper() for a in aircraft_list[::size // 500]])
+            compiled = CompiledFilter(**rules)
+            reference = per_object(compiled, aircraft_list)
+            slow = best_ms(lambda: per_object(compiled, aircraft_list), number)
+            line = f"  {label:30s} {len(reference):6d} match  per-object {slow:8.3f} ms"
+            if _columnar.AVAILABLE:
+                matcher = _columnar.ColumnarMatcher(compiled)
+                result = columnar(matcher, aircraft_list)
+                assert [id(a) for a in result] == [id(a) for a in reference], label
+                fast = best_ms(lambda: columnar(matcher, aircraft_list), number)
+                line += f"  columnar {fast:8.3f} ms  x{slow / fast:4.1f}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - JSON decode/encode per aircraft.json snapshot
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Compares the original JSON-mode path (``json.loads(body.decode())`` and
+one ``json.dumps()`` per aircraft) with ``adsb_server/_serialize.py``
+on its stdlib fallback and, when installed, on orjson.  Expect the
+stdlib fallback to match the baseline (both end up in the same C
+encoder); the gain is orjson's.
+
+    python3 benchmarks/bench_json.py [snapshot.json]
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import timeit
+
+from _snapshots import HERE, load_snapshot
+
+SERIALIZE = os.path.join(os.path.dirname(HERE), 'adsb_server', '_serialize.py')
+
+
+def load_backend(allow_orjson):
+    """Import a private copy of _serialize, optionally hiding orjson."""
+    saved = sys.modules.get('orjson', False)
+    if not allow_orjson:
+        sys.modules['orjson'] = None
+    try:
+        spec = importlib.util.spec_from_file_location(f"_serialize_{allow_orjson}", SERIALIZE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        if saved is False:
+            sys.modules.pop('orjson', None)
+        else:
+            sys.modules['orjson'] = saved
+
+
+def baseline(body):
+    aircraft = json.loads(body.decode('utf-8')).get('aircraft', [])
+    return [(json.dumps(a) + '\n').encode('utf-8') for a in aircraft]
+
+
+def with_backend(module):
+    def run(body):
+        aircraft = module.loads(body).get('aircraft', [])
+        return module.dumps_lines(aircraft)
+    return run
+
+
+def best_ms(func, body, number=50, repeat=5):
+    return min(timeit.repeat(lambda: func(body), number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    path, body = load_snapshot()
+    count = len(json.loads(body)['aircraft'])
+    print(f"snapshot: {path} ({len(body) / 1024:.0f} KiB, {count} aircraft)")
+
+    candidates = [('baseline json.loads + json.dumps per aircraft', baseline)]
+    stdlib = load_backend(allow_orjson=False)
+    candidates.append((f"_serialize ({stdlib.BACKEND}, compact, batch)", with_backend(stdlib)))
+    fast = load_backend(allow_orjson=True)
+    if fast.BACKEND != stdlib.BACKEND:
+        candidates.append((f"_serialize ({fast.BACKEND})", with_backend(fast)))
+    else:
+        print("orjson not installed -- skipping (pip install orjson)")
+
+    reference = None
+    for label, func in candidates:
+        ms = best_ms(func, body)
+        reference = reference or ms
+        print(f"  {label:50s} {ms:7.3f} ms/snapshot  x{reference / ms:4.1f}")
+
+
+if __name__ == '__main__':
+    main()
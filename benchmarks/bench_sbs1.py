@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - JSON to SBS1 conversion per aircraft.json snapshot
+Part of JLBMaritime ADS-B & Wi-Fi Management System
+
+Compares the original per-aircraft ``json_to_sbs1`` (``utcnow()`` and
+two ``strftime``s per aircraft, one f-string MSG,3 line each) with the
+batch ``_sbs1.SBS1Converter``, which emits proper MSG,1/3/4/5/6 lines
+and therefore more of them -- lines/s is reported alongside the time.
+
+    python3 benchmarks/bench_sbs1.py [snapshot.json]
+"""
+
+import json
+import timeit
+from datetime import datetime
+
+from _snapshots import load_snapshot
+
+from _sbs1 import SBS1Converter
+
+
+def baseline(aircraft_list, now):
+    lines = []
+    for aircraft in aircraft_list:
+        icao = aircraft.get('hex', '').upper()
+        callsign = aircraft.get('flight', '').strip()
+        altitude = aircraft.get('alt_baro') or aircraft.get('alt_geom') or ''
+        speed = aircraft.get('gs') or ''
+        track = aircraft.get('track') or ''
+        lat = aircraft.get('lat') or ''
+        lon = aircraft.get('lon') or ''
+        stamp = datetime.utcnow()
+        date_str = stamp.strftime('%Y/%m/%d')
+        time_str = stamp.strftime('%H:%M:%S.%f')[:-3]
+        line = f"MSG,3,1,1,{icao},1,{date_str},{time_str},{date_str},{time_str},{callsign},{altitude},{speed},{track},{lat},{lon}"
+        lines.append((line + '\n').encode('utf-8'))
+    return lines
+
+
+def best_ms(func, number=50, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    path, body = load_snapshot()
+    snapshot = json.loads(body)
+    aircraft_list = snapshot['aircraft']
+    now = snapshot.get('now')
+    print(f"snapshot: {path} ({len(aircraft_list)} aircraft)")
+
+    converter = SBS1Converter()
+    candidates = [
+        ('baseline json_to_sbs1 per aircraft (MSG,3 only)', lambda: baseline(aircraft_list, now)),
+        ('SBS1Converter batch (MSG,1/3/4/5/6)', lambda: converter.convert(aircraft_list, now)),
+    ]
+    reference = None
+    for label, func in candidates:
+        lines = sum(chunk.count(b'\n') for chunk in func() if chunk)
+        ms = best_ms(func)
+        reference = reference or ms
+        print(f"  {label:48s} {ms:7.3f} ms/snapshot  x{reference / ms:4.1f}  "
+              f"{lines:5d} lines  {lines / ms * 1000:9.0f} lines/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -437,7 +437,9 @@ def cmd_doctor(_args: argparse.Namespace) -> int:
     # architecture decision (lighttpd is required because adsb_server.py
     # in JSON / json_to_sbs1 mode reads /data/aircraft.json from
     # lighttpd on :8080), the manager's permanent home is :5000 and
-    # :80 belongs to lighttpd.  Both are healthy when bound.
+    # :80 belongs to lighttpd.  Both are healthy when bound.  (With
+    # [Dump1090] json_source = file the forwarder reads aircraft.json
+    # from /run/dump1090-fa directly and no longer needs :8080.)
     rc, out = _run(["ss", "-ltn"])
     expected_ports = [
         # (port, label, severity_if_missing)
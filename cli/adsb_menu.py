@@ -88,13 +88,15 @@ def set_output_format():
     print("[1] SBS1 Streaming - Real-time SBS1 format data")
     print("[2] JSON Objects - Individual JSON aircraft objects")
     print("[3] JSON→SBS1 - JSON data converted to SBS1 format")
+    print("[4] JSON Delta - Changed fields only, for metered links")
+    print("[5] Beast - Raw Mode S frames with MLAT timestamps")
     
-    choice = get_choice("\nSelect format [1-3]", 1, 3)
+    choice = get_choice("\nSelect format [1-5]", 1, 5)
     
     if choice is None:
         return
     
-    formats = ['sbs1', 'json', 'json_to_sbs1']
+    formats = ['sbs1', 'json', 'json_to_sbs1', 'json_delta', 'beast']
     selected_format = formats[choice - 1]
     
     config = configparser.ConfigParser()
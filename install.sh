@@ -594,6 +594,11 @@ WorkingDirectory=$INSTALL_DIR
 # will simply log "Failed to connect" and retry on its own loop.
 ExecStartPre=/bin/sh -c 'for i in \$(seq 1 60); do ss -ltn | grep -q ":30003" && exit 0; sleep 1; done; exit 0'
 ExecStart=$INSTALL_DIR/.venv/bin/python3 $INSTALL_DIR/adsb_server/adsb_server.py
+# 'systemctl reload' re-reads the config file without a restart; the web
+# UI pushes edits over the control socket in /run/adsb-server instead
+ExecReload=/bin/kill -HUP \$MAINPID
+RuntimeDirectory=adsb-server
+RuntimeDirectoryMode=0750
 Restart=always
 RestartSec=10s
 
@@ -872,6 +877,7 @@ cat <<EOF
     :30003  dump1090-fa SBS1 OUT    } can connect to any of these
     :30005  dump1090-fa Beast OUT   } directly
     :30004/:30104   dump1090-fa raw IN (network feeders)
+    :30103  adsb-server filtered feed (when [Listen] enabled = true)
 
   Diagnose anytime:        sudo adsb-cli doctor
   Live forwarder logs:     sudo journalctl -u adsb-server -f
@@ -12,6 +12,7 @@ import configparser
 import socket
 import subprocess
 import json
+import re
 from functools import wraps
 from datetime import datetime, timedelta
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -19,6 +20,10 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from wifi_manager.wifi_controller import WiFiController
+# adsb_server's modules import each other flat (run as a script)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'adsb_server'))
+from _confwatch import write_config
+from _control import read_endpoints, write_endpoints, ENDPOINT_OPTIONS
 
 app = Flask(__name__)
 
@@ -77,6 +82,8 @@ if PRODUCTION_MODE:
 ADSB_CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'adsb_server_config.conf')
 WEB_CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'web_config.conf')
 LOG_PATH = os.path.join(BASE_DIR, 'logs', 'adsb_server.log')
+# adsb-server's control socket ([Server] control_socket overrides)
+ADSB_CONTROL_SOCKET = '/run/adsb-server/control.sock'
 
 
 # Initialize WiFi controller
@@ -380,6 +387,137 @@ def wifi_diagnostics():
         return jsonify({'success': False, 'error': str(e)})
 
 # ADS-B Configuration APIs
+# [Filter] rule keys beyond mode/icao_list/altitude (see adsb_server/_filters.py).
+# Stored as plain INI strings; the API exchanges structured JSON.
+def _split_list(text):
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+def _read_filter_rules(config):
+    """[Filter] rule keys -> JSON-friendly dict"""
+    def point(text):
+        lat, lon = (float(v) for v in text.replace(',', ' ').split())
+        return [lat, lon]
+
+    center = config.get('Filter', 'geofence_center', fallback='').strip()
+    radius = config.get('Filter', 'geofence_radius_nm', fallback='').strip()
+    polygon = config.get('Filter', 'geofence_polygon', fallback='').strip()
+    min_altitude = config.get('Filter', 'min_altitude', fallback='').strip()
+    return {
+        'min_altitude': int(min_altitude) if min_altitude else None,
+        'geofence': {
+            'center': point(center) if center else None,
+            'radius_nm': float(radius) if radius else None,
+            'polygon': [point(p) for p in polygon.split(';') if p.strip()],
+        },
+        'squawks': _split_list(config.get('Filter', 'squawks', fallback='')),
+        'callsign_prefixes': _split_list(config.get('Filter', 'callsign_prefixes', fallback='')),
+        'callsign_regex': config.get('Filter', 'callsign_regex', fallback=''),
+        'msg_types': _split_list(config.get('Filter', 'msg_types', fallback='')),
+        'downlink_formats': _split_list(config.get('Filter', 'downlink_formats', fallback='')),
+    }
+
+def _write_filter_rules(config, data):
+    """Validate the rule keys present in data and store them in [Filter].
+
+    Raises ValueError with a user-facing message on bad input, before
+    anything is written to disk.
+    """
+    def check_point(value):
+        if len(value) != 2:
+            raise ValueError(f"Invalid coordinate: {value}")
+        lat, lon = float(value[0]), float(value[1])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Invalid coordinate: {value}")
+        return f"{lat},{lon}"
+
+    if 'min_altitude' in data:
+        value = data['min_altitude']
+        config.set('Filter', 'min_altitude', '' if value in (None, '') else str(int(value)))
+
+    if 'geofence' in data:
+        fence = data['geofence'] or {}
+        center = fence.get('center')
+        radius = fence.get('radius_nm')
+        polygon = fence.get('polygon') or []
+        if (center is None) != (radius in (None, '')):
+            raise ValueError("Geofence center and radius_nm must be set together")
+        if radius not in (None, '') and float(radius) <= 0:
+            raise ValueError("Geofence radius_nm must be positive")
+        if polygon and len(polygon) < 3:
+            raise ValueError("Geofence polygon needs at least 3 points")
+        config.set('Filter', 'geofence_center', check_point(center) if center else '')
+        config.set('Filter', 'geofence_radius_nm', '' if radius in (None, '') else str(float(radius)))
+        config.set('Filter', 'geofence_polygon',
+                   '; '.join(check_point(p).replace(',', ' ') for p in polygon))
+
+    if 'squawks' in data:
+        squawks = [str(s).strip() for s in data['squawks'] if str(s).strip()]
+        for squawk in squawks:
+            if not re.fullmatch(r'[0-7]{4}', squawk):
+                raise ValueError(f"Invalid squawk: {squawk}")
+        config.set('Filter', 'squawks', ','.join(squawks))
+
+    if 'callsign_prefixes' in data:
+        prefixes = [str(p).strip().upper() for p in data['callsign_prefixes'] if str(p).strip()]
+        config.set('Filter', 'callsign_prefixes', ','.join(prefixes))
+
+    if 'callsign_regex' in data:
+        regex = (data['callsign_regex'] or '').strip()
+        try:
+            re.compile(regex)
+        except re.error as e:
+            raise ValueError(f"Invalid callsign regex: {e}")
+        config.set('Filter', 'callsign_regex', regex)
+
+    if 'msg_types' in data:
+        types = [str(t).strip() for t in data['msg_types'] if str(t).strip()]
+        for msg_type in types:
+            if msg_type not in ('1', '2', '3', '4', '5', '6', '7', '8'):
+                raise ValueError(f"Invalid SBS1 message type: {msg_type}")
+        config.set('Filter', 'msg_types', ','.join(types))
+
+    if 'downlink_formats' in data:
+        formats = [str(df).strip() for df in data['downlink_formats'] if str(df).strip()]
+        for df in formats:
+            if not df.isdigit() or int(df) > 24:
+                raise ValueError(f"Invalid Mode S downlink format: {df}")
+        config.set('Filter', 'downlink_formats', ','.join(formats))
+
+def _save_adsb_config(config):
+    """Write the forwarder's config atomically.
+
+    adsb-server watches the file and applies an edit within milliseconds
+    of the rename, so it must never see a half-written file.  Same
+    writer as the server's own endpoint edits: a unique temp file per
+    save, fsync, the file's mode kept, then the rename.
+    """
+    write_config(config, ADSB_CONFIG_PATH)
+
+def _adsb_control(cmd, config=None, **args):
+    """Send one command to adsb-server's control socket and return its
+    reply (a dict with 'ok', see adsb_server/_control.py).
+
+    Raises OSError / ValueError if the forwarder isn't running or
+    doesn't answer -- callers decide whether that matters.
+    """
+    if config is None:
+        config = configparser.ConfigParser()
+        config.read(ADSB_CONFIG_PATH)
+    path = config.get('Server', 'control_socket', fallback=ADSB_CONTROL_SOCKET).strip()
+    if not path:
+        raise OSError('control socket disabled ([Server] control_socket is blank)')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(path)
+        sock.sendall(json.dumps(dict(args, cmd=cmd)).encode('utf-8') + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply)
+
 @app.route('/api/adsb/config')
 @login_required
 def get_adsb_config():
@@ -406,7 +544,20 @@ def get_adsb_config():
             ip = config.get('Endpoints', f'endpoint_{i}_ip', fallback='')
             port = config.get('Endpoints', f'endpoint_{i}_port', fallback='')
             if ip and port:
-                endpoints.append({'name': name, 'ip': ip, 'port': port})
+                endpoints.append({
+                    'name': name, 'ip': ip, 'port': port,
+                    'filter': config.get('Endpoints', f'endpoint_{i}_filter', fallback='default'),
+                    'format': config.get('Endpoints', f'endpoint_{i}_format', fallback=''),
+                    # Transport: tcp (blank) / udp / multicast, plus datagram
+                    # options and queue limits -- sent back unchanged on save
+                    **{option: config.get('Endpoints', f'endpoint_{i}_{option}', fallback='')
+                       for option in ('transport', 'mtu', 'ttl', 'multicast_interface',
+                                      'queue_bytes', 'queue_messages', 'drop_policy')}
+                })
+        
+        # Named filter profiles ([Filter.<name>]) endpoints can select
+        filter_profiles = ['default'] + [section[len('Filter.'):] for section in config.sections()
+                                         if section.startswith('Filter.')]
                 
         return jsonify({
             'success': True,
@@ -415,6 +566,8 @@ def get_adsb_config():
             'icao_list': icao_list,
             'altitude_filter_enabled': altitude_filter_enabled,
             'max_altitude': max_altitude,
+            **_read_filter_rules(config),
+            'filter_profiles': filter_profiles,
             'endpoints': endpoints
         })
     except Exception as e:
@@ -456,33 +609,63 @@ def update_adsb_config():
             
         if 'max_altitude' in data:
             config.set('Filter', 'max_altitude', str(data['max_altitude']))
+        
+        # Geofence / squawk / callsign / message-type rules
+        try:
+            _write_filter_rules(config, data)
+        except (ValueError, TypeError, IndexError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
             
         # Update endpoints
         if 'endpoints' in data:
-            config.set('Endpoints', 'count', str(len(data['endpoints'])))
-            for i, endpoint in enumerate(data['endpoints']):
-                config.set('Endpoints', f'endpoint_{i}_name', endpoint.get('name', ''))
-                config.set('Endpoints', f'endpoint_{i}_ip', endpoint['ip'])
-                config.set('Endpoints', f'endpoint_{i}_port', str(endpoint['port']))
+            # Options an entry leaves out (filter profile, format, transport,
+            # queue limits ...) keep the endpoint's current values -- looked
+            # up by ip:port, not position, so deleting or reordering entries
+            # doesn't hand one endpoint's settings to its neighbour.  A key
+            # sent blank (or 'default' / 'tcp') resets that option.
+            current = {(e.get('ip'), e.get('port')): e for e in read_endpoints(config)}
+            endpoints = []
+            for endpoint in data['endpoints']:
+                ip, port = str(endpoint['ip']).strip(), str(endpoint['port']).strip()
+                merged = dict(current.get((ip, port), {}))
+                for option in ENDPOINT_OPTIONS:
+                    if option in endpoint:
+                        value = str(endpoint[option] if endpoint[option] is not None else '').strip()
+                        if (option, value) in (('filter', 'default'), ('transport', 'tcp')):
+                            value = ''
+                        merged[option] = value
+                merged.update(ip=ip, port=port)
+                endpoints.append(merged)
+            write_endpoints(config, endpoints)
                 
-        # Save configuration
-        with open(ADSB_CONFIG_PATH, 'w') as f:
-            config.write(f)
-            
-        # Restart ADS-B service.
-        # NB: '.service' suffix is REQUIRED -- the sudoers drop-in installed
-        # by install.sh whitelists exactly '/usr/bin/systemctl restart
-        # adsb-server.service'.  sudo does string-equal matching on every
-        # argv, so the bare 'adsb-server' form is denied (rc=1) and the
-        # restart silently fails to take effect.  Symptom on the UI: config
-        # appears to save but new options aren't picked up by the forwarder.
-        subprocess.run(['sudo', '-n', 'systemctl', 'restart',
-                        'adsb-server.service'], check=False)
-        
-        return jsonify({'success': True})
+        # Save configuration and tell adsb-server to apply it.  No service
+        # restart: only what changed is applied, so the stream to the other
+        # endpoints carries on uninterrupted.  If the forwarder is down its
+        # file watch / next start picks the edit up instead.
+        _save_adsb_config(config)
+        try:
+            reply = _adsb_control('reload', config)
+        except (OSError, ValueError):
+            return jsonify({'success': True, 'applied': False})
+        if not reply.get('ok'):
+            return jsonify({'success': False, 'error': reply.get('error', 'reload failed')})
+        return jsonify({'success': True, 'applied': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/adsb/stats')
+@login_required
+def get_adsb_stats():
+    """Live forwarder counters (endpoints, sources, listen clients) from
+    adsb-server's control socket"""
+    try:
+        reply = _adsb_control('get-stats')
+    except (OSError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'ADS-B server not reachable: {e}'}), 503
+    if not reply.pop('ok', False):
+        return jsonify({'success': False, 'error': reply.get('error', 'get-stats failed')}), 500
+    return jsonify({'success': True, **reply})
+
 @app.route('/api/adsb/service/<action>', methods=['POST'])
 @login_required
 def adsb_service_control(action):
@@ -81,7 +81,9 @@ async function refreshDashboard() {
             const formatNames = {
                 'sbs1': 'SBS1 Streaming',
                 'json': 'JSON Objects',
-                'json_to_sbs1': 'JSON→SBS1 Hybrid'
+                'json_to_sbs1': 'JSON→SBS1 Hybrid',
+                'json_delta': 'JSON Delta',
+                'beast': 'Beast Binary'
             };
             const outputFormat = data.output_format || 'sbs1';
             document.getElementById('config-output-format').textContent = formatNames[outputFormat] || outputFormat;
@@ -491,11 +493,12 @@ async function saveEditedEndpoint(index) {
         return;
     }
     
-    // Update the endpoint
-    currentEndpoints[index] = {name, ip, port};
+    // Update the endpoint; keep the options this form doesn't show
+    // (filter profile, format, transport, queue limits)
+    currentEndpoints[index] = {...currentEndpoints[index], name, ip, port};
     editingEndpointIndex = null;
     
-    // Save to server and restart service
+    // Save to server (adsb-server applies it live)
     try {
         const outputFormat = document.querySelector('input[name="output-format"]:checked').value;
         const filterMode = document.querySelector('input[name="filter-mode"]:checked').value;
@@ -524,7 +527,7 @@ async function saveEditedEndpoint(index) {
         
         const data = await response.json();
         if (data.success) {
-            alert('Endpoint updated and ADS-B server restarted');
+            alert('Endpoint updated' + (data.applied ? ' and applied' : ''));
             displayEndpoints();
         } else {
             alert('Failed to save endpoint');
@@ -585,7 +588,7 @@ async function saveADSBConfig() {
         
         const data = await response.json();
         if (data.success) {
-            alert('Configuration saved and ADS-B server restarted');
+            alert('Configuration saved' + (data.applied ? ' and applied' : ''));
         } else {
             alert('Failed to save configuration');
         }